@@ -0,0 +1,190 @@
+import os
+import time
+import asyncio
+import argparse
+from typing import Any, Dict
+from fastapi import FastAPI, Header, HTTPException, Request, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse
+from rate_limiter import check_rate_limit
+from tools_registry import get_async_tool
+from local_orchestrator import run_analysis_async
+from audit_model import list_runs_page, get_trace
+import metrics
+
+API_KEYS = {k.strip() for k in os.getenv("MCP_API_KEYS", "dev-local-key").split(",") if k.strip()}
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+API_KEEPALIVE = int(os.getenv("API_KEEPALIVE", "30"))
+RPC_MAX_BATCH = int(os.getenv("RPC_MAX_BATCH", "100"))
+
+# MCP tool names exposed over the API -> (registry tool, positional argument names)
+MCP_TOOLS = {
+    "get_quote": {
+        "tool": "quote_tool",
+        "args": ["symbol"],
+        "description": "Latest price quote for a ticker.",
+        "input_schema": {"type": "object", "properties": {"symbol": {"type": "string"}}, "required": ["symbol"]},
+    },
+    "get_history": {
+        "tool": "history_tool",
+        "args": ["symbol", "period"],
+        "description": "Daily price history for a ticker over a window (1m, 3m, 6m, 1y, 5y).",
+        "input_schema": {"type": "object", "properties": {"symbol": {"type": "string"}, "period": {"type": "string"}},
+                         "required": ["symbol"]},
+    },
+    "get_fundamentals": {
+        "tool": "fundamentals_tool",
+        "args": ["symbol"],
+        "description": "Market cap, P/E and ROE for a ticker.",
+        "input_schema": {"type": "object", "properties": {"symbol": {"type": "string"}}, "required": ["symbol"]},
+    },
+}
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+RATE_LIMITED = -32000  # implementation-defined server error
+
+class RPCError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+app = FastAPI(title="MCP Stock Analyzer API")
+
+@app.middleware("http")
+async def _time_requests(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # the route template, not the raw path: ids and scanner probes would each add a label set
+    route = request.scope.get("route")
+    metrics.observe("mcp_api_request_seconds", time.perf_counter() - start,
+                    route=route.path if route is not None else "unmatched", status=response.status_code)
+    return response
+
+def require_api_key(request: Request, x_api_key: str = Header(None)):
+    if not x_api_key or x_api_key not in API_KEYS:
+        raise HTTPException(status_code=401, detail="Invalid or missing X-API-KEY")
+    check_rate_limit(x_api_key, request.url.path)
+    return x_api_key
+
+def _charge(api_key, route) -> bool:
+    """Take one rate-limit token; False when the bucket is empty."""
+    try:
+        check_rate_limit(api_key, route)
+    except HTTPException:
+        return False
+    return True
+
+async def _rate_limited(req) -> Dict[str, Any]:
+    rid = req.get("id") if isinstance(req, dict) else None
+    return {"jsonrpc": "2.0", "id": rid, "error": {"code": RATE_LIMITED, "message": "rate limit exceeded"}}
+
+@app.get("/healthz")
+async def healthz():
+    return {"ok": True}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/mcp/manifest")
+async def manifest(api_key: str = Depends(require_api_key)):
+    return {
+        "name": "mcp-stock-analyzer",
+        "tools": [{"name": n, "description": t["description"], "input_schema": t["input_schema"]} for n, t in MCP_TOOLS.items()],
+        "methods": sorted(METHODS),
+    }
+
+async def _tool_call(params):
+    name = params.get("tool")
+    spec = MCP_TOOLS.get(name)
+    if spec is None:
+        raise RPCError(INVALID_PARAMS, f"unknown tool: {name}")
+    args = params.get("args") or {}
+    missing = [a for a in spec["input_schema"]["required"] if a not in args]
+    if missing:
+        raise RPCError(INVALID_PARAMS, f"missing arguments: {', '.join(missing)}")
+    values = [args[a] for a in spec["args"] if a in args]
+    return await get_async_tool(spec["tool"])(*values)
+
+async def _run_analysis(params):
+    ticker = params.get("ticker")
+    if not ticker:
+        raise RPCError(INVALID_PARAMS, "ticker is required")
+    return await run_analysis_async(ticker.strip().upper(), params.get("params") or {})
+
+async def _list_runs(params):
+    kwargs = {k: params[k] for k in ("cursor", "limit", "ticker", "since") if k in params}
+    return await asyncio.to_thread(list_runs_page, **kwargs)
+
+async def _get_trace(params):
+    if not params.get("run_id"):
+        raise RPCError(INVALID_PARAMS, "run_id is required")
+    kwargs = {k: params[k] for k in ("name", "tool", "min_step", "max_step") if k in params}
+    return await asyncio.to_thread(get_trace, params["run_id"], **kwargs)
+
+METHODS = {
+    "tool.call": _tool_call,
+    "run_analysis": _run_analysis,
+    "audit.list_runs": _list_runs,
+    "audit.get_trace": _get_trace,
+}
+
+async def _dispatch(req) -> Dict[str, Any]:
+    rid = req.get("id") if isinstance(req, dict) else None
+    try:
+        if not isinstance(req, dict) or not isinstance(req.get("method"), str):
+            raise RPCError(INVALID_REQUEST, "invalid request")
+        handler = METHODS.get(req["method"])
+        if handler is None:
+            raise RPCError(METHOD_NOT_FOUND, f"method not found: {req['method']}")
+        params = req.get("params") or {}
+        if not isinstance(params, dict):
+            raise RPCError(INVALID_PARAMS, "params must be an object")
+        return {"jsonrpc": "2.0", "id": rid, "result": await handler(params)}
+    except RPCError as e:
+        return {"jsonrpc": "2.0", "id": rid, "error": {"code": e.code, "message": e.message}}
+    except Exception as e:
+        return {"jsonrpc": "2.0", "id": rid, "error": {"code": INTERNAL_ERROR, "message": f"{type(e).__name__}: {e}"}}
+
+@app.post("/mcp/rpc")
+async def rpc(request: Request, api_key: str = Depends(require_api_key)):
+    """
+    JSON-RPC endpoint. A list body is a batch: its calls run concurrently and answer in order.
+    Every batch entry costs one rate-limit token (the request itself paid for the first);
+    entries past the limit get a RATE_LIMITED error and do not run.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": "parse error"}})
+    if isinstance(body, list):
+        if not body or len(body) > RPC_MAX_BATCH:
+            return JSONResponse({"jsonrpc": "2.0", "id": None,
+                                 "error": {"code": INVALID_REQUEST, "message": f"batch must hold 1-{RPC_MAX_BATCH} calls"}})
+        route = request.url.path
+        allowed = [True] + await asyncio.to_thread(lambda: [_charge(api_key, route) for _ in body[1:]])
+        calls = (_dispatch(r) if ok else _rate_limited(r) for r, ok in zip(body, allowed))
+        return JSONResponse(list(await asyncio.gather(*calls)))
+    return JSONResponse(await _dispatch(body))
+
+def main(argv=None):
+    import uvicorn
+    ap = argparse.ArgumentParser(description="Serve the MCP pipeline over HTTP.")
+    ap.add_argument("--host", default=API_HOST)
+    ap.add_argument("--port", type=int, default=API_PORT)
+    ap.add_argument("--workers", type=int, default=API_WORKERS)
+    ap.add_argument("--keepalive", type=int, default=API_KEEPALIVE, help="keep-alive timeout in seconds")
+    args = ap.parse_args(argv)
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers,
+                loop="uvloop", http="httptools", timeout_keep_alive=args.keepalive,
+                access_log=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+import audit_model
+from audit_model import _connect, _ensure_db, _step_dict, flush_audit
+import metrics
+
+# Parquet export is optional
+try:
+    import pyarrow as _pa
+    import pyarrow.parquet as _pq
+except Exception:
+    _pa = _pq = None
+
+AUDIT_ARCHIVE_DIR = Path(os.getenv("AUDIT_ARCHIVE_DIR", "data/archive"))
+# Runs whose last step is older than this many days are archived and deleted by prune (0 = keep all)
+AUDIT_RETENTION_DAYS = float(os.getenv("AUDIT_RETENTION_DAYS", "30"))
+# Runs deleted per transaction; each batch holds the write lock only briefly
+AUDIT_PRUNE_BATCH = int(os.getenv("AUDIT_PRUNE_BATCH", "500"))
+# Pages freed per incremental_vacuum step (4 KiB pages)
+AUDIT_VACUUM_PAGES = int(os.getenv("AUDIT_VACUUM_PAGES", "2000"))
+# Sleep between prune batches / vacuum steps: a busy writer backs off with sleeps
+# of its own, so back-to-back transactions would starve it
+AUDIT_PRUNE_PAUSE = float(os.getenv("AUDIT_PRUNE_PAUSE", "0.02"))
+EXPORT_CHUNK = int(os.getenv("AUDIT_EXPORT_CHUNK", "1000"))
+
+# CROSS JOIN pins runs as the outer loop (walked in idx_runs_last order) so rows
+# stream out in order; only each run's own steps are sorted, never the whole result
+_STEPS_SQL = """
+    SELECT r.ticker, s.*, b.data AS blob_data, b.codec AS blob_codec
+    FROM runs r
+    CROSS JOIN audit_steps s ON s.run_id = r.run_id
+    LEFT JOIN blobs b ON b.hash = s.output_ref
+"""
+
+def _record(r):
+    return {"run_id": r["run_id"], "ticker": r["ticker"], **_step_dict(r)}
+
+def iter_steps(since=None, until=None, run_ids=None, chunk=None, path=None):
+    """
+    Yield audit steps (with run_id and ticker) for runs whose last_at is in
+    [since, until), or for the given run_ids, ordered by run then step. Rows
+    come from one cursor with fetchmany(chunk), so memory stays flat however
+    many runs match.
+    """
+    flush_audit()
+    _ensure_db(path)
+    sql, args = _STEPS_SQL + " WHERE 1=1", []
+    if run_ids is not None:
+        sql += f" AND r.run_id IN ({','.join('?' * len(run_ids))})"
+        args += list(run_ids)
+    if since is not None:
+        sql += " AND r.last_at >= ?"
+        args.append(since)
+    if until is not None:
+        sql += " AND r.last_at < ?"
+        args.append(until)
+    conn = _connect(path)
+    try:
+        cur = conn.execute(sql + " ORDER BY r.last_at, r.run_id, s.step_index", args)
+        while True:
+            rows = cur.fetchmany(chunk or EXPORT_CHUNK)
+            if not rows:
+                break
+            for r in rows:
+                yield _record(r)
+    finally:
+        conn.close()
+
+class _JsonlSink:
+    def __init__(self, path):
+        path = Path(path)
+        self.f = gzip.open(path, "at", encoding="utf-8") if path.suffix == ".gz" else open(path, "a", encoding="utf-8")
+
+    def write(self, records):
+        for rec in records:
+            self.f.write(json.dumps(rec, default=str) + "\n")
+
+    def close(self):
+        self.f.close()
+
+class _ParquetSink:
+    # nested input/output/meta are stored as JSON text so every chunk has the same schema
+    SCHEMA = [("run_id", "string"), ("ticker", "string"), ("step_index", "int64"), ("name", "string"),
+              ("tool", "string"), ("input", "string"), ("output", "string"), ("duration", "float64"),
+              ("created_at", "string"), ("meta", "string")]
+
+    def __init__(self, path):
+        if _pq is None:
+            raise RuntimeError("Parquet export needs the pyarrow package")
+        self.schema = _pa.schema([(name, getattr(_pa, t)()) for name, t in self.SCHEMA])
+        self.writer = _pq.ParquetWriter(str(path), self.schema, compression="zstd")
+
+    def write(self, records):
+        cols = {name: [] for name, _ in self.SCHEMA}
+        for rec in records:
+            for name, t in self.SCHEMA:
+                v = rec.get(name)
+                cols[name].append(json.dumps(v, default=str) if name in ("input", "output", "meta") else v)
+        self.writer.write_table(_pa.table(cols, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+def _sink(path, fmt=None):
+    fmt = fmt or ("parquet" if Path(path).suffix == ".parquet" else "jsonl")
+    if fmt not in ("jsonl", "parquet"):
+        raise ValueError(f"unknown export format {fmt!r}; expected jsonl or parquet")
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    return _ParquetSink(path) if fmt == "parquet" else _JsonlSink(path)
+
+def _write_chunks(sink, steps, chunk):
+    n, runs, buf = 0, set(), []
+    for rec in steps:
+        buf.append(rec)
+        runs.add(rec["run_id"])
+        if len(buf) >= chunk:
+            sink.write(buf)
+            n += len(buf)
+            buf = []
+    if buf:
+        sink.write(buf)
+        n += len(buf)
+    return n, len(runs)
+
+def export_runs(out, since=None, until=None, fmt=None, chunk=None, path=None):
+    """
+    Stream the steps of runs with last_at in [since, until) to `out` as JSONL
+    (".gz" compresses) or Parquet (by suffix or `fmt`), `chunk` steps at a time.
+    Returns {"path", "runs", "steps", "bytes"}.
+    """
+    chunk = chunk or EXPORT_CHUNK
+    sink = _sink(out, fmt)
+    try:
+        with metrics.timer("mcp_audit_export_seconds"):
+            steps, runs = _write_chunks(sink, iter_steps(since, until, chunk=chunk, path=path), chunk)
+    finally:
+        sink.close()
+    return {"path": str(out), "runs": runs, "steps": steps, "bytes": Path(out).stat().st_size}
+
+def _delete_runs(conn, run_ids):
+    """Delete runs, their steps and blobs no other step references, in one short write transaction."""
+    marks = ",".join("?" * len(run_ids))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        refs = [r[0] for r in conn.execute(
+            f"SELECT DISTINCT output_ref FROM audit_steps WHERE run_id IN ({marks}) AND output_ref IS NOT NULL", run_ids)]
+        steps = conn.execute(f"DELETE FROM audit_steps WHERE run_id IN ({marks})", run_ids).rowcount
+        conn.execute(f"DELETE FROM runs WHERE run_id IN ({marks})", run_ids)
+        blobs = 0
+        if refs:
+            # blobs are content-addressed and may be shared with runs that stay
+            blobs = conn.execute(f"""
+                DELETE FROM blobs WHERE hash IN ({','.join('?' * len(refs))})
+                AND NOT EXISTS (SELECT 1 FROM audit_steps s WHERE s.output_ref = blobs.hash)
+            """, refs).rowcount
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return steps, blobs
+
+def prune(before=None, archive=True, archive_dir=None, fmt="jsonl", batch=None, pause=None, path=None):
+    """
+    Archive (optional) and delete runs whose last_at is before `before` (ISO
+    string; default now - AUDIT_RETENTION_DAYS). Works `batch` runs at a time:
+    each batch is exported, then deleted in its own short transaction, so
+    writers wait at most one batch. Afterwards runs vacuum_incremental().
+    Returns counts, the archive path and the DB size before/after.
+    """
+    if before is None:
+        if not AUDIT_RETENTION_DAYS:
+            return {"runs": 0, "steps": 0, "blobs": 0, "archive": None}
+        before = (datetime.now(timezone.utc) - timedelta(days=AUDIT_RETENTION_DAYS)).strftime("%Y-%m-%dT%H:%M:%S")
+    batch = batch or AUDIT_PRUNE_BATCH
+    pause = AUDIT_PRUNE_PAUSE if pause is None else pause
+    flush_audit()
+    _ensure_db(path)
+    db_file = Path(path or audit_model.DB_PATH)
+    size_before = _db_size(db_file)
+    archive_path = None
+    sink = None
+    if archive:
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        suffix = "jsonl.gz" if fmt == "jsonl" else fmt
+        archive_path = Path(archive_dir or AUDIT_ARCHIVE_DIR) / f"audit_before_{before[:10]}_{stamp}.{suffix}"
+        sink = _sink(archive_path, fmt)
+    conn = _connect(path, isolation_level=None)
+    totals = {"runs": 0, "steps": 0, "blobs": 0, "batches": 0, "max_batch_lock_s": 0.0}
+    try:
+        while True:
+            run_ids = [r[0] for r in conn.execute(
+                "SELECT run_id FROM runs WHERE last_at < ? ORDER BY last_at LIMIT ?", (before, batch))]
+            if not run_ids:
+                break
+            if sink is not None:
+                _write_chunks(sink, iter_steps(run_ids=run_ids, path=path), EXPORT_CHUNK)
+            start = time.perf_counter()
+            steps, blobs = _delete_runs(conn, run_ids)
+            held = time.perf_counter() - start
+            metrics.observe("mcp_audit_prune_batch_seconds", held)
+            totals["runs"] += len(run_ids)
+            totals["steps"] += steps
+            totals["blobs"] += blobs
+            totals["batches"] += 1
+            totals["max_batch_lock_s"] = max(totals["max_batch_lock_s"], held)
+            if pause:
+                time.sleep(pause)
+    finally:
+        conn.close()
+        if sink is not None:
+            sink.close()
+    if archive_path is not None and not totals["runs"]:
+        archive_path.unlink(missing_ok=True)
+        archive_path = None
+    vacuum = vacuum_incremental(pause=pause, path=path)
+    return dict(totals, archive=str(archive_path) if archive_path else None, before=before,
+                freed_pages=vacuum["freed_pages"], bytes_before=size_before, bytes_after=_db_size(db_file))
+
+def _db_size(db_file):
+    return sum(p.stat().st_size for p in (db_file, Path(f"{db_file}-wal")) if p.exists())
+
+def vacuum_incremental(pages=None, pause=None, path=None):
+    """
+    Return free pages to the OS `pages` at a time (short transactions), then
+    truncate the WAL. Databases created before auto_vacuum=INCREMENTAL need a
+    one-off enable_incremental_vacuum().
+    """
+    pages = pages or AUDIT_VACUUM_PAGES
+    pause = AUDIT_PRUNE_PAUSE if pause is None else pause
+    _ensure_db(path)
+    conn = _connect(path, isolation_level=None)
+    try:
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        freed = 0
+        if mode == 2:
+            while True:
+                free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if not free:
+                    break
+                # executescript steps the pragma to completion (execute() frees a single page)
+                conn.executescript(f"PRAGMA incremental_vacuum({min(free, pages)});")
+                step = free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if step <= 0:
+                    break
+                freed += step
+                if pause:
+                    time.sleep(pause)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return {"auto_vacuum": {0: "none", 1: "full", 2: "incremental"}[mode], "freed_pages": freed,
+                "free_pages": conn.execute("PRAGMA freelist_count").fetchone()[0]}
+    finally:
+        conn.close()
+
+def enable_incremental_vacuum(path=None):
+    """One-off for databases created before auto_vacuum=INCREMENTAL: a full VACUUM (locks the DB while it runs)."""
+    flush_audit()
+    _ensure_db(path)
+    conn = _connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+def db_stats(path=None):
+    _ensure_db(path)
+    db_file = Path(path or audit_model.DB_PATH)
+    conn = _connect(path)
+    try:
+        q = lambda sql: conn.execute(sql).fetchone()[0]
+        return {"runs": q("SELECT COUNT(*) FROM runs"), "steps": q("SELECT COUNT(*) FROM audit_steps"),
+                "blobs": q("SELECT COUNT(*) FROM blobs"), "oldest": q("SELECT MIN(last_at) FROM runs"),
+                "newest": q("SELECT MAX(last_at) FROM runs"), "free_pages": q("PRAGMA freelist_count"),
+                "auto_vacuum": q("PRAGMA auto_vacuum"), "bytes": _db_size(db_file)}
+    finally:
+        conn.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export, archive and prune the audit DB.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    e = sub.add_parser("export", help="stream runs to JSONL(.gz) or Parquet")
+    e.add_argument("out")
+    e.add_argument("--since", help="ISO time, inclusive (runs' last step)")
+    e.add_argument("--until", help="ISO time, exclusive")
+    e.add_argument("--format", choices=["jsonl", "parquet"])
+    p = sub.add_parser("prune", help="archive and delete old runs, then incremental vacuum")
+    p.add_argument("--before", help="ISO time (default: now - AUDIT_RETENTION_DAYS)")
+    p.add_argument("--older-than-days", type=float)
+    p.add_argument("--no-archive", action="store_true")
+    p.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    p.add_argument("--batch", type=int, default=AUDIT_PRUNE_BATCH)
+    sub.add_parser("vacuum", help="incremental vacuum + WAL truncate")
+    sub.add_parser("enable-incremental-vacuum", help="one-off full VACUUM for old databases")
+    sub.add_parser("stats")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "export":
+        res = export_runs(args.out, args.since, args.until, args.format)
+    elif args.cmd == "prune":
+        before = args.before
+        if args.older_than_days is not None:
+            before = (datetime.now(timezone.utc) - timedelta(days=args.older_than_days)).strftime("%Y-%m-%dT%H:%M:%S")
+        res = prune(before, archive=not args.no_archive, fmt=args.format, batch=args.batch)
+    elif args.cmd == "vacuum":
+        res = vacuum_incremental()
+    elif args.cmd == "enable-incremental-vacuum":
+        res = {"incremental": enable_incremental_vacuum()}
+    else:
+        res = db_stats()
+    print(json.dumps(res, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,81 @@
+import os
+import asyncio
 import sqlite3
 import json
+import atexit
+import logging
+import threading
 from pathlib import Path
 from typing import List, Dict, Any
+import payload_codec
+import metrics
 
+# The schema is created on first use (see _ensure_db), not at import
 DB_PATH = Path("data/audit.db")
-DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-def _get_conn():
-    conn = sqlite3.connect(DB_PATH)
+# Buffered writer settings. AUDIT_BUFFERED=0 restores one connection + commit per step.
+AUDIT_BUFFERED = os.getenv("AUDIT_BUFFERED", "1") != "0"
+AUDIT_FLUSH_ROWS = int(os.getenv("AUDIT_FLUSH_ROWS", "64"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "0.5"))
+# Durability: PRAGMA synchronous (OFF | NORMAL | FULL | EXTRA) and journal_mode
+AUDIT_SYNCHRONOUS = os.getenv("AUDIT_SYNCHRONOUS", "NORMAL")
+AUDIT_JOURNAL_MODE = os.getenv("AUDIT_JOURNAL_MODE", "WAL")
+AUDIT_BUSY_TIMEOUT = float(os.getenv("AUDIT_BUSY_TIMEOUT", "30"))
+# Output payload storage: codec (json | zlib | zstd) and the encoded size above
+# which payloads go to the content-addressed blobs table (0 = never)
+AUDIT_CODEC = os.getenv("AUDIT_CODEC", "json")
+AUDIT_BLOB_THRESHOLD = int(os.getenv("AUDIT_BLOB_THRESHOLD", "0"))
+
+log = logging.getLogger(__name__)
+
+_INSERT_STEP = """
+    INSERT INTO audit_steps (run_id, step_index, name, tool, input_json, output_json, duration, created_at, meta_json,
+                             output_codec, output_ref)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_BLOB = "INSERT OR IGNORE INTO blobs (hash, codec, data, size) VALUES (?, ?, ?, ?)"
+
+_ready = set()  # DB paths whose schema is known to be in place
+_ready_lock = threading.Lock()
+
+def _connect(path=None, **kwargs):
+    conn = sqlite3.connect(path or DB_PATH, timeout=AUDIT_BUSY_TIMEOUT, **kwargs)
     conn.row_factory = sqlite3.Row
     return conn
 
-def init_db():
-    conn = _get_conn()
+def _ensure_db(path=None):
+    """Create the directory and schema the first time a DB path is used."""
+    key = str(path or DB_PATH)
+    if key in _ready:
+        return
+    with _ready_lock:
+        if key not in _ready:
+            init_db(key)
+
+def _get_conn():
+    _ensure_db()
+    return _connect()
+
+def open_reader(path=None):
+    """
+    Long-lived read-only connection usable from any thread (e.g. held in
+    st.cache_resource); pass it as `conn` to get_trace/list_runs.
+    """
+    _ensure_db(path)
+    conn = _connect(path, check_same_thread=False)
+    conn.execute("PRAGMA query_only=1")
+    return conn
+
+def init_db(path=None):
+    path = Path(path or DB_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = _connect(path)
     cur = conn.cursor()
+    # only takes effect on a new, empty file; lets retention free pages with incremental_vacuum
+    cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    # journal_mode is persistent per database file
+    cur.execute(f"PRAGMA journal_mode={AUDIT_JOURNAL_MODE}")
     cur.execute("""
     CREATE TABLE IF NOT EXISTS audit_steps (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -24,56 +86,352 @@ def init_db():
         input_json TEXT,
         output_json TEXT,
         duration REAL,
-        created_at TEXT
+        created_at TEXT,
+        meta_json TEXT
+    )
+    """)
+    # migrate databases created before meta_json existed
+    cols = {r["name"] for r in cur.execute("PRAGMA table_info(audit_steps)")}
+    if "meta_json" not in cols:
+        cur.execute("ALTER TABLE audit_steps ADD COLUMN meta_json TEXT")
+    # output_codec: NULL/"json" = plain JSON text, else encoded bytes; output_ref: blobs.hash
+    if "output_codec" not in cols:
+        cur.execute("ALTER TABLE audit_steps ADD COLUMN output_codec TEXT")
+    if "output_ref" not in cols:
+        cur.execute("ALTER TABLE audit_steps ADD COLUMN output_ref TEXT")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS blobs (
+        hash TEXT PRIMARY KEY,
+        codec TEXT,
+        data BLOB,
+        size INTEGER
     )
     """)
+    # per-run summary, maintained on write so list_runs never scans audit_steps
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY,
+        ticker TEXT,
+        started_at TEXT,
+        last_at TEXT,
+        steps INTEGER
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_steps_run ON audit_steps (run_id, step_index)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_steps_ref ON audit_steps (output_ref) WHERE output_ref IS NOT NULL")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_runs_last ON runs (last_at DESC, run_id DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_runs_ticker_last ON runs (ticker, last_at DESC, run_id DESC)")
+    if cur.execute("PRAGMA user_version").fetchone()[0] < 1:
+        _backfill_runs(cur)
+        cur.execute("PRAGMA user_version = 1")
     conn.commit()
     conn.close()
+    _ready.add(str(path))
 
-def save_audit_step(run_id, step_index, name, tool, input_obj, output_obj, duration, created_at):
-    conn = _get_conn()
-    cur = conn.cursor()
+def _backfill_runs(cur):
+    # migration for databases written before the runs table existed
     cur.execute("""
-        INSERT INTO audit_steps (run_id, step_index, name, tool, input_json, output_json, duration, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+        INSERT OR IGNORE INTO runs (run_id, ticker, started_at, last_at, steps)
+        SELECT run_id, UPPER(MAX(json_extract(input_json, '$.ticker'))), MIN(created_at), MAX(created_at), MAX(step_index)
+        FROM audit_steps GROUP BY run_id
+    """)
+
+_UPSERT_RUN = """
+    INSERT INTO runs (run_id, ticker, started_at, last_at, steps) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(run_id) DO UPDATE SET
+        ticker = COALESCE(runs.ticker, excluded.ticker),
+        started_at = MIN(runs.started_at, excluded.started_at),
+        last_at = MAX(runs.last_at, excluded.last_at),
+        steps = MAX(runs.steps, excluded.steps)
+"""
+
+def _ticker_of(input_json):
+    try:
+        obj = json.loads(input_json)
+    except (TypeError, ValueError):
+        return None
+    ticker = obj.get("ticker") if isinstance(obj, dict) else None
+    return ticker.upper() if isinstance(ticker, str) else None
+
+def _insert_rows(conn, rows):
+    """Insert step rows and update their runs summaries; caller owns the transaction."""
+    blobs = [r[11] for r in rows if r[11] is not None]
+    if blobs:
+        conn.executemany(_INSERT_BLOB, blobs)
+    conn.executemany(_INSERT_STEP, [r[:11] for r in rows])
+    runs = {}
+    for run_id, step_index, _, _, input_json, _, _, created_at, *_ in rows:
+        r = runs.get(run_id)
+        if r is None:
+            runs[run_id] = [run_id, _ticker_of(input_json), created_at, created_at, step_index]
+            continue
+        if r[1] is None:
+            r[1] = _ticker_of(input_json)
+        r[2] = min(r[2], created_at)
+        r[3] = max(r[3], created_at)
+        r[4] = max(r[4], step_index)
+    conn.executemany(_UPSERT_RUN, list(runs.values()))
+
+def _is_busy(e) -> bool:
+    """True for the transient lock errors that are worth retrying."""
+    msg = str(e).lower()
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in msg or "busy" in msg)
+
+class AuditWriter:
+    """
+    Single-connection audit writer. Rows are buffered and inserted with one
+    transaction per flush; a background thread flushes every `flush_interval`
+    seconds or as soon as `flush_rows` rows are pending. Call flush() to force
+    a write (e.g. at the end of a run) and close() on shutdown.
+    """
+
+    def __init__(self, db_path=None, flush_rows=None, flush_interval=None, synchronous=None):
+        self.db_path = Path(db_path or DB_PATH)
+        self.flush_rows = flush_rows or AUDIT_FLUSH_ROWS
+        self.flush_interval = flush_interval or AUDIT_FLUSH_INTERVAL
+        _ensure_db(self.db_path)
+        self._conn = sqlite3.connect(self.db_path, timeout=AUDIT_BUSY_TIMEOUT, check_same_thread=False)
+        self._conn.execute(f"PRAGMA journal_mode={AUDIT_JOURNAL_MODE}")
+        self._conn.execute(f"PRAGMA synchronous={synchronous or AUDIT_SYNCHRONOUS}")
+        self._buf_lock = threading.Lock()
+        self._conn_lock = threading.Lock()
+        self._buf = []
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, row):
+        with self._buf_lock:
+            if self._closed:
+                raise RuntimeError("AuditWriter is closed")
+            self._buf.append(row)
+            pending = len(self._buf)
+        if pending >= self.flush_rows:
+            self._wake.set()
+
+    def pending(self) -> int:
+        with self._buf_lock:
+            return len(self._buf)
+
+    def flush(self) -> int:
+        """Write all buffered rows in one transaction. Returns the number of rows written."""
+        with self._conn_lock:
+            with self._buf_lock:
+                rows, self._buf = self._buf, []
+            if not rows:
+                return 0
+            try:
+                with metrics.timer("mcp_audit_flush_seconds"), self._conn:
+                    _insert_rows(self._conn, rows)
+            except Exception as e:
+                if _is_busy(e):
+                    self._requeue(rows)
+                    raise
+                # retrying would fail the same way: write row by row and drop the ones that fail
+                log.warning("audit flush failed, writing rows one by one: %s", e)
+                return self._write_each(rows)
+            return len(rows)
+
+    def _write_each(self, rows) -> int:
+        written = 0
+        for i, row in enumerate(rows):
+            try:
+                with self._conn:
+                    _insert_rows(self._conn, [row])
+            except Exception as e:
+                if _is_busy(e):
+                    self._requeue(rows[i:])
+                    raise
+                log.error("dropping audit step %r/%r: %s", row[0], row[1], e)
+                metrics.inc("mcp_audit_dropped_rows_total")
+                continue
+            written += 1
+        return written
+
+    def _requeue(self, rows):
+        # put rows back in front so nothing is lost; the next flush retries
+        with self._buf_lock:
+            self._buf[:0] = rows
+
+    def _loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.OperationalError as e:
+                log.warning("audit flush failed, will retry: %s", e)
+
+    def close(self):
+        with self._buf_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self._conn.close()
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer() -> AuditWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AuditWriter()
+        return _writer
+
+def flush_audit():
+    """Flush buffered audit rows, if a writer is active."""
+    if _writer is not None:
+        _writer.flush()
+
+def close_audit_writer():
+    global _writer
+    with _writer_lock:
+        w, _writer = _writer, None
+    if w is not None:
+        w.close()
+
+atexit.register(close_audit_writer)
+
+def _encode_output(output_obj):
+    """Returns (output_json, output_codec, output_ref, blob_row) for an output payload."""
+    data, codec = payload_codec.encode(output_obj, AUDIT_CODEC)
+    if AUDIT_BLOB_THRESHOLD and len(data) > AUDIT_BLOB_THRESHOLD:
+        h = payload_codec.content_hash(data)
+        return None, codec, h, (h, codec, data, len(data))
+    return data, (None if codec == "json" else codec), None, None
+
+def _step_row(run_id, step_index, name, tool, input_obj, output_obj, duration, created_at, meta=None):
+    output_data, output_codec, output_ref, blob = _encode_output(output_obj)
+    return (
         run_id,
         step_index,
         name,
         tool,
         json.dumps(input_obj),
-        json.dumps(output_obj),
+        output_data,
         duration,
-        created_at
-    ))
-    conn.commit()
-    conn.close()
+        created_at,
+        json.dumps(meta) if meta else None,
+        output_codec,
+        output_ref,
+        blob
+    )
 
-def get_trace(run_id):
+def save_audit_step(run_id, step_index, name, tool, input_obj, output_obj, duration, created_at, meta=None):
+    row = _step_row(run_id, step_index, name, tool, input_obj, output_obj, duration, created_at, meta)
+    if AUDIT_BUFFERED:
+        get_writer().write(row)
+        return
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM audit_steps WHERE run_id = ? ORDER BY step_index", (run_id,))
-    rows = cur.fetchall()
+    with conn:
+        _insert_rows(conn, [row])
     conn.close()
-    output = []
-    for r in rows:
-        output.append({
-            "step_index": r["step_index"],
-            "name": r["name"],
-            "tool": r["tool"],
-            "input": json.loads(r["input_json"]),
-            "output": json.loads(r["output_json"]),
-            "duration": r["duration"],
-            "created_at": r["created_at"]
-        })
-    return output
-
-def list_runs(limit=20):
+
+def _decode_output(r):
+    if r["output_ref"] is not None:
+        return payload_codec.decode(r["blob_data"], r["blob_codec"])
+    return payload_codec.decode(r["output_json"], r["output_codec"])
+
+async def save_audit_step_async(*args, **kwargs):
+    """save_audit_step for event loops: buffered rows are queued without blocking, direct writes go to a thread."""
+    if AUDIT_BUFFERED:
+        save_audit_step(*args, **kwargs)
+    else:
+        await asyncio.to_thread(save_audit_step, *args, **kwargs)
+
+async def flush_audit_async():
+    await asyncio.to_thread(flush_audit)
+
+def _step_dict(r):
+    return {
+        "step_index": r["step_index"],
+        "name": r["name"],
+        "tool": r["tool"],
+        "input": json.loads(r["input_json"]),
+        "output": _decode_output(r),
+        "duration": r["duration"],
+        "created_at": r["created_at"],
+        "meta": json.loads(r["meta_json"]) if r["meta_json"] else {}
+    }
+
+def _fetchall(sql, args, conn=None):
+    if conn is not None:
+        return conn.execute(sql, args).fetchall()
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT run_id, MAX(created_at) as last_at, MAX(step_index) as steps FROM audit_steps GROUP BY run_id ORDER BY last_at DESC LIMIT ?", (limit,))
-    rows = cur.fetchall()
-    conn.close()
-    return [{"run_id": r["run_id"], "last_at": r["last_at"], "steps": r["steps"]} for r in rows]
+    try:
+        return conn.execute(sql, args).fetchall()
+    finally:
+        conn.close()
+
+def audit_version(conn=None):
+    """
+    (oldest, newest) audit step id, (0, 0) when empty: changes whenever any
+    process writes a step or retention deletes old runs, so UI query caches
+    can key on it. Two rowid lookups.
+    """
+    flush_audit()
+    # separate subqueries: SQLite only uses the rowid shortcut for a lone MIN/MAX
+    row = _fetchall("SELECT (SELECT MIN(id) FROM audit_steps), (SELECT MAX(id) FROM audit_steps)", [], conn)[0]
+    return (row[0] or 0, row[1] or 0)
+
+def get_trace(run_id, name=None, tool=None, min_step=None, max_step=None, conn=None):
+    """Steps of one run in order, optionally filtered by step name, tool and step_index range."""
+    flush_audit()
+    sql = """SELECT s.*, b.data AS blob_data, b.codec AS blob_codec
+             FROM audit_steps s LEFT JOIN blobs b ON b.hash = s.output_ref
+             WHERE s.run_id = ?"""
+    args = [run_id]
+    if name is not None:
+        sql += " AND s.name = ?"
+        args.append(name)
+    if tool is not None:
+        sql += " AND s.tool = ?"
+        args.append(tool)
+    if min_step is not None:
+        sql += " AND s.step_index >= ?"
+        args.append(min_step)
+    if max_step is not None:
+        sql += " AND s.step_index <= ?"
+        args.append(max_step)
+    rows = _fetchall(sql + " ORDER BY s.step_index", args, conn)
+    return [_step_dict(r) for r in rows]
+
+def _encode_cursor(last_at, run_id):
+    return f"{last_at}|{run_id}"
+
+def _decode_cursor(cursor):
+    last_at, _, run_id = cursor.partition("|")
+    return last_at, run_id
+
+def list_runs_page(cursor=None, limit=20, ticker=None, since=None, conn=None):
+    """
+    Keyset-paginated runs, newest first. Pass the returned `next_cursor`
+    to fetch the following page; it is None on the last page.
+    `since` is an ISO timestamp lower bound on last_at.
+    """
+    flush_audit()
+    sql = "SELECT run_id, ticker, started_at, last_at, steps FROM runs WHERE 1=1"
+    args = []
+    if ticker is not None:
+        sql += " AND ticker = ?"
+        args.append(ticker.upper())
+    if since is not None:
+        sql += " AND last_at >= ?"
+        args.append(since)
+    if cursor:
+        last_at, run_id = _decode_cursor(cursor)
+        sql += " AND (last_at < ? OR (last_at = ? AND run_id < ?))"
+        args += [last_at, last_at, run_id]
+    sql += " ORDER BY last_at DESC, run_id DESC LIMIT ?"
+    args.append(limit)
+    runs = [dict(r) for r in _fetchall(sql, args, conn)]
+    next_cursor = _encode_cursor(runs[-1]["last_at"], runs[-1]["run_id"]) if len(runs) == limit else None
+    return {"runs": runs, "next_cursor": next_cursor}
 
-init_db()
+def list_runs(limit=20, cursor=None, ticker=None, since=None, conn=None):
+    return list_runs_page(cursor, limit, ticker, since, conn)["runs"]
@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import json
+import threading
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from local_orchestrator import run_analysis
+from utils import make_run_id, now_iso
+import metrics
+
+BATCH_DIR = Path(os.getenv("BATCH_DIR", "data/batches"))
+
+def _analyze_one(ticker, params, tool_pool, llm_gate):
+    start = time.perf_counter()
+    try:
+        resp = run_analysis(ticker, params, tool_pool=tool_pool, llm_gate=llm_gate)
+        result = resp.get("result") or {}
+        errors = [s["name"] for s in resp["trace"] if isinstance(s.get("output"), dict) and "error" in s["output"]]
+        return {
+            "ticker": ticker,
+            "ok": True,
+            "run_id": resp["run_id"],
+            "mock": bool(result.get("mock")),
+            "tool_errors": errors,
+            "result": result,
+            "duration": time.perf_counter() - start,
+        }
+    except Exception as e:
+        return {"ticker": ticker, "ok": False, "run_id": None, "error": f"{type(e).__name__}: {e}", "duration": time.perf_counter() - start}
+
+def iter_batch_analysis(tickers, params={}, max_workers=16, max_inflight_llm=4):
+    """
+    Analyse many tickers at once and yield one result dict per ticker as it finishes.
+    Tool calls share a pool of `max_workers` threads; at most `max_inflight_llm`
+    LLM calls run at the same time.
+    """
+    tickers = [t.strip().upper() for t in tickers if t and t.strip()]
+    llm_gate = threading.BoundedSemaphore(max_inflight_llm)
+    # Pipelines block on tools or on the LLM gate, so allow enough of them to
+    # keep both stages busy.
+    n_pipelines = max(1, max_workers + max_inflight_llm)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-tool") as tool_pool, \
+         ThreadPoolExecutor(max_workers=n_pipelines, thread_name_prefix="batch-run") as run_pool:
+        futures = [run_pool.submit(_analyze_one, t, params, tool_pool, llm_gate) for t in tickers]
+        for fut in as_completed(futures):
+            yield fut.result()
+
+def write_batch_summary(summary, batch_dir=None):
+    batch_dir = Path(batch_dir or BATCH_DIR)
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    path = batch_dir / f"{summary['batch_id']}.json"
+    path.write_text(json.dumps(summary, indent=2))
+    return path
+
+def run_batch_analysis(tickers, params={}, max_workers=16, max_inflight_llm=4, on_result=None, batch_id=None):
+    """
+    Run `iter_batch_analysis`, call `on_result(result)` for each finished ticker
+    and write a single batch summary JSON. Returns the summary dict.
+    """
+    if batch_id is None:
+        batch_id = make_run_id("batch")
+    started_at = now_iso()
+    start = time.perf_counter()
+    runs = []
+    for res in iter_batch_analysis(tickers, params, max_workers, max_inflight_llm):
+        if on_result is not None:
+            on_result(res)
+        runs.append({k: v for k, v in res.items() if k != "result"})
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        "batch_id": batch_id,
+        "started_at": started_at,
+        "finished_at": now_iso(),
+        "params": params,
+        "max_workers": max_workers,
+        "max_inflight_llm": max_inflight_llm,
+        "total": len(runs),
+        "ok": sum(1 for r in runs if r["ok"]),
+        "failed": sum(1 for r in runs if not r["ok"]),
+        "mock": sum(1 for r in runs if r.get("mock")),
+        "elapsed": elapsed,
+        "tickers_per_sec": (len(runs) / elapsed) if elapsed > 0 else 0.0,
+        "runs": runs,
+    }
+    summary["summary_path"] = str(write_batch_summary(summary))
+    return summary
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run the MCP pipeline over a watchlist.")
+    ap.add_argument("tickers", nargs="*", help="tickers to analyse")
+    ap.add_argument("--file", help="watchlist file, one ticker per line")
+    ap.add_argument("--period", default="1mo")
+    ap.add_argument("--workers", type=int, default=16, help="max concurrent tool calls")
+    ap.add_argument("--llm-inflight", type=int, default=4, help="max concurrent LLM calls")
+    args = ap.parse_args(argv)
+
+    tickers = list(args.tickers)
+    if args.file:
+        tickers += [line.strip() for line in Path(args.file).read_text().splitlines() if line.strip() and not line.startswith("#")]
+    if not tickers:
+        ap.error("no tickers given")
+
+    def _print(res):
+        status = "ok" if res["ok"] else f"FAILED ({res.get('error')})"
+        print(f"{res['ticker']:<8} {status:<10} run={res['run_id']} {res['duration']:.2f}s", flush=True)
+
+    summary = run_batch_analysis(tickers, {"period": args.period}, args.workers, args.llm_inflight, on_result=_print)
+    print(f"\n{summary['ok']}/{summary['total']} ok in {summary['elapsed']:.2f}s "
+          f"({summary['tickers_per_sec']:.1f} tickers/sec) -> {summary['summary_path']}")
+    if metrics.METRICS_FILE:
+        print(f"metrics -> {metrics.write_prometheus()}")
+    return 0 if summary["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Requests/sec and latency percentiles for the HTTP API (api.py) under
+uvicorn, over keep-alive connections.
+
+    python benchmarks/bench_api.py --workers 1 4 --requests 5000 --concurrency 64
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import tempfile
+import argparse
+import subprocess
+from pathlib import Path
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+HEADERS = {"X-API-KEY": "bench-key"}
+
+SCENARIOS = {
+    "manifest": ("GET", "/mcp/manifest", None),
+    "list_runs": ("POST", "/mcp/rpc", {"id": 1, "method": "audit.list_runs", "params": {"limit": 20}}),
+    "tool.call": ("POST", "/mcp/rpc", {"id": 1, "method": "tool.call",
+                                       "params": {"tool": "get_quote", "args": {"symbol": "AAPL"}}}),
+    "batch x10": ("POST", "/mcp/rpc", [{"id": i, "method": "tool.call",
+                                        "params": {"tool": "get_fundamentals", "args": {"symbol": f"T{i}"}}}
+                                       for i in range(10)]),
+}
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workers, cwd):
+    port = _free_port()
+    env = dict(os.environ, MCP_API_KEYS="bench-key", RATE_LIMIT_PER_MIN="100000000",
+               PYTHONPATH=str(ROOT), GROQ_API_KEY="")
+    proc = subprocess.Popen([sys.executable, str(ROOT / "api.py"), "--port", str(port), "--workers", str(workers)],
+                            cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(url + "/healthz").status_code == 200:
+                return proc, url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+def _raw_request(method, path, body, host):
+    data = json.dumps(body).encode() if body is not None else b""
+    head = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nX-API-KEY: {HEADERS['X-API-KEY']}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n")
+    return head.encode() + data
+
+async def _read_response(reader):
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    await reader.readexactly(length)
+    return status
+
+async def drive(url, method, path, body, total, concurrency):
+    """
+    `concurrency` keep-alive connections issuing requests back to back. A minimal
+    HTTP/1.1 client keeps load-generator CPU well below the server's.
+    """
+    host, port = url.split("//")[1].split(":")
+    request = _raw_request(method, path, body, host)
+    latencies = []
+    errors = 0
+    remaining = total
+    conns = [await asyncio.open_connection(host, int(port)) for _ in range(concurrency)]
+
+    async def worker(reader, writer):
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            t0 = time.perf_counter()
+            writer.write(request)
+            status = await _read_response(reader)
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(r, w) for r, w in conns))
+    elapsed = time.perf_counter() - start
+    for _, w in conns:
+        w.close()
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return total / elapsed, pct(0.5), pct(0.99), errors
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    ap.add_argument("--requests", type=int, default=5000)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--scenarios", nargs="+", default=list(SCENARIOS))
+    args = ap.parse_args(argv)
+
+    print(f"{args.requests} requests per scenario, {args.concurrency} keep-alive connections")
+    print(f"{'workers':>7} {'scenario':>10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            proc, url = start_server(workers, tmp)
+            try:
+                for name in args.scenarios:
+                    method, path, body = SCENARIOS[name]
+                    asyncio.run(drive(url, method, path, body, min(200, args.requests), args.concurrency))  # warm-up
+                    rps, p50, p99, errors = asyncio.run(drive(url, method, path, body, args.requests, args.concurrency))
+                    print(f"{workers:>7} {name:>10} {rps:>8.0f} {p50:>8.1f} {p99:>8.1f} {errors:>6}")
+            finally:
+                proc.terminate()
+                proc.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Audit write throughput: one connection + commit per step (AUDIT_BUFFERED=0)
+versus the buffered single-connection AuditWriter.
+
+    python benchmarks/bench_audit.py --rows 5000 --threads 8
+"""
+import sys
+import time
+import tempfile
+import argparse
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import audit_model
+
+HISTORY = [{"day": i, "price": 100 + i * 0.4} for i in range(20)]
+
+def _write_rows(save, n, offset):
+    for i in range(n):
+        save(f"bench_{(offset + i) // 4}", i % 4, "history", "history_tool", {"ticker": "AAPL"}, HISTORY, 0.3, "2026-01-01T00:00:00Z")
+
+def _run(save, rows, threads):
+    per = rows // threads
+    ts = [threading.Thread(target=_write_rows, args=(save, per, t * per)) for t in range(threads)]
+    start = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    audit_model.flush_audit()
+    return per * threads / (time.perf_counter() - start)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--threads", type=int, default=8)
+    args = ap.parse_args(argv)
+
+    for label, buffered, sync in [("per-step commit (legacy)", False, "FULL"),
+                                  ("buffered writer, synchronous=NORMAL", True, "NORMAL"),
+                                  ("buffered writer, synchronous=FULL", True, "FULL")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            audit_model.close_audit_writer()
+            audit_model.DB_PATH = Path(tmp) / "audit.db"
+            audit_model.AUDIT_BUFFERED = buffered
+            audit_model.AUDIT_SYNCHRONOUS = sync
+            # legacy path: default rollback journal, as before this change
+            audit_model.AUDIT_JOURNAL_MODE = "WAL" if buffered else "DELETE"
+            audit_model.init_db()
+            rate = _run(audit_model.save_audit_step, args.rows, args.threads)
+            audit_model.close_audit_writer()
+            print(f"{label:<40} {rate:>10.0f} rows/sec")
+
+if __name__ == "__main__":
+    main()
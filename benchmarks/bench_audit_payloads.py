@@ -0,0 +1,69 @@
+"""
+Disk size and get_trace latency for the audit payload codecs on 5y history.
+
+    python benchmarks/bench_audit_payloads.py --runs 500
+"""
+import sys
+import time
+import random
+import tempfile
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import audit_model
+
+def _history(seed, days=1260):
+    rnd = random.Random(seed)
+    price, out = 100.0, []
+    for i in range(days):
+        price *= 1 + rnd.gauss(0, 0.015)
+        out.append({"day": i, "price": price})
+    return out
+
+def _llm_raw(seed):
+    text = f"Analysis {seed}: " + "The stock shows steady momentum with moderate volatility. " * 30
+    return {"mock": False, "text": text, "raw": {"choices": [{"message": {"content": text}}], "usage": {"total_tokens": 900}}}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=500)
+    ap.add_argument("--distinct-histories", type=int, default=50,
+                    help="how many different history payloads (the rest repeat, as with cached tools)")
+    args = ap.parse_args(argv)
+    audit_model.AUDIT_BUFFERED = True
+
+    print(f"{args.runs} runs, 5y daily history")
+    print(f"{'config':<24} {'db size':>10} {'write s':>8} {'trace ms':>9}")
+    configs = [("json (legacy)", "json", 0), ("zlib", "zlib", 0), ("zlib + blobs >4KB", "zlib", 4096)]
+    if "zstd" in audit_model.payload_codec.available_codecs():
+        configs.append(("zstd + blobs >4KB", "zstd", 4096))
+    histories = [_history(i) for i in range(args.distinct_histories)]
+    for label, codec, threshold in configs:
+        with tempfile.TemporaryDirectory() as tmp:
+            audit_model.close_audit_writer()
+            audit_model.DB_PATH = Path(tmp) / "audit.db"
+            audit_model.AUDIT_CODEC = codec
+            audit_model.AUDIT_BLOB_THRESHOLD = threshold
+            audit_model.init_db()
+            start = time.perf_counter()
+            for r in range(args.runs):
+                run_id = f"run_{r:05d}"
+                audit_model.save_audit_step(run_id, 0, "history", "history_tool", {"ticker": "AAPL"},
+                                            histories[r % len(histories)], 0.3, "2026-01-01T00:00:00Z")
+                audit_model.save_audit_step(run_id, 1, "llm_analysis", "gpt-oss-120b", {}, _llm_raw(r), 2.0, "2026-01-01T00:00:01Z")
+            audit_model.close_audit_writer()
+            write_s = time.perf_counter() - start
+            conn = audit_model.sqlite3.connect(audit_model.DB_PATH)
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+            conn.close()
+            size = audit_model.DB_PATH.stat().st_size
+            start = time.perf_counter()
+            for r in range(0, args.runs, max(1, args.runs // 100)):
+                audit_model.get_trace(f"run_{r:05d}")
+            trace_ms = (time.perf_counter() - start) * 1000 / len(range(0, args.runs, max(1, args.runs // 100)))
+            print(f"{label:<24} {size / 1e6:>8.1f}MB {write_s:>8.2f} {trace_ms:>9.2f}")
+
+if __name__ == "__main__":
+    main()
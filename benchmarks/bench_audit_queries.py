@@ -0,0 +1,84 @@
+"""
+Audit query latency as the table grows: legacy GROUP BY list_runs and
+unindexed get_trace versus the runs summary table + keyset pagination.
+
+    python benchmarks/bench_audit_queries.py --sizes 10000 100000 1000000
+"""
+import sys
+import time
+import sqlite3
+import tempfile
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import audit_model
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOG", "META", "TSLA", "AMD"]
+
+def _fill(n_steps, batch=20000):
+    conn = sqlite3.connect(audit_model.DB_PATH)
+    rows = []
+    for i in range(n_steps):
+        run, step = divmod(i, 4)
+        ts = f"2026-01-01T00:00:00.{run:09d}Z"
+        rows.append(audit_model._step_row(f"run_{run:08d}", step, "quote", "quote_tool",
+                                          {"ticker": TICKERS[run % len(TICKERS)]}, {"price": 1}, 0.1, ts))
+        if len(rows) >= batch:
+            with conn:
+                audit_model._insert_rows(conn, rows)
+            rows = []
+    if rows:
+        with conn:
+            audit_model._insert_rows(conn, rows)
+    conn.close()
+
+def _time(fn, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def _legacy_list_runs(limit=50):
+    conn = sqlite3.connect(audit_model.DB_PATH)
+    conn.execute("SELECT run_id, MAX(created_at) as last_at, MAX(step_index) as steps FROM audit_steps "
+                 "GROUP BY run_id ORDER BY last_at DESC LIMIT ?", (limit,)).fetchall()
+    conn.close()
+
+def _legacy_get_trace(run_id):
+    # NOT INDEXED reproduces the old schema, which had no index on run_id
+    conn = sqlite3.connect(audit_model.DB_PATH)
+    conn.execute("SELECT * FROM audit_steps NOT INDEXED WHERE run_id = ? ORDER BY step_index", (run_id,)).fetchall()
+    conn.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = ap.parse_args(argv)
+    audit_model.AUDIT_BUFFERED = False
+
+    print(f"{'steps':>10} {'legacy list':>12} {'list page':>10} {'deep page':>10} {'by ticker':>10} "
+          f"{'legacy trace':>13} {'trace':>8}   (ms, best of N)")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            audit_model.DB_PATH = Path(tmp) / "audit.db"
+            audit_model.init_db()
+            _fill(n)
+            mid = f"run_{n // 8:08d}"
+            deep = audit_model.list_runs_page(limit=50, since="2026")
+            for _ in range(20):
+                deep = audit_model.list_runs_page(cursor=deep["next_cursor"], limit=50)
+            results = [
+                _time(_legacy_list_runs, 3),
+                _time(lambda: audit_model.list_runs(limit=50)),
+                _time(lambda: audit_model.list_runs(limit=50, cursor=deep["next_cursor"])),
+                _time(lambda: audit_model.list_runs(limit=50, ticker="NVDA")),
+                _time(lambda: _legacy_get_trace(mid), 3),
+                _time(lambda: audit_model.get_trace(mid)),
+            ]
+            print(f"{n:>10} " + " ".join(f"{v:>{w}.2f}" for v, w in zip(results, [12, 10, 10, 10, 13, 8])))
+
+if __name__ == "__main__":
+    main()
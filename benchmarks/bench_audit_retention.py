@@ -0,0 +1,109 @@
+"""
+Audit export and retention on a populated DB:
+  - export: streaming cursor (export_runs) versus fetchall + dump, peak Python memory
+  - prune: batched deletes versus one transaction, with a writer flushing audit
+    rows every few ms alongside; reports the writer's worst flush stall and the
+    DB size before/after incremental vacuum.
+
+    python benchmarks/bench_audit_retention.py --runs 20000
+"""
+import sys
+import json
+import time
+import tempfile
+import argparse
+import threading
+import tracemalloc
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import audit_model
+import audit_archive
+
+def _populate(runs):
+    payload = [{"day": i, "price": 100.0 + i * 0.37} for i in range(21)]
+    for i in range(runs):
+        ts = f"2026-{1 + i * 12 // runs:02d}-01T00:00:00.{i:06d}Z"
+        run = f"run_{i:06d}"
+        for step, out in enumerate(({"price": i}, payload, {"pe_ratio": 20.0}, {"text": f"analysis {i} " * 60})):
+            audit_model.save_audit_step(run, step, f"s{step}", "tool", {"ticker": f"T{i % 500}"}, out, 0.1, ts)
+    audit_model.flush_audit()
+
+def _peak(fn):
+    """(seconds, peak traced MB); timed on a separate run since tracemalloc slows allocation."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+def _fetchall_export(out):
+    conn = audit_model._connect()
+    rows = conn.execute(audit_archive._STEPS_SQL + " ORDER BY r.last_at, r.run_id, s.step_index").fetchall()
+    conn.close()
+    with open(out, "w") as f:
+        for r in rows:
+            f.write(json.dumps(audit_archive._record(r)) + "\n")
+
+def _prune_with_writer(batch, before):
+    stalls, stop = [], threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            audit_model.save_audit_step(f"live_{i:06d}", 0, "s", "t", {"ticker": "LIVE"}, {"i": i}, 0.1,
+                                        "2027-01-01T00:00:00Z")
+            start = time.perf_counter()
+            audit_model.flush_audit()
+            stalls.append(time.perf_counter() - start)
+            i += 1
+            time.sleep(0.005)
+    t = threading.Thread(target=writer)
+    t.start()
+    try:
+        start = time.perf_counter()
+        res = audit_archive.prune(before, archive=False, batch=batch)
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        t.join()
+    return res, elapsed, max(stalls) * 1000
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=20000)
+    ap.add_argument("--batch", type=int, default=500)
+    args = ap.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        audit_model.DB_PATH = tmp / "audit.db"
+        _populate(args.runs)
+        print(f"{args.runs} runs / {args.runs * 4} steps, {audit_archive.db_stats()['bytes'] / 1e6:.1f} MB")
+
+        print(f"\n{'export':<18} {'seconds':>8} {'peak MB':>8}")
+        for name, fn in (("fetchall + dump", lambda: _fetchall_export(tmp / "a.jsonl")),
+                         ("streaming cursor", lambda: audit_archive.export_runs(tmp / "b.jsonl"))):
+            elapsed, peak = _peak(fn)
+            print(f"{name:<18} {elapsed:>8.2f} {peak:>8.1f}")
+
+        print(f"\n{'prune 75% of runs':<18} {'seconds':>8} {'writer max stall ms':>20} {'MB before':>10} {'MB after':>9}")
+        backup = tmp / "backup.db"
+        src = audit_model._connect()
+        dst = audit_model.sqlite3.connect(backup)
+        src.backup(dst)
+        src.close()
+        dst.close()
+        for name, batch in ((f"batch {args.batch}", args.batch), ("one transaction", 10 ** 9)):
+            audit_model.close_audit_writer()
+            audit_model.DB_PATH = tmp / f"prune_{batch}.db"
+            audit_model.DB_PATH.write_bytes(backup.read_bytes())
+            res, elapsed, stall = _prune_with_writer(batch, "2026-10-01")
+            print(f"{name:<18} {elapsed:>8.2f} {stall:>20.1f} {res['bytes_before'] / 1e6:>10.1f} "
+                  f"{res['bytes_after'] / 1e6:>9.1f}")
+        audit_model.close_audit_writer()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Throughput of run_batch_analysis on the mocked tools.
+
+    python benchmarks/bench_batch.py --tickers 200 --llm-latency 0.5
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import local_orchestrator
+from batch_runner import run_batch_analysis
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, default=200)
+    ap.add_argument("--llm-latency", type=float, default=0.5, help="simulated LLM call latency (s)")
+    ap.add_argument("--workers", type=int, nargs="+", default=[8, 32, 64])
+    ap.add_argument("--llm-inflight", type=int, nargs="+", default=[4, 16])
+    args = ap.parse_args(argv)
+
+    def fake_llm(prompt):
+        time.sleep(args.llm_latency)
+        return {"mock": True, "text": "bench", "raw": None}
+    local_orchestrator.make_llm_call = fake_llm
+
+    tickers = [f"T{i:04d}" for i in range(args.tickers)]
+    serial_estimate = args.tickers * (0.65 + args.llm_latency)
+    print(f"{args.tickers} tickers, llm_latency={args.llm_latency}s (serial estimate {serial_estimate:.0f}s)")
+    print(f"{'workers':>8} {'llm':>5} {'elapsed':>9} {'tickers/s':>10}")
+    for w in args.workers:
+        for l in args.llm_inflight:
+            s = run_batch_analysis(tickers, {"period": "1y"}, max_workers=w, max_inflight_llm=l)
+            print(f"{w:>8} {l:>5} {s['elapsed']:>8.2f}s {s['tickers_per_sec']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+History requests through the incremental store versus refetching the whole
+window every call: widening windows (1m -> 5y), repeats, and a rolling day.
+
+    python benchmarks/bench_history.py --tickers 50 --latency 0.05
+"""
+import sys
+import time
+import tempfile
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from history_store import HistoryStore, window, _mock_prices
+
+PERIODS = ["1m", "3m", "6m", "1y", "5y"]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, default=50)
+    ap.add_argument("--latency", type=float, default=0.05, help="simulated upstream latency per request (s)")
+    args = ap.parse_args(argv)
+    tickers = [f"H{i:04d}" for i in range(args.tickers)]
+    fetched = {"requests": 0, "days": 0}
+
+    def upstream(ticker, start, end):
+        time.sleep(args.latency)
+        prices = _mock_prices(ticker, start, end)
+        fetched["requests"] += 1
+        fetched["days"] += len(prices)
+        return prices
+
+    def refetch(ticker, period, asof):
+        return upstream(ticker, *window(period, asof))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(tmp, fetch=upstream)
+        workloads = {
+            "widening 1m..5y": [(t, p, "2026-03-13") for t in tickers for p in PERIODS],
+            "repeat 1y x5": [(t, "1y", "2026-03-13") for t in tickers for _ in range(5)],
+            "next day 1y": [(t, "1y", "2026-03-16") for t in tickers],
+        }
+        print(f"{args.tickers} tickers, upstream latency {args.latency * 1000:.0f} ms/request")
+        print(f"{'workload':<16} {'mode':<8} {'seconds':>8} {'upstream':>9} {'days fetched':>13}")
+        for name, calls in workloads.items():
+            for mode, fn in (("refetch", refetch), ("store", lambda t, p, a: store.get(t, p, asof=a)[1])):
+                fetched.update(requests=0, days=0)
+                start = time.perf_counter()
+                for c in calls:
+                    float(fn(*c)[-1])
+                elapsed = time.perf_counter() - start
+                print(f"{name:<16} {mode:<8} {elapsed:>8.2f} {fetched['requests']:>9} {fetched['days']:>13}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Indicator stage: NumPy (batched across tickers) versus a pure-Python loop.
+
+    python benchmarks/bench_indicators.py --tickers 500 --days 1260
+"""
+import sys
+import math
+import time
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import indicators
+
+def _python_summary(prices):
+    """Reference implementation of the same latest-value indicators with plain loops."""
+    n = len(prices)
+    rets = [prices[i] / prices[i - 1] - 1 for i in range(1, n)]
+
+    def sma(w):
+        return sum(prices[-w:]) / w if n >= w else None
+
+    def ema_series(xs, a):
+        out, e = [], xs[0]
+        for x in xs:
+            e = a * x + (1 - a) * e
+            out.append(e)
+        return out
+
+    e12 = ema_series(prices, 2 / 13)
+    e26 = ema_series(prices, 2 / 27)
+    macd = [a - b for a, b in zip(e12, e26)]
+    sig = ema_series(macd, 2 / 10)
+    deltas = [prices[i] - prices[i - 1] for i in range(1, n)]
+    gain = ema_series([max(d, 0) for d in deltas], 1 / 14)[-1]
+    loss = ema_series([max(-d, 0) for d in deltas], 1 / 14)[-1]
+    rsi = 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+    mean = sum(rets) / len(rets)
+    vol = math.sqrt(sum((r - mean) ** 2 for r in rets) / len(rets)) * math.sqrt(252)
+    peak, mdd = prices[0], 0.0
+    for p in prices:
+        peak = max(peak, p)
+        mdd = min(mdd, p / peak - 1)
+    w = prices[-20:]
+    m = sum(w) / 20
+    sd = math.sqrt(sum((x - m) ** 2 for x in w) / 20)
+    return {"sma_20": sma(20), "sma_50": sma(50), "rsi_14": rsi, "macd": macd[-1], "macd_signal": sig[-1],
+            "volatility_ann": vol, "max_drawdown": mdd, "bb_lower": m - 2 * sd, "bb_upper": m + 2 * sd}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, default=500)
+    ap.add_argument("--days", type=int, default=1260)
+    args = ap.parse_args(argv)
+
+    rnd = np.random.default_rng(42)
+    matrix = 100 * np.cumprod(1 + rnd.normal(0, 0.015, (args.tickers, args.days)), axis=1)
+    rows = [list(r) for r in matrix]
+
+    start = time.perf_counter()
+    py = [_python_summary(r) for r in rows]
+    t_py = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [indicators.summarize_batch(matrix[i])[0] for i in range(min(args.tickers, 50))]
+    t_single = (time.perf_counter() - start) / len(single) * args.tickers
+
+    start = time.perf_counter()
+    batch = indicators.summarize_batch(matrix)
+    t_np = time.perf_counter() - start
+
+    assert abs(py[0]["macd"] - batch[0]["macd"]) <= abs(batch[0]["macd"]) * 1e-3 + 1e-9
+    assert single[0] == batch[0]
+    print(f"{args.tickers} tickers x {args.days} days")
+    print(f"pure Python loop       {t_py * 1000:>9.1f} ms")
+    print(f"NumPy, one ticker/call {t_single * 1000:>9.1f} ms (extrapolated)")
+    print(f"NumPy, 2-D batch       {t_np * 1000:>9.1f} ms  ({t_py / t_np:.0f}x faster than Python)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+How long a UI session is blocked per click: calling run_analysis inline (the
+old button handler) versus submitting to the job queue, with several sessions
+clicking at once and some asking for the same (ticker, period).
+
+    python benchmarks/bench_jobs.py --sessions 16 --tickers 4 --llm-latency 0.5
+"""
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from suite import Environment
+from job_queue import JobQueue
+
+def _sessions(n, fn):
+    """Run fn(i) on n threads started together; returns per-call seconds."""
+    out = [0.0] * n
+    barrier = threading.Barrier(n)
+
+    def one(i):
+        barrier.wait()
+        start = time.perf_counter()
+        fn(i)
+        out[i] = time.perf_counter() - start
+    threads = [threading.Thread(target=one, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sorted(out)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=16)
+    ap.add_argument("--tickers", type=int, default=4, help="distinct tickers the sessions pick from")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--llm-latency", type=float, default=0.5)
+    args = ap.parse_args(argv)
+    env = Environment(seed=7, tool_latency=1.0, llm_latency=args.llm_latency)
+    from local_orchestrator import run_analysis
+    try:
+        runs = []
+
+        def inline(i):
+            runs.append(run_analysis(f"J{i % args.tickers:02d}", {"period": "1y", "no_cache": True}))
+        blocked = _sessions(args.sessions, inline)
+        print(f"{args.sessions} sessions, {args.tickers} tickers, LLM {args.llm_latency * 1000:.0f} ms")
+        print(f"{'mode':<8} {'p50 blocked ms':>15} {'max blocked ms':>15} {'all done s':>11} {'runs':>5}")
+        print(f"{'inline':<8} {blocked[len(blocked) // 2] * 1000:>15.1f} {blocked[-1] * 1000:>15.1f} "
+              f"{blocked[-1]:>11.2f} {len(runs):>5}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            q = JobQueue(Path(tmp) / "jobs.db", runner=run_analysis, poll_interval=0.05).start(args.workers)
+            ids = [None] * args.sessions
+            start = time.perf_counter()
+
+            def submit(i):
+                ids[i] = q.submit(f"J{i % args.tickers:02d}", {"period": "1y", "no_cache": True})
+            blocked = _sessions(args.sessions, submit)
+            for job_id in set(ids):
+                q.wait(job_id)
+            done = time.perf_counter() - start
+            q.stop()
+            print(f"{'queue':<8} {blocked[len(blocked) // 2] * 1000:>15.1f} {blocked[-1] * 1000:>15.1f} "
+                  f"{done:>11.2f} {len(set(ids)):>5}")
+    finally:
+        env.close()
+
+if __name__ == "__main__":
+    main()
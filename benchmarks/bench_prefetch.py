@@ -0,0 +1,73 @@
+"""
+A user stepping through a watchlist, reading each result for --think seconds:
+wait per ticker with cold runs versus the prefetch scheduler, plus hit rate and
+wasted calls. The "jumpy" user skips ahead every few tickers.
+
+    python benchmarks/bench_prefetch.py --tickers 12 --think 1.0 --llm-latency 1.0
+"""
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from suite import Environment
+
+def _walk(n, jumpy, seed=3):
+    """Indices visited: in order, or skipping 2-4 ahead about every third step."""
+    rnd, i, out = random.Random(seed), 0, []
+    while i < n:
+        out.append(i)
+        i += rnd.choice([2, 3, 4]) if jumpy and rnd.random() < 0.35 else 1
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, default=12)
+    ap.add_argument("--think", type=float, default=1.0, help="seconds the user reads each result")
+    ap.add_argument("--llm-latency", type=float, default=1.0)
+    ap.add_argument("--depth", type=int, default=3)
+    ap.add_argument("--budget", type=int, default=2)
+    args = ap.parse_args(argv)
+    env = Environment(seed=11, tool_latency=1.0, llm_latency=args.llm_latency)
+    import llm_cache
+    import local_orchestrator
+    from prefetch import PrefetchScheduler
+    saved = llm_cache.LLM_CACHE, llm_cache._cache
+    tmp = tempfile.TemporaryDirectory()
+    llm_cache.LLM_CACHE = True
+    llm_cache._cache = llm_cache.LLMCache(Path(tmp.name) / "llm_cache.db")
+    print(f"{args.tickers} tickers, think {args.think}s, LLM {args.llm_latency}s, depth {args.depth}, "
+          f"budget {args.budget}")
+    print(f"{'user':<7} {'mode':<9} {'mean wait s':>11} {'max wait s':>11} {'hit rate':>9} {'wasted llm':>11}")
+    try:
+        for jumpy in (False, True):
+            for mode in ("cold", "prefetch"):
+                # fresh tickers per row so the response cache cannot carry over
+                watchlist = [f"{mode[0]}{int(jumpy)}{i:03d}" for i in range(args.tickers)]
+                sched = PrefetchScheduler(watchlist, {"period": "1y"}, args.depth, args.budget) if mode == "prefetch" else None
+                waits = []
+                for i in _walk(args.tickers, jumpy):
+                    start = time.perf_counter()
+                    if sched is None:
+                        local_orchestrator.run_analysis(watchlist[i], {"period": "1y"})
+                    else:
+                        sched.analyze(watchlist[i])
+                    waits.append(time.perf_counter() - start)
+                    time.sleep(args.think)
+                stats = sched.stats() if sched else {}
+                if sched:
+                    sched.close()
+                hit = f"{stats['hit_rate']:.0%}" if stats else "-"
+                print(f"{'jumpy' if jumpy else 'steady':<7} {mode:<9} {sum(waits) / len(waits):>11.2f} "
+                      f"{max(waits):>11.2f} {hit:>9} {stats.get('wasted_llm_calls', '-'):>11}")
+    finally:
+        llm_cache.LLM_CACHE, llm_cache._cache = saved
+        env.close()
+        tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
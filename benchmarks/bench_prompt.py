@@ -0,0 +1,57 @@
+"""
+Prompt size and build cost per history window: the old truncated-repr prompt
+versus the token-budgeted builder.
+
+    python benchmarks/bench_prompt.py --budget 600
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import prompt_builder
+
+PERIOD_DAYS = {"1m": 21, "3m": 63, "6m": 126, "1y": 252, "5y": 1260}
+QUOTE = {"ticker": "AAPL", "price": 187.23, "currency": "USD"}
+FUND = {"market_cap": 6_812_345_678, "pe_ratio": 24.1, "roe": 14.2}
+
+def legacy_prompt(ticker, quote, history, fundamentals, params):
+    return f"""
+Analyze stock {ticker} based on:
+
+Quote: {json.dumps(quote)}
+Fundamentals: {json.dumps(fundamentals)}
+History sample: {str(history)[:800]}
+Params: {params}
+
+Return JSON with:
+- technical_summary
+- fundamental_summary
+- risk_assessment
+- final_recommendation
+"""
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget", type=int, default=prompt_builder.PROMPT_TOKEN_BUDGET)
+    args = ap.parse_args(argv)
+    rnd = random.Random(7)
+
+    print(f"{'period':>6} {'days':>5} {'legacy tok':>10} {'legacy %':>9} {'new tok':>8} {'points':>7} {'build ms':>9}")
+    for period, days in PERIOD_DAYS.items():
+        history = [{"day": i, "price": 100 + i * 0.1 + (rnd.random() - 0.5) * 3} for i in range(days)]
+        old = legacy_prompt("AAPL", QUOTE, history, FUND, {"period": period})
+        covered = min(len(history), str(history)[:800].count("{"))
+        start = time.perf_counter()
+        for _ in range(20):
+            _, stats = prompt_builder.build_prompt("AAPL", QUOTE, history, FUND, {"period": period}, args.budget)
+        build_ms = (time.perf_counter() - start) * 1000 / 20
+        print(f"{period:>6} {days:>5} {prompt_builder.count_tokens(old):>10} {100 * covered / days:>8.0f}% "
+              f"{stats['prompt_tokens']:>8} {stats['history_points']:>7} {build_ms:>9.2f}")
+    print("legacy % = share of the window visible in the truncated history repr; the new prompt's indicators cover 100%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Rate limiter checks/sec across threads, key counts and backends, plus the
+SQLite backend across processes.
+
+    python benchmarks/bench_rate_limiter.py --threads 1 8 32 --keys 1 10000 --checks 20000
+"""
+import sys
+import time
+import tempfile
+import argparse
+import threading
+import multiprocessing
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rate_limiter import MemoryRateLimiter, SQLiteRateLimiter
+
+PER_MIN = 10 ** 9  # never deny; measure the check itself
+
+def run_threads(limiter, threads, keys, checks):
+    names = [f"key{i}" for i in range(keys)]
+    per_thread = checks // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(offset):
+        barrier.wait()
+        for i in range(per_thread):
+            limiter.allow(names[(offset + i) % keys], PER_MIN)
+
+    pool = [threading.Thread(target=worker, args=(t * 7919,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+def _proc(path, keys, n, out):
+    lim = SQLiteRateLimiter(path)
+    start = time.perf_counter()
+    for i in range(n):
+        lim.allow(f"key{i % keys}", PER_MIN)
+    out.put((n, time.perf_counter() - start))
+
+def run_processes(path, procs, keys, checks):
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    ps = [ctx.Process(target=_proc, args=(path, keys, checks // procs, out)) for _ in range(procs)]
+    for p in ps:
+        p.start()
+    results = [out.get() for _ in ps]
+    for p in ps:
+        p.join()
+    return sum(n for n, _ in results) / max(t for _, t in results)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("--keys", type=int, nargs="+", default=[1, 10000])
+    ap.add_argument("--checks", type=int, default=20000)
+    ap.add_argument("--processes", type=int, nargs="+", default=[1, 4])
+    args = ap.parse_args(argv)
+
+    tmp = tempfile.TemporaryDirectory()
+    backends = {
+        "single-lock": lambda: MemoryRateLimiter(shards=1),
+        "sharded": lambda: MemoryRateLimiter(),
+        "sqlite": lambda: SQLiteRateLimiter(Path(tmp.name) / f"rl{time.perf_counter_ns()}.db"),
+    }
+    print(f"{'backend':>12} {'keys':>6} {'threads':>7} {'checks/s':>10}")
+    for name, make in backends.items():
+        for keys in args.keys:
+            for threads in args.threads:
+                checks = args.checks if name != "sqlite" else args.checks // 4
+                rate = run_threads(make(), threads, keys, checks)
+                print(f"{name:>12} {keys:>6} {threads:>7} {rate:>10.0f}")
+    print(f"\n{'backend':>12} {'keys':>6} {'procs':>7} {'checks/s':>10}")
+    for keys in args.keys:
+        for procs in args.processes:
+            path = Path(tmp.name) / f"mp{keys}_{procs}.db"
+            SQLiteRateLimiter(path)
+            rate = run_processes(path, procs, keys, args.checks // 4)
+            print(f"{'sqlite':>12} {keys:>6} {procs:>7} {rate:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Cold-start report: import time of the library modules and first/second render
+of the Streamlit app, each in a fresh interpreter with an empty working
+directory. Also shows whether an import pulled in streamlit or created the
+audit DB. Point --root at another checkout to compare before/after.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --root /tmp/baseline --repeat 7
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ["metrics", "audit_model", "llm_client", "tools_registry", "local_orchestrator", "batch_runner", "api"]
+
+_IMPORT = """
+import sys, time, json, os
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start, "streamlit": "streamlit" in sys.modules,
+                  "db_created": os.path.exists("data/audit.db")}}))
+"""
+
+# AppTest runs the script the way the server does, in a scratch cwd so the
+# audit DB lands there; the second run is a rerun in the same session (what
+# every widget interaction costs)
+_RENDER = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=60)
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - start
+print(json.dumps({{"first": first, "rerun": rerun, "errors": [str(e.value) for e in at.exception],
+                  "orchestrator_loaded": "local_orchestrator" in sys.modules}}))
+"""
+
+def _run(code, cwd):
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, timeout=300)
+    if out.returncode:
+        raise RuntimeError(out.stderr[-2000:])
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def import_times(root, repeat):
+    rows = {}
+    for module in MODULES:
+        samples = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as cwd:
+                samples.append(_run(_IMPORT.format(root=str(root), module=module), cwd))
+        rows[module] = {"median_ms": statistics.median(s["seconds"] for s in samples) * 1000,
+                        "streamlit": samples[0]["streamlit"], "db_created": samples[0]["db_created"]}
+    return rows
+
+def render_times(root, repeat):
+    samples = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cwd:
+            samples.append(_run(_RENDER.format(root=str(root), app=str(root / "streamlit_app.py")), cwd))
+    return {"first_ms": statistics.median(s["first"] for s in samples) * 1000,
+            "rerun_ms": statistics.median(s["rerun"] for s in samples) * 1000,
+            "orchestrator_loaded": samples[0]["orchestrator_loaded"], "errors": samples[0]["errors"]}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=str(ROOT), help="checkout to measure")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--no-render", action="store_true", help="skip the Streamlit render (needs streamlit)")
+    args = ap.parse_args(argv)
+    root = Path(args.root).resolve()
+
+    print(f"{root}  (median of {args.repeat} fresh interpreters)")
+    print(f"{'import':<20} {'ms':>8} {'streamlit':>10} {'audit.db':>9}")
+    for module, r in import_times(root, args.repeat).items():
+        print(f"{module:<20} {r['median_ms']:>8.1f} {str(r['streamlit']):>10} {str(r['db_created']):>9}")
+    if not args.no_render:
+        r = render_times(root, args.repeat)
+        print(f"\nstreamlit_app first render {r['first_ms']:.0f} ms, rerun {r['rerun_ms']:.0f} ms, "
+              f"orchestrator imported: {r['orchestrator_loaded']}")
+        if r["errors"]:
+            print("app errors:", r["errors"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Concurrent analyses per process with run_analysis_async against local stubs
+(async mock tools + stub LLM HTTP server).
+
+    python benchmarks/load_async.py --runs 500 --concurrency 50 200 500 --llm-latency 0.5
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_llm import start_stub_server
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 500])
+    ap.add_argument("--llm-latency", type=float, default=0.5)
+    args = ap.parse_args(argv)
+
+    server, url = start_stub_server(args.llm_latency)
+    os.environ["GROQ_API_KEY"] = "gsk_stub_key"
+    import llm_client
+    import llm_cache
+    import audit_model
+    import tool_cache
+    import history_store
+    import local_orchestrator
+    llm_client.GROQ_URL = url
+    llm_cache.LLM_CACHE = False
+    tmp = tempfile.TemporaryDirectory()
+    audit_model.DB_PATH = Path(tmp.name) / "audit.db"
+    audit_model.init_db()
+
+    async def drive(concurrency):
+        # every round starts cold: the async tools share the tool cache
+        tool_cache.default_cache.invalidate()
+        history_store._store = history_store.HistoryStore(Path(tmp.name) / f"history_{concurrency}")
+        # one limit for in-flight analyses; the LLM pool is sized to match
+        llm_client.LLM_POOL_SIZE = concurrency
+        limit = asyncio.Semaphore(concurrency)
+        peak = 0
+        active = 0
+
+        async def one(i):
+            nonlocal peak, active
+            async with limit:
+                active += 1
+                peak = max(peak, active)
+                try:
+                    return await local_orchestrator.run_analysis_async(f"T{i:04d}", {"period": "1y"})
+                finally:
+                    active -= 1
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(args.runs)))
+        elapsed = time.perf_counter() - start
+        await llm_client.close_async_client()
+        ok = sum(1 for r in results if not r["result"].get("mock"))
+        return elapsed, peak, ok
+
+    print(f"{args.runs} runs, tools ~0.3s, stub LLM {args.llm_latency}s (serial: {args.runs * (0.65 + args.llm_latency):.0f}s)")
+    print(f"{'concurrency':>11} {'peak':>5} {'ok':>5} {'elapsed':>8} {'runs/s':>7}")
+    for c in args.concurrency:
+        elapsed, peak, ok = asyncio.run(drive(c))
+        print(f"{c:>11} {peak:>5} {ok:>5} {elapsed:>7.2f}s {args.runs / elapsed:>7.1f}")
+    audit_model.close_audit_writer()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Local stand-in for the Groq chat completions endpoint, for benchmarks.
+
+    from stub_llm import start_stub_server
+    server, url = start_stub_server(latency=0.5)
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _handler(latency, text):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls on keep-alive
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if body.get("messages", [{}])[-1].get("content") != "ping":
+                time.sleep(latency)
+            if body.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for tok in text.split(" "):
+                    chunk = {"choices": [{"delta": {"content": tok + " "}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+                return
+            data = json.dumps({"choices": [{"message": {"content": text}}], "usage": {"total_tokens": 100}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+def start_stub_server(latency=0.5, text="HOLD. Stub analysis.", port=0):
+    """Start the stub in a daemon thread; returns (server, completions_url)."""
+    server = _Server(("127.0.0.1", port), _handler(latency, text))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/openai/v1/chat/completions"
@@ -0,0 +1,276 @@
+"""
+Reproducible benchmark suite for the analysis pipeline.
+
+Tools are replaced by seeded deterministic versions (same ticker + seed gives
+the same data on every run) with configurable latency, and the LLM by the
+local stub server. Results are written as JSON so runs can be compared.
+
+    python benchmarks/suite.py                          # all scenarios
+    python benchmarks/suite.py --quick --only prompt_build audit
+    python benchmarks/suite.py --compare data/benchmarks/<earlier>.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from stub_llm import start_stub_server
+
+RESULTS_DIR = Path(os.getenv("BENCH_RESULTS_DIR", "data/benchmarks"))
+PERIOD_DAYS = {"1m": 21, "3m": 63, "6m": 126, "1y": 252, "5y": 1260}
+# Latencies of the registry's mock tools, scaled by --tool-latency
+TOOL_LATENCY = {"quote_tool": 0.2, "history_tool": 0.3, "fundamentals_tool": 0.15}
+
+def _rng(seed, *parts):
+    return random.Random(":".join(str(p) for p in (seed,) + parts))
+
+def seeded_quote(seed, ticker):
+    r = _rng(seed, ticker, "quote")
+    return {"ticker": ticker.upper(), "price": round(100 + r.random() * 50, 2), "currency": "USD"}
+
+def seeded_history(seed, ticker, period="1mo"):
+    r = _rng(seed, ticker, "history")
+    price = 100 + r.random() * 50
+    out = []
+    for i in range(PERIOD_DAYS.get(period, 21)):
+        price *= 1 + r.gauss(0.0004, 0.015)
+        out.append({"day": i, "price": round(price, 4)})
+    return out
+
+def seeded_fundamentals(seed, ticker):
+    r = _rng(seed, ticker, "fundamentals")
+    return {"market_cap": round(5e9 + r.random() * 3e9), "pe_ratio": round(10 + r.random() * 20, 1),
+            "roe": round(r.random() * 20, 1)}
+
+def seeded_tools(seed, latency_scale=1.0):
+    """(sync_tools, async_tools) dicts with deterministic outputs and scaled sleeps."""
+    data = {"quote_tool": seeded_quote, "history_tool": seeded_history, "fundamentals_tool": seeded_fundamentals}
+
+    def make(name, fn):
+        delay = TOOL_LATENCY[name] * latency_scale
+
+        def sync_tool(*args):
+            if delay:
+                time.sleep(delay)
+            return fn(seed, *args)
+
+        async def async_tool(*args):
+            if delay:
+                await asyncio.sleep(delay)
+            return fn(seed, *args)
+        return sync_tool, async_tool
+
+    made = {name: make(name, fn) for name, fn in data.items()}
+    return {n: m[0] for n, m in made.items()}, {n: m[1] for n, m in made.items()}
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(q * len(values)) - 1))]
+
+def _latency_stats(samples):
+    ms = [s * 1000 for s in samples]
+    return {"n": len(ms), "mean_ms": sum(ms) / len(ms), "p50_ms": _pct(ms, 0.5), "p95_ms": _pct(ms, 0.95),
+            "p99_ms": _pct(ms, 0.99), "max_ms": max(ms)}
+
+class Environment:
+    """
+    Seeded tools, stub LLM and throwaway audit/cache/batch storage for one
+    suite run. close() puts the patched module state back.
+    """
+
+    def __init__(self, seed, tool_latency, llm_latency):
+        import tools_registry
+        import llm_client
+        import llm_cache
+        import audit_model
+        import batch_runner
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self.tmp.name)
+        self.server, url = start_stub_server(llm_latency)
+        self._saved = [(m, attr, getattr(m, attr)) for m, attr in [
+            (llm_client, "GROQ_URL"), (llm_cache, "LLM_CACHE"), (audit_model, "DB_PATH"), (batch_runner, "BATCH_DIR")]]
+        self._saved_tools = dict(tools_registry.tools), dict(tools_registry.async_tools)
+        self._saved_key = os.environ.get("GROQ_API_KEY")
+
+        os.environ["GROQ_API_KEY"] = "gsk_bench_stub"
+        llm_client.GROQ_URL = url
+        llm_client.clear_probe_cache()
+        llm_cache.LLM_CACHE = False
+        audit_model.close_audit_writer()
+        audit_model.DB_PATH = tmp / "audit.db"
+        audit_model.init_db()
+        batch_runner.BATCH_DIR = tmp / "batches"
+        sync_tools, async_tools = seeded_tools(seed, tool_latency)
+        # replace in place: the orchestrator holds references to these dicts
+        tools_registry.tools.update(sync_tools)
+        tools_registry.async_tools.update(async_tools)
+        # warm the key probe so it is not charged to the first run
+        llm_client.make_llm_call("ping")
+
+    def close(self):
+        import tools_registry
+        import llm_client
+        import audit_model
+        audit_model.close_audit_writer()
+        for m, attr, value in self._saved:
+            setattr(m, attr, value)
+        for current, saved in zip((tools_registry.tools, tools_registry.async_tools), self._saved_tools):
+            current.clear()
+            current.update(saved)
+        if self._saved_key is None:
+            os.environ.pop("GROQ_API_KEY", None)
+        else:
+            os.environ["GROQ_API_KEY"] = self._saved_key
+        llm_client.clear_probe_cache()
+        self.server.shutdown()
+        self.tmp.cleanup()
+
+def bench_single_run(args):
+    from local_orchestrator import run_analysis
+    samples = []
+    for i in range(args.runs):
+        start = time.perf_counter()
+        resp = run_analysis(f"T{i % 50:03d}", {"period": args.period, "no_cache": True})
+        samples.append(time.perf_counter() - start)
+        assert not resp["result"].get("mock"), resp["result"].get("text")
+    return _latency_stats(samples)
+
+def bench_batch(args):
+    from batch_runner import run_batch_analysis
+    tickers = [f"B{i:04d}" for i in range(args.batch_tickers)]
+    s = run_batch_analysis(tickers, {"period": args.period}, max_workers=32, max_inflight_llm=16)
+    return {"tickers": s["total"], "ok": s["ok"], "elapsed_s": s["elapsed"], "tickers_per_s": s["tickers_per_sec"]}
+
+def bench_audit(args):
+    import audit_model
+    history = seeded_history(args.seed, "AUDIT", args.period)
+    start = time.perf_counter()
+    for i in range(args.audit_rows):
+        audit_model.save_audit_step(f"bench_{i // 4:06d}", i % 4, "history", "history_tool", {"ticker": "AUDIT"},
+                                    history, 0.3, "2026-01-01T00:00:00Z")
+    audit_model.flush_audit()
+    write_s = time.perf_counter() - start
+    runs = args.audit_rows // 4
+    rnd = random.Random(args.seed)
+    start = time.perf_counter()
+    for _ in range(args.audit_reads):
+        audit_model.get_trace(f"bench_{rnd.randrange(runs):06d}")
+    trace_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.audit_reads):
+        audit_model.list_runs_page(limit=50)
+    list_s = time.perf_counter() - start
+    return {"rows": args.audit_rows, "write_rows_per_s": args.audit_rows / write_s,
+            "get_trace_per_s": args.audit_reads / trace_s, "list_runs_per_s": args.audit_reads / list_s}
+
+def bench_prompt_build(args):
+    from prompt_builder import build_prompt
+    out = {}
+    for period in PERIOD_DAYS:
+        inputs = [(seeded_quote(args.seed, t), seeded_history(args.seed, t, period), seeded_fundamentals(args.seed, t))
+                  for t in (f"P{i:03d}" for i in range(20))]
+        start = time.perf_counter()
+        tokens = 0
+        for i in range(args.prompt_iters):
+            q, h, f = inputs[i % len(inputs)]
+            tokens = build_prompt("BENCH", q, h, f, {"period": period})[1]["prompt_tokens"]
+        out[period] = {"us_per_prompt": (time.perf_counter() - start) / args.prompt_iters * 1e6, "prompt_tokens": tokens}
+    return out
+
+SCENARIOS = {
+    "single_run": bench_single_run,
+    "batch": bench_batch,
+    "audit": bench_audit,
+    "prompt_build": bench_prompt_build,
+}
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def _flatten(d, prefix=""):
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)):
+            out[key] = v
+    return out
+
+def compare(current, baseline):
+    """Rows of (metric, baseline, current, change %) for metrics present in both result sets."""
+    a, b = _flatten(baseline["results"]), _flatten(current["results"])
+    return [(k, a[k], b[k], (b[k] - a[k]) / a[k] * 100 if a[k] else None) for k in sorted(a) if k in b]
+
+def run_suite(args):
+    env = Environment(args.seed, args.tool_latency, args.llm_latency)
+    results = {}
+    try:
+        for name in args.only or SCENARIOS:
+            start = time.perf_counter()
+            results[name] = SCENARIOS[name](args)
+            print(f"{name:<14} {time.perf_counter() - start:6.1f}s  {json.dumps(results[name])}", flush=True)
+    finally:
+        env.close()
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        },
+        "results": results,
+    }
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--only", nargs="+", choices=list(SCENARIOS))
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--period", default="1y", choices=list(PERIOD_DAYS))
+    ap.add_argument("--tool-latency", type=float, default=1.0, help="scale for the mock tool sleeps (0 = none)")
+    ap.add_argument("--llm-latency", type=float, default=0.2, help="stub LLM latency (s)")
+    ap.add_argument("--runs", type=int, default=30)
+    ap.add_argument("--batch-tickers", type=int, default=200)
+    ap.add_argument("--audit-rows", type=int, default=20000)
+    ap.add_argument("--audit-reads", type=int, default=500)
+    ap.add_argument("--prompt-iters", type=int, default=200)
+    ap.add_argument("--quick", action="store_true", help="small sizes for a smoke run")
+    ap.add_argument("--out", help="results file (default data/benchmarks/<timestamp>.json)")
+    ap.add_argument("--compare", help="earlier results file to diff against")
+    args = ap.parse_args(argv)
+    if args.quick:
+        args.runs, args.batch_tickers, args.audit_rows, args.audit_reads, args.prompt_iters = 5, 20, 2000, 50, 20
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_suite(args)
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{report['meta']['timestamp'].replace(':', '')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"results -> {out}")
+    if args.compare:
+        print(f"\n{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+        for metric, old, new, change in compare(report, json.loads(Path(args.compare).read_text())):
+            print(f"{metric:<40} {old:>12.4g} {new:>12.4g} {change:>+7.1f}%" if change is not None else
+                  f"{metric:<40} {old:>12.4g} {new:>12.4g} {'-':>8}")
+    return report
+
+if __name__ == "__main__":
+    main()
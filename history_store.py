@@ -0,0 +1,271 @@
+import os
+import re
+import json
+import time
+import zlib
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+
+try:
+    import fcntl as _fcntl
+except Exception:  # not on Windows: only threads in one process are serialized
+    _fcntl = None
+
+HISTORY_STORE_DIR = Path(os.getenv("HISTORY_STORE_DIR", "data/history"))
+# Simulated upstream latency per range request (the mock stands in for a market data API)
+HISTORY_FETCH_LATENCY = float(os.getenv("HISTORY_FETCH_LATENCY", "0.3"))
+# New heads are fetched at least this many trading days deep, so widening 1m -> 3m -> 1y is one request
+HISTORY_HEAD_CHUNK = int(os.getenv("HISTORY_HEAD_CHUNK", "252"))
+# Memmaps kept open (one fd each); older ones are dropped LRU
+HISTORY_MAX_MAPS = int(os.getenv("HISTORY_MAX_MAPS", "64"))
+
+# Tickers double as file names
+_TICKER_RE = re.compile(r"^[A-Z0-9.\-]{1,15}$")
+
+# Trading days per period; "1mo" is history_tool's historical default
+PERIOD_DAYS = {"1mo": 21, "1m": 21, "3m": 63, "6m": 126, "1y": 252, "5y": 1260}
+# Upstream mock prices are a deterministic walk from this date
+_ORIGIN = np.datetime64("2000-01-03", "D")
+
+def check_ticker(ticker) -> str:
+    """Upper-cased ticker, or ValueError if it is not a plain symbol like BRK.B."""
+    t = ticker.strip().upper() if isinstance(ticker, str) else ""
+    if not _TICKER_RE.match(t) or set(t) == {"."}:
+        raise ValueError(f"invalid ticker {ticker!r}")
+    return t
+
+def period_days(period) -> int:
+    if period not in PERIOD_DAYS:
+        raise ValueError(f"unknown period {period!r}; expected one of {sorted(PERIOD_DAYS)}")
+    return PERIOD_DAYS[period]
+
+def window(period, asof=None):
+    """Business-day range [start, end) of the last `period` of sessions up to `asof` (default today)."""
+    last = last_session(asof)
+    return np.busday_offset(last, -(period_days(period) - 1)), np.busday_offset(last, 1)
+
+def last_session(asof=None):
+    """The last business day on or before `asof` (default today)."""
+    return np.busday_offset(np.datetime64(asof or "today", "D"), 0, roll="backward")
+
+def session_index(asof=None) -> int:
+    """Business-day number of the last session up to `asof`, as mock_closes counts days."""
+    return int(np.busday_count(_ORIGIN, last_session(asof)))
+
+def ticker_seed(ticker: str) -> int:
+    return zlib.crc32(ticker.upper().encode())
+
+def mock_closes(seeds, days):
+    """
+    Mock upstream closes for ticker seed(s) `seeds` on business day(s) `days`
+    (counted from _ORIGIN); the arguments broadcast. The log price is a closed
+    form of (seed, day), so any day costs the same: history fetches read one
+    ticker over many days, the bulk quote endpoint many tickers on a few days,
+    and both see the same numbers.
+    """
+    seeds = np.asarray(seeds, dtype=np.uint64)
+    d = np.asarray(days, dtype=np.uint64)
+    noise = ((d * np.uint64(2654435761) + seeds) % np.uint64(1 << 32)).astype(np.float64) / 2 ** 32 - 0.5
+    x = d.astype(np.float64)
+    phase = (seeds % np.uint64(7)).astype(np.float64)
+    log_p = 0.3 * np.sin(x / 157 + phase) + 0.2 * np.sin(x / 40 + 2 * phase) + 0.08 * np.sin(x / 9.5 + 3 * phase) \
+        + 0.02 * noise
+    return np.round((50 + (seeds % np.uint64(100)).astype(np.float64)) * np.exp(log_p), 2)
+
+def _mock_prices(ticker: str, start, end) -> np.ndarray:
+    n_before = int(np.busday_count(_ORIGIN, start))
+    return mock_closes(ticker_seed(ticker), np.arange(n_before, n_before + int(np.busday_count(start, end))))
+
+def fetch_history_range(ticker: str, start, end) -> np.ndarray:
+    """
+    Mock upstream: closing prices for the business days in [start, end).
+    Prices depend only on (ticker, date), so overlapping fetches agree.
+    """
+    time.sleep(HISTORY_FETCH_LATENCY)
+    return _mock_prices(ticker, start, end)
+
+async def fetch_history_range_async(ticker: str, start, end) -> np.ndarray:
+    await asyncio.sleep(HISTORY_FETCH_LATENCY)
+    return _mock_prices(ticker, start, end)
+
+class HistoryStore:
+    """
+    Per-ticker daily closes on disk, one contiguous business-day range per
+    ticker: <TICKER>.f64 holds raw float64 prices and <TICKER>.json the range
+    [start, end). Requests fetch only the missing head or tail segment and are
+    served as slices of a read-only memmap (no copy).
+
+    Filling a ticker holds a thread lock and, where fcntl exists, an flock on
+    <TICKER>.lock, so processes sharing the directory never append twice.
+    At most `max_maps` memmaps are kept open.
+    """
+
+    def __init__(self, root=None, fetch=None, fetch_async=None, head_chunk=None, max_maps=None):
+        self.root = Path(root or HISTORY_STORE_DIR)
+        self.head_chunk = head_chunk if head_chunk is not None else HISTORY_HEAD_CHUNK
+        self.fetch = fetch or fetch_history_range
+        self.fetch_async = fetch_async or fetch_history_range_async
+        self._lock = threading.Lock()
+        self._ticker_locks = {}
+        self.max_maps = max_maps if max_maps is not None else HISTORY_MAX_MAPS
+        self._maps = OrderedDict()  # ticker -> (start, end, memmap)
+        self.stats = {"requests": 0, "fetches": 0, "fetched_days": 0, "served_days": 0}
+
+    def _paths(self, ticker):
+        return self.root / f"{ticker}.f64", self.root / f"{ticker}.json"
+
+    def _ticker_lock(self, ticker):
+        with self._lock:
+            return self._ticker_locks.setdefault(ticker, threading.Lock())
+
+    @contextmanager
+    def _locked(self, ticker):
+        with self._ticker_lock(ticker):
+            if _fcntl is None:
+                yield
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.root / f"{ticker}.lock", "a") as f:
+                _fcntl.flock(f, _fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    _fcntl.flock(f, _fcntl.LOCK_UN)
+
+    def coverage(self, ticker):
+        """(start, end) of the stored business-day range (end exclusive), or None."""
+        meta_path = self._paths(check_ticker(ticker))[1]
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+        return np.datetime64(meta["start"], "D"), np.datetime64(meta["end"], "D")
+
+    def _write(self, ticker, start, end, head=None, tail=None):
+        data_path, meta_path = self._paths(ticker)
+        self.root.mkdir(parents=True, exist_ok=True)
+        if head is not None:
+            # prepend: rewrite into a new file so existing memmaps stay valid
+            tmp = data_path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                f.write(np.ascontiguousarray(head, dtype=np.float64).tobytes())
+                if data_path.exists():
+                    with open(data_path, "rb") as old:
+                        f.write(old.read())
+            os.replace(tmp, data_path)
+        if tail is not None:
+            with open(data_path, "ab") as f:
+                f.write(np.ascontiguousarray(tail, dtype=np.float64).tobytes())
+        tmp = meta_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({"start": str(start), "end": str(end)}))
+        os.replace(tmp, meta_path)
+        with self._lock:
+            self._maps.pop(ticker, None)
+
+    def _fetch(self, ticker, start, end, prefetched=None):
+        prices = (prefetched or {}).get((start, end))
+        if prices is None:
+            prices = self.fetch(ticker, start, end)
+        prices = np.asarray(prices, dtype=np.float64)
+        with self._lock:
+            self.stats["fetches"] += 1
+            self.stats["fetched_days"] += len(prices)
+        return prices
+
+    def _head(self, start, edge):
+        return min(start, np.busday_offset(edge, -self.head_chunk)) if self.head_chunk else start
+
+    def missing(self, ticker: str, start, end):
+        """Segments [(a, b), ...] that must be fetched to cover [start, end)."""
+        held = self.coverage(check_ticker(ticker))
+        if held is None:
+            return [(self._head(start, end), end)]
+        s0, e0 = held
+        # keep one contiguous range: a request beyond either edge also fills the gap
+        return ([(self._head(start, s0), s0)] if start < s0 else []) + ([(e0, end)] if end > e0 else [])
+
+    def _ensure(self, ticker, start, end, prefetched=None):
+        """Fill [start, end) and return the stored (start, end). Caller holds _locked(ticker)."""
+        held = self.coverage(ticker)
+        if held is None:
+            a = self._head(start, end)
+            self._write(ticker, a, end, tail=self._fetch(ticker, a, end, prefetched))
+            return a, end
+        s0, e0 = held
+        if start < s0:
+            a = self._head(start, s0)
+            self._write(ticker, a, e0, head=self._fetch(ticker, a, s0, prefetched))
+            s0 = a
+        if end > e0:
+            self._write(ticker, s0, end, tail=self._fetch(ticker, e0, end, prefetched))
+            e0 = end
+        return s0, e0
+
+    def ensure(self, ticker: str, start, end):
+        """Make sure [start, end) is stored, fetching only what is missing."""
+        ticker = check_ticker(ticker)
+        with self._locked(ticker):
+            self._ensure(ticker, start, end)
+
+    def _memmap(self, ticker, held):
+        """Memmap of the data file for stored range `held`; reopened if another process changed it."""
+        with self._lock:
+            entry = self._maps.get(ticker)
+            if entry is not None and entry[:2] == held:
+                self._maps.move_to_end(ticker)
+                return entry[2]
+        m = np.memmap(self._paths(ticker)[0], dtype=np.float64, mode="r")
+        with self._lock:
+            self._maps[ticker] = held + (m,)
+            self._maps.move_to_end(ticker)
+            # the fd is released once the evicted map and any slices of it are gone
+            while len(self._maps) > max(1, self.max_maps):
+                self._maps.popitem(last=False)
+        return m
+
+    def get_range(self, ticker: str, start, end, prefetched=None):
+        """(dates, prices) for [start, end); prices is a read-only view into the memmap."""
+        ticker = check_ticker(ticker)
+        with self._locked(ticker):
+            held = self._ensure(ticker, start, end, prefetched)
+            prices_all = self._memmap(ticker, held)
+        s0 = held[0]
+        i = int(np.busday_count(s0, start))
+        n = int(np.busday_count(start, end))
+        prices = prices_all[i:i + n]
+        dates = np.busday_offset(start, np.arange(n), roll="forward")
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["served_days"] += n
+        return dates, prices
+
+    def get(self, ticker: str, period="1mo", asof=None):
+        """The last `period` of trading days up to `asof` (default today)."""
+        return self.get_range(ticker, *window(period, asof))
+
+    async def get_async(self, ticker: str, period="1mo", asof=None):
+        """Like get(), but missing segments are fetched with fetch_async on the event loop."""
+        ticker = check_ticker(ticker)
+        start, end = window(period, asof)
+        segments = self.missing(ticker, start, end)
+        fetched = await asyncio.gather(*(self.fetch_async(ticker, a, b) for a, b in segments))
+        # the coverage may have moved meanwhile; anything not prefetched is fetched in the worker thread
+        return await asyncio.to_thread(self.get_range, ticker, start, end, prefetched=dict(zip(segments, fetched)))
+
+def history_rows(dates, prices):
+    """history_tool output format: [{"day", "date", "price"}, ...]."""
+    return [{"day": i, "date": str(d), "price": round(float(p), 4)} for i, (d, p) in enumerate(zip(dates, prices))]
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store() -> HistoryStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
@@ -0,0 +1,168 @@
+import math
+import numpy as np
+
+TRADING_DAYS = 252
+
+def history_to_array(history) -> np.ndarray:
+    """Price series from history_tool output ([{"day", "price"}, ...]) as a float64 array."""
+    return np.asarray([row["price"] for row in history], dtype=np.float64)
+
+def stack_histories(histories) -> np.ndarray:
+    """
+    Stack several histories into a (tickers, days) matrix. Series are aligned
+    on their most recent point and truncated to the shortest one.
+    """
+    arrays = [history_to_array(h) for h in histories]
+    n = min(len(a) for a in arrays)
+    return np.vstack([a[len(a) - n:] for a in arrays])
+
+def _as_2d(prices):
+    p = np.asarray(prices, dtype=np.float64)
+    return p[np.newaxis, :] if p.ndim == 1 else p
+
+def sma(prices, window):
+    p = _as_2d(prices)
+    out = np.full(p.shape, np.nan)
+    if window <= p.shape[1]:
+        c = np.cumsum(np.pad(p, ((0, 0), (1, 0))), axis=1)
+        out[:, window - 1:] = (c[:, window:] - c[:, :-window]) / window
+    return out
+
+def rolling_std(prices, window):
+    """Rolling population std from cumulative sums; rows are centred first to limit cancellation."""
+    p = _as_2d(prices)
+    centred = p - p.mean(axis=1, keepdims=True)
+    var = sma(centred ** 2, window) - sma(centred, window) ** 2
+    return np.sqrt(np.clip(var, 0.0, None))
+
+def ema(prices, span=None, alpha=None):
+    """
+    Exponential moving average (seeded with the first value), vectorized over
+    both axes. Within a block, y_t = d^t * (y_0 + a * sum(x_k * d^-k)) is a
+    cumsum; blocks are sized so d^-k stays well inside float64 range.
+    """
+    p = _as_2d(prices)
+    a = alpha if alpha is not None else 2.0 / (span + 1.0)
+    d = 1.0 - a
+    if d <= 0.0:
+        return p.copy()
+    out = np.empty_like(p)
+    block = max(1, int(250 / -math.log10(d)))
+    carry = p[:, 0]
+    for s in range(0, p.shape[1], block):
+        x = p[:, s:s + block]
+        k = np.arange(1, x.shape[1] + 1)
+        y = d ** k * (carry[:, np.newaxis] + np.cumsum(x * (a * d ** -k), axis=1))
+        out[:, s:s + x.shape[1]] = y
+        carry = y[:, -1]
+    return out
+
+def returns(prices):
+    p = _as_2d(prices)
+    out = np.full(p.shape, np.nan)
+    out[:, 1:] = p[:, 1:] / p[:, :-1] - 1.0
+    return out
+
+def rsi(prices, window=14):
+    """Wilder RSI."""
+    p = _as_2d(prices)
+    delta = np.diff(p, axis=1)
+    gain = ema(np.clip(delta, 0, None), alpha=1.0 / window)
+    loss = ema(np.clip(-delta, 0, None), alpha=1.0 / window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = gain / loss
+        r = np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + rs))
+    out = np.full(p.shape, np.nan)
+    if p.shape[1] > window:
+        out[:, window:] = r[:, window - 1:]
+    return out
+
+def macd(prices, fast=12, slow=26, signal=9):
+    line = ema(prices, fast) - ema(prices, slow)
+    sig = ema(line, signal)
+    return line, sig, line - sig
+
+def drawdown(prices):
+    p = _as_2d(prices)
+    return p / np.maximum.accumulate(p, axis=1) - 1.0
+
+def bollinger(prices, window=20, k=2.0):
+    mid = sma(prices, window)
+    sd = rolling_std(prices, window)
+    return mid - k * sd, mid, mid + k * sd
+
+def compute_indicators(prices):
+    """
+    All indicators over a (days,) or (tickers, days) price array.
+    Returns a dict of arrays shaped (tickers, days), or (tickers,) for scalars.
+    """
+    p = _as_2d(prices)
+    rets = returns(p)
+    vol_20 = np.full(p.shape, np.nan)
+    vol_20[:, 1:] = rolling_std(rets[:, 1:], 20) * math.sqrt(TRADING_DAYS)
+    macd_line, macd_sig, macd_hist = macd(p)
+    bb_low, bb_mid, bb_high = bollinger(p)
+    dd = drawdown(p)
+    daily_vol = np.nanstd(rets[:, 1:], axis=1) if p.shape[1] > 2 else np.full(p.shape[0], np.nan)
+    return {
+        "price": p,
+        "returns": rets,
+        "sma_20": sma(p, 20),
+        "sma_50": sma(p, 50),
+        "ema_12": ema(p, 12),
+        "ema_26": ema(p, 26),
+        "rsi_14": rsi(p, 14),
+        "macd": macd_line,
+        "macd_signal": macd_sig,
+        "macd_hist": macd_hist,
+        "volatility_20": vol_20,
+        "volatility": daily_vol * math.sqrt(TRADING_DAYS),
+        "drawdown": dd,
+        "max_drawdown": dd.min(axis=1),
+        "bb_lower": bb_low,
+        "bb_mid": bb_mid,
+        "bb_upper": bb_high,
+    }
+
+def _num(x, digits=4):
+    x = float(x)
+    if math.isnan(x) or math.isinf(x):
+        return None
+    return float(f"{x:.{digits}g}")
+
+def summarize_batch(prices):
+    """Compact per-ticker summaries (latest values) for a (tickers, days) price matrix."""
+    p = _as_2d(prices)
+    ind = compute_indicators(p)
+    last = lambda k: ind[k][:, -1]
+    period_return = p[:, -1] / p[:, 0] - 1.0
+    band = ind["bb_upper"][:, -1] - ind["bb_lower"][:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct_b = (p[:, -1] - ind["bb_lower"][:, -1]) / band
+    cols = {
+        "last": p[:, -1],
+        "period_return": period_return,
+        "sma_20": last("sma_20"),
+        "sma_50": last("sma_50"),
+        "ema_12": last("ema_12"),
+        "ema_26": last("ema_26"),
+        "rsi_14": last("rsi_14"),
+        "macd": last("macd"),
+        "macd_signal": last("macd_signal"),
+        "macd_hist": last("macd_hist"),
+        "volatility_ann": ind["volatility"],
+        "volatility_20_ann": ind["volatility_20"][:, -1],
+        "max_drawdown": ind["max_drawdown"],
+        "drawdown": last("drawdown"),
+        "bb_lower": last("bb_lower"),
+        "bb_upper": last("bb_upper"),
+        "bb_pct_b": pct_b,
+    }
+    return [dict(days=p.shape[1], **{k: _num(v[i]) for k, v in cols.items()}) for i in range(p.shape[0])]
+
+def summarize_history(history):
+    """Compact indicator summary for one history_tool result."""
+    prices = history_to_array(history)
+    if len(prices) < 2:
+        return {"days": len(prices), "last": _num(prices[-1]) if len(prices) else None}
+    return summarize_batch(prices)[0]
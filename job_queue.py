@@ -0,0 +1,337 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from utils import make_run_id, now_iso
+import metrics
+
+JOB_DB_PATH = Path(os.getenv("JOB_DB_PATH", "data/jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Idle workers re-check the table this often (jobs submitted by other processes)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+# Streamed LLM text is written to the job row at most this often
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "0.25"))
+# Running jobs without a heartbeat for this long (crashed worker) go back to the queue
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "600"))
+# A running job's heartbeat is refreshed this often, even while it waits on a long LLM call
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+# A worker that hits a queue error (e.g. "database is locked") retries after a backoff up to this long
+JOB_ERROR_BACKOFF_MAX = float(os.getenv("JOB_ERROR_BACKOFF_MAX", "30"))
+
+ACTIVE = ("queued", "running")
+STEPS_PER_JOB = 4  # quote, history, fundamentals, llm_analysis
+
+log = logging.getLogger(__name__)
+
+def dedup_key(ticker, params):
+    """Jobs for the same ticker and history window share one in-flight run."""
+    return f"{ticker.strip().upper()}|{params.get('period', '1mo')}"
+
+def _job_dict(r):
+    job = dict(r)
+    job["params"] = json.loads(job.pop("params_json"))
+    job["result"] = json.loads(job.pop("result_json")) if job["result_json"] else None
+    return job
+
+class JobQueue:
+    """
+    Analysis jobs in a SQLite table, run by a pool of worker threads. Any
+    process that opens the same file can submit or work: claims are a single
+    atomic UPDATE, and a partial unique index on dedup_key allows only one
+    queued/running job per (ticker, period), so a duplicate submit returns
+    the job already in flight. Workers record per-step progress and the
+    streamed LLM text on the job row for the UI to poll.
+    """
+
+    def __init__(self, path=None, runner=None, poll_interval=None, stale_after=None, heartbeat_interval=None):
+        self.path = Path(path or JOB_DB_PATH)
+        self.runner = runner
+        self.poll_interval = poll_interval if poll_interval is not None else JOB_POLL_INTERVAL
+        self.stale_after = stale_after if stale_after is not None else JOB_STALE_AFTER
+        # beat well inside the stale window so a live worker is never requeued
+        interval = heartbeat_interval or JOB_HEARTBEAT_INTERVAL
+        self.heartbeat_interval = min(interval, self.stale_after / 3) or interval
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            dedup_key TEXT NOT NULL,
+            ticker TEXT,
+            params_json TEXT,
+            status TEXT NOT NULL,
+            run_id TEXT,
+            steps INTEGER DEFAULT 0,
+            step TEXT,
+            partial TEXT,
+            result_json TEXT,
+            error TEXT,
+            worker TEXT,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            heartbeat REAL
+        )
+        """)
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_inflight ON jobs (dedup_key) "
+                     "WHERE status IN ('queued', 'running')")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit: every statement is its own transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.create_function("new_run_id", 0, lambda: make_run_id("mcp"))
+            self._local.conn = conn
+        return conn
+
+    # -- producers -----------------------------------------------------------
+
+    def submit(self, ticker: str, params={}) -> str:
+        """Queue an analysis and return its job_id, or the id of the identical job already in flight."""
+        ticker = ticker.strip().upper()
+        key = dedup_key(ticker, params)
+        job_id = make_run_id("job")
+        conn = self._conn()
+        cur = conn.execute("""
+            INSERT OR IGNORE INTO jobs (job_id, dedup_key, ticker, params_json, status, run_id, created_at)
+            VALUES (?, ?, ?, ?, 'queued', ?, ?)
+        """, (job_id, key, ticker, json.dumps(params), make_run_id("mcp"), now_iso()))
+        if cur.rowcount:
+            metrics.inc("mcp_jobs_total", status="queued")
+            self._wake.set()
+            return job_id
+        row = conn.execute("SELECT job_id FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'running')",
+                           (key,)).fetchone()
+        if row is None:
+            # the in-flight job finished between the two statements
+            return self.submit(ticker, params)
+        metrics.inc("mcp_jobs_deduped_total")
+        return row["job_id"]
+
+    def get(self, job_id: str):
+        row = self._conn().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row else None
+
+    def jobs(self, job_ids):
+        """Jobs by id, in the order given (unknown ids are skipped)."""
+        if not job_ids:
+            return []
+        rows = self._conn().execute(f"SELECT * FROM jobs WHERE job_id IN ({','.join('?' * len(job_ids))})",
+                                    list(job_ids)).fetchall()
+        by_id = {r["job_id"]: _job_dict(r) for r in rows}
+        return [by_id[j] for j in job_ids if j in by_id]
+
+    def counts(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+    def wait(self, job_id: str, timeout: float = None, interval: float = 0.05):
+        """Poll until the job is done or failed (or `timeout` passes) and return it."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] not in ACTIVE:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(interval)
+
+    # -- workers -------------------------------------------------------------
+
+    def claim(self, worker: str):
+        """Atomically move the oldest queued job to running and return it, or None."""
+        now = time.time()
+        row = self._conn().execute("""
+            UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat = ?
+            WHERE job_id = (SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY rowid LIMIT 1)
+              AND status = 'queued'
+            RETURNING *
+        """, (worker, now_iso(), now)).fetchone()
+        return _job_dict(row) if row else None
+
+    def requeue_stale(self) -> int:
+        """
+        Put running jobs whose worker stopped heartbeating back in the queue.
+        The retry gets a fresh run_id, so its audit steps do not mix with the
+        partial run's.
+        """
+        cur = self._conn().execute("""
+            UPDATE jobs SET status = 'queued', worker = NULL, steps = 0, step = NULL, partial = NULL,
+                            run_id = new_run_id()
+            WHERE status = 'running' AND heartbeat < ?
+        """, (time.time() - self.stale_after,))
+        return cur.rowcount
+
+    def _progress(self, job_id, **fields):
+        # best effort: runs inside the analysis, which must not fail over a progress write
+        sets = ", ".join(f"{k} = ?" for k in fields)
+        try:
+            self._conn().execute(f"UPDATE jobs SET {sets}, heartbeat = ? WHERE job_id = ?",
+                                 (*fields.values(), time.time(), job_id))
+        except sqlite3.Error as e:
+            log.warning("progress update for job %s failed: %s", job_id, e)
+
+    def _beat(self, job_id, done):
+        """Keep a running job's heartbeat fresh until `done` is set (runs in its own thread)."""
+        try:
+            while not done.wait(self.heartbeat_interval):
+                try:
+                    self._conn().execute("UPDATE jobs SET heartbeat = ? WHERE job_id = ? AND status = 'running'",
+                                         (time.time(), job_id))
+                except sqlite3.Error as e:
+                    log.warning("heartbeat for job %s failed: %s", job_id, e)
+        finally:
+            conn = getattr(self._local, "conn", None)
+            if conn is not None:
+                conn.close()
+
+    def _finish(self, job_id, status, result=None, error=None, partial=None):
+        self._conn().execute("""
+            UPDATE jobs SET status = ?, result_json = ?, error = ?, finished_at = ?, heartbeat = ?,
+                            partial = COALESCE(?, partial)
+            WHERE job_id = ?
+        """, (status, json.dumps(result) if result is not None else None, error, now_iso(), time.time(), partial,
+              job_id))
+        metrics.inc("mcp_jobs_total", status=status)
+
+    def run_job(self, job):
+        """Run one claimed job to completion, recording progress on its row."""
+        runner = self.runner
+        if runner is None:
+            # imported on first use: the UI process opens the queue before anything runs
+            from local_orchestrator import run_analysis as runner
+        job_id = job["job_id"]
+        text, last_write = [], [0.0]
+        steps = [0]
+
+        def on_token(token):
+            text.append(token)
+            now = time.monotonic()
+            if now - last_write[0] >= JOB_PROGRESS_INTERVAL:
+                last_write[0] = now
+                self._progress(job_id, partial="".join(text))
+
+        def on_step(step):
+            steps[0] += 1
+            self._progress(job_id, steps=steps[0], step=step["name"])
+
+        done = threading.Event()
+        beat = threading.Thread(target=self._beat, args=(job_id, done), name=f"job-heartbeat-{job_id}", daemon=True)
+        beat.start()
+        start = time.perf_counter()
+        try:
+            resp = runner(job["ticker"], job["params"], run_id=job["run_id"], on_token=on_token, on_step=on_step)
+        except Exception as e:
+            log.exception("job %s failed", job_id)
+            self._finish(job_id, "failed", error=f"{type(e).__name__}: {e}", partial="".join(text))
+        else:
+            result = {k: v for k, v in (resp.get("result") or {}).items() if k != "raw"}
+            self._finish(job_id, "done", result=result, partial="".join(text))
+        finally:
+            done.set()
+            beat.join()
+        metrics.observe("mcp_job_seconds", time.perf_counter() - start)
+
+    def _work(self, worker):
+        backoff = 0.0
+        while not self._stop.is_set():
+            try:
+                job = self.claim(worker)
+                if job is None:
+                    self.requeue_stale()
+                else:
+                    # the other workers may have something to claim too
+                    self._wake.set()
+                    self.run_job(job)
+            except Exception:
+                # keep the worker alive; a job it held is requeued once its heartbeat goes stale
+                backoff = min(JOB_ERROR_BACKOFF_MAX, max(self.poll_interval, 0.05, 2 * backoff))
+                log.exception("job worker %s failed, retrying in %.1fs", worker, backoff)
+                self._stop.wait(backoff)
+                continue
+            backoff = 0.0
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self, workers: int = None):
+        """Start `workers` daemon worker threads (once); returns self."""
+        if self._threads:
+            return self
+        self.requeue_stale()
+        self._stop.clear()
+        for i in range(workers or JOB_WORKERS):
+            t = threading.Thread(target=self._work, args=(f"{os.getpid()}-{i}",), name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout: float = None):
+        """Stop the workers after their current job."""
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_queue() -> JobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Local analysis job queue (SQLite, no broker).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("worker", help="run workers in this process until interrupted")
+    w.add_argument("--workers", type=int, default=JOB_WORKERS)
+    s = sub.add_parser("submit", help="queue analyses")
+    s.add_argument("tickers", nargs="+")
+    s.add_argument("--period", default="1y")
+    s.add_argument("--wait", action="store_true", help="block until the jobs finish (needs a running worker)")
+    st = sub.add_parser("status", help="show jobs")
+    st.add_argument("job_ids", nargs="*")
+    args = ap.parse_args(argv)
+
+    q = get_queue()
+    if args.cmd == "worker":
+        q.start(args.workers)
+        print(f"{args.workers} workers on {q.path}; Ctrl-C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            q.stop()
+    elif args.cmd == "submit":
+        ids = [q.submit(t, {"period": args.period}) for t in args.tickers]
+        for job_id in ids:
+            job = q.wait(job_id) if args.wait else q.get(job_id)
+            print(json.dumps({k: job[k] for k in ("job_id", "ticker", "status", "run_id", "error")}))
+    else:
+        if args.job_ids:
+            for job in q.jobs(args.job_ids):
+                print(json.dumps({k: v for k, v in job.items() if k != "partial"}))
+        else:
+            print(json.dumps(q.counts()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+# LLM_CACHE=0 disables the response cache entirely
+LLM_CACHE = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", "data/llm_cache.db"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "900"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# Relative tolerance for near-duplicate matching (0 = exact prompts only).
+# 0.01 snaps every number in the prompt to ~2 significant digits of its magnitude.
+LLM_CACHE_TOLERANCE = float(os.getenv("LLM_CACHE_TOLERANCE", "0"))
+
+# standalone numbers only: digits inside names like close_252, X12 or 12m are left alone
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?!\w)")
+
+def snap_numbers(text: str, tolerance: float) -> str:
+    """Round every number in `text` to a grid of `tolerance` times its order of magnitude."""
+    if tolerance <= 0:
+        return text
+
+    def _snap(m):
+        x = float(m.group(0))
+        if x == 0 or math.isinf(x) or math.isnan(x):
+            return m.group(0)
+        step = tolerance * 10 ** math.floor(math.log10(abs(x)))
+        return repr(round(round(x / step) * step, 12))
+
+    return _NUMBER_RE.sub(_snap, text)
+
+def make_key(model: str, params: dict, prompt: str, tolerance: float = None) -> str:
+    """Canonical sha256 over model, generation params and (optionally snapped) prompt."""
+    if tolerance is None:
+        tolerance = LLM_CACHE_TOLERANCE
+    canonical = json.dumps({"model": model, "params": params, "prompt": snap_numbers(prompt, tolerance)},
+                           sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class LLMCache:
+    """SQLite-backed LLM response cache with TTL and least-recently-used eviction by total size."""
+
+    def __init__(self, path=None, ttl=None, max_bytes=None):
+        self.path = Path(path or LLM_CACHE_PATH)
+        self.ttl = ttl if ttl is not None else LLM_CACHE_TTL
+        self.max_bytes = max_bytes or LLM_CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            created_at REAL,
+            expires_at REAL,
+            last_access REAL,
+            size INTEGER,
+            duration REAL,
+            hits INTEGER DEFAULT 0,
+            response_json TEXT
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache (last_access)")
+        conn.commit()
+        conn.close()
+
+    def _conn(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, key):
+        """Returns {"response", "duration", "created_at"} for a live entry, else None."""
+        now = time.time()
+        conn = self._conn()
+        try:
+            row = conn.execute("SELECT * FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row["expires_at"] <= now:
+                with conn:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            with conn:
+                conn.execute("UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            return {"response": json.loads(row["response_json"]), "duration": row["duration"], "created_at": row["created_at"]}
+        finally:
+            conn.close()
+
+    def put(self, key, model, response, duration):
+        data = json.dumps(response)
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO llm_cache (key, model, created_at, expires_at, last_access, size, duration, hits, response_json)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
+                """, (key, model, now, now + self.ttl, now, len(data), duration, data))
+            self._evict(conn)
+        finally:
+            conn.close()
+
+    def _evict(self, conn):
+        with self._lock, conn:
+            conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for row in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access").fetchall():
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (row["key"],))
+                total -= row["size"]
+                if total <= self.max_bytes:
+                    break
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM llm_cache")
+        conn.close()
+
+    def stats(self):
+        conn = self._conn()
+        row = conn.execute("SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes, COALESCE(SUM(hits), 0) AS hits FROM llm_cache").fetchone()
+        conn.close()
+        return dict(row)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> LLMCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
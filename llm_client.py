@@ -1,17 +1,53 @@
 import os
+import sys
 import json
+import time
+import asyncio
+import hashlib
+import itertools
+import threading
 import requests
-from typing import Dict, Any
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Optional
+import metrics
 
-# Groq endpoints / model
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+# Groq endpoints / model (GROQ_URL can point at a local stub server)
+GROQ_URL = os.getenv("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
 GROQ_MODEL = "openai/gpt-oss-120b"
+# Sampling params for analysis calls; the LLM response cache keys on the same dict
+LLM_PARAMS = {"max_tokens": 800, "temperature": 0.0}
 
-# Try to import streamlit to read secrets when running inside the Streamlit runtime
+# Connection pool / retry / probe-cache settings
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+LLM_ASYNC_SHARD_SIZE = int(os.getenv("LLM_ASYNC_SHARD_SIZE", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+PROBE_TTL = float(os.getenv("GROQ_PROBE_TTL", "600"))
+PROBE_FAIL_TTL = float(os.getenv("GROQ_PROBE_FAIL_TTL", "30"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_probe_lock = threading.Lock()
+_probe_cache: Dict[str, tuple] = {}  # sha256(key) -> (expires_at, probe result)
+_probe_key_locks: Dict[str, threading.Lock] = {}
+_async_clients: Dict[int, tuple] = {}  # id(event loop) -> (loop, _AsyncPool)
+
+# httpx powers the async client; optional so sync-only callers don't need it
 try:
-    import streamlit as _st
+    import httpx as _httpx
 except Exception:
-    _st = None
+    _httpx = None
+
+# Streamlit secrets are read only when the app has already imported streamlit;
+# importing it here would cost ~350ms on every CLI/API start. Tests set _st = None
+# to ignore secrets, or a stub object to supply them.
+_st = False
+
+def _streamlit():
+    return sys.modules.get("streamlit") if _st is False else _st
 
 def _get_key_from_env_or_secrets() -> (str, str):
     # 1) environment
@@ -19,10 +55,11 @@ def _get_key_from_env_or_secrets() -> (str, str):
     if env_key:
         return env_key, "env"
     # 2) streamlit secrets (common in Streamlit Cloud)
-    if _st is not None:
+    st = _streamlit()
+    if st is not None:
         try:
             # st.secrets supports mapping access; handle a few shapes safely
-            s = _st.secrets
+            s = st.secrets
             # typical usage: st.secrets["GROQ_API_KEY"]
             if isinstance(s, dict):
                 key = s.get("GROQ_API_KEY")
@@ -52,6 +89,69 @@ def _mask_key(k: str) -> str:
     prefix = k[:4]
     return f"{prefix}... (len={len(k)})"
 
+def get_session(pool_size: int = None) -> requests.Session:
+    """Long-lived pooled session shared by all LLM calls (keep-alive, no per-call TLS handshake)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            size = pool_size or LLM_POOL_SIZE
+            sess = requests.Session()
+            adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+            sess.mount("https://", adapter)
+            sess.mount("http://", adapter)
+            _session = sess
+        return _session
+
+def reset_session(pool_size: int = None):
+    """Close the shared session; the next call builds a new one (optionally with a new pool size)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+    if pool_size:
+        get_session(pool_size)
+
+def _retry_delay(resp, attempt: int) -> float:
+    # Honour Retry-After (seconds or HTTP date), otherwise exponential backoff
+    retry_after = resp.headers.get("Retry-After") if resp is not None else None
+    if retry_after:
+        try:
+            return min(LLM_BACKOFF_MAX, max(0.0, float(retry_after)))
+        except ValueError:
+            try:
+                return min(LLM_BACKOFF_MAX, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()))
+            except Exception:
+                pass
+    return min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt))
+
+def _post_with_retry(headers, payload, timeout, max_retries: int = None, stream: bool = False):
+    """POST to GROQ_URL on the shared session, retrying 429/5xx and connection errors."""
+    if max_retries is None:
+        max_retries = LLM_MAX_RETRIES
+    sess = get_session()
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            resp = sess.post(GROQ_URL, headers=headers, json=payload, timeout=timeout, stream=stream)
+        except requests.ConnectionError:
+            metrics.observe("mcp_llm_request_seconds", time.perf_counter() - start, status="error")
+            if attempt >= max_retries:
+                raise
+            metrics.inc("mcp_llm_retries_total", reason="connection")
+            time.sleep(_retry_delay(None, attempt))
+            attempt += 1
+            continue
+        # for streams this is time to response headers
+        metrics.observe("mcp_llm_request_seconds", time.perf_counter() - start, status=resp.status_code)
+        if resp.status_code not in RETRY_STATUSES or attempt >= max_retries:
+            return resp
+        metrics.inc("mcp_llm_retries_total", reason=resp.status_code)
+        resp.close()
+        time.sleep(_retry_delay(resp, attempt))
+        attempt += 1
+
 def _probe_groq_key(key: str, timeout: int = 10) -> Dict[str, Any]:
     """
     Do a minimal call to Groq to sanity-check key validity.
@@ -68,7 +168,7 @@ def _probe_groq_key(key: str, timeout: int = 10) -> Dict[str, Any]:
         "temperature": 0.0,
     }
     try:
-        resp = requests.post(GROQ_URL, headers=headers, json=payload, timeout=timeout)
+        resp = _post_with_retry(headers, payload, timeout, max_retries=0)
         # Return status code and limited body info (not full data)
         try:
             body = resp.json()
@@ -78,23 +178,44 @@ def _probe_groq_key(key: str, timeout: int = 10) -> Dict[str, Any]:
     except Exception as e:
         return {"ok": False, "status_code": None, "error": str(e)}
 
-def make_llm_call(prompt: str, max_tokens: int = 800, temperature: float = 0.0) -> Dict[str, Any]:
+def _cached_probe(key: str) -> Dict[str, Any]:
+    h = hashlib.sha256(key.encode()).hexdigest()
+    with _probe_lock:
+        key_lock = _probe_key_locks.setdefault(h, threading.Lock())
+    # one probe per key at a time; concurrent callers wait and reuse its result
+    with key_lock:
+        now = time.monotonic()
+        with _probe_lock:
+            hit = _probe_cache.get(h)
+            if hit is not None and hit[0] > now:
+                return dict(hit[1], cached=True)
+        probe = _probe_groq_key(key)
+        ttl = PROBE_TTL if probe.get("ok") else PROBE_FAIL_TTL
+        with _probe_lock:
+            _probe_cache[h] = (time.monotonic() + ttl, probe)
+        return probe
+
+def clear_probe_cache():
+    with _probe_lock:
+        _probe_cache.clear()
+
+def _prepare_call(prompt: str, max_tokens: int, temperature: float):
+    """Resolve the key and probe it. Returns (headers, payload, debug, mock_resp); mock_resp is set when we must not call the model."""
     # Find key
     key, source = _get_key_from_env_or_secrets()
     debug = {"found": bool(key), "source": source, "masked": _mask_key(key) if key else None}
 
     if not key:
-        return {"mock": True, "text": "No GROQ_API_KEY set. Using mock response.", "raw": None, "debug": debug}
+        return None, None, debug, {"mock": True, "text": "No GROQ_API_KEY set. Using mock response.", "raw": None, "debug": debug}
 
-    # Probe the key once for diagnostics (this will consume a tiny amount of quota)
-    probe = _probe_groq_key(key)
+    # Probe the key for diagnostics; cached per key so quota is spent at most once per TTL
+    probe = _cached_probe(key)
     debug["probe"] = probe
 
     # If probe indicates not ok, return diagnostic immediately (avoid full prompt)
     if not probe.get("ok"):
-        return {"mock": True, "text": f"Groq key probe failed (status={probe.get('status_code')}). See debug.", "raw": None, "debug": debug}
+        return None, None, debug, {"mock": True, "text": f"Groq key probe failed (status={probe.get('status_code')}). See debug.", "raw": None, "debug": debug}
 
-    # Proceed to call the model for real
     headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
     payload = {
         "model": GROQ_MODEL,
@@ -105,12 +226,195 @@ def make_llm_call(prompt: str, max_tokens: int = 800, temperature: float = 0.0)
         "max_tokens": max_tokens,
         "temperature": temperature,
     }
+    return headers, payload, debug, None
+
+def _iter_sse_data(resp):
+    """Yield decoded JSON payloads from an OpenAI-compatible SSE stream, stopping at [DONE]."""
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except ValueError:
+            continue
+
+class LLMStream:
+    """
+    Iterable over completion tokens as they arrive. Once iteration ends, `result`
+    holds the same dict make_llm_call returns, plus `ttft` (time to first
+    token) and `duration`, both in seconds from the start of the request.
+    If the stream fails or the caller stops early, `result` keeps the text
+    received so far and carries an `error` field.
+    """
+
+    def __init__(self, prompt: str, max_tokens: int = LLM_PARAMS["max_tokens"],
+                 temperature: float = LLM_PARAMS["temperature"]):
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.result = None
+
+    def __iter__(self):
+        start = time.monotonic()
+        ttft = None
+        headers, payload, debug, mock_resp = _prepare_call(self.prompt, self.max_tokens, self.temperature)
+        if mock_resp is not None:
+            self.result = dict(mock_resp, ttft=time.monotonic() - start, duration=time.monotonic() - start)
+            yield mock_resp["text"]
+            return
+
+        payload = dict(payload, stream=True)
+        parts = []
+        chunks = []
+        error = "stream closed before it finished"
+        try:
+            resp = _post_with_retry(headers, payload, timeout=120, stream=True)
+            # closed on every exit, error statuses included, so the pooled connection is released
+            with resp:
+                resp.raise_for_status()
+                for chunk in _iter_sse_data(resp):
+                    chunks.append(chunk)
+                    try:
+                        token = chunk["choices"][0]["delta"].get("content")
+                    except (KeyError, IndexError, TypeError, AttributeError):
+                        token = None
+                    if token:
+                        if ttft is None:
+                            ttft = time.monotonic() - start
+                        parts.append(token)
+                        yield token
+            error = None
+        except Exception as e:
+            error = str(e)
+            debug["error"] = error
+            if not parts:
+                yield f"Groq request failed: {error}"
+        finally:
+            # keep the raw stream compact: the final chunk carries finish_reason/usage
+            raw = {"chunks": len(chunks), "last_chunk": chunks[-1] if chunks else None}
+            self.result = {"mock": False, "text": "".join(parts), "raw": raw, "debug": debug,
+                           "ttft": ttft, "duration": time.monotonic() - start, "stream": True}
+            if error is not None:
+                self.result["error"] = error
+                if not parts:
+                    self.result.update(mock=True, text=f"Groq request failed: {error}", raw=None)
+
+def make_llm_call(prompt: str, max_tokens: int = LLM_PARAMS["max_tokens"],
+                  temperature: float = LLM_PARAMS["temperature"], stream: bool = False):
+    """
+    Call the model and return {"mock", "text", "raw", "debug"}.
+    With stream=True returns an LLMStream that yields tokens as they arrive.
+    """
+    if stream:
+        return LLMStream(prompt, max_tokens, temperature)
+
+    headers, payload, debug, mock_resp = _prepare_call(prompt, max_tokens, temperature)
+    if mock_resp is not None:
+        return mock_resp
+
+    # Proceed to call the model for real
+    try:
+        resp = _post_with_retry(headers, payload, timeout=120)
+        resp.raise_for_status()
+        data = resp.json()
+    except Exception as e:
+        return {"mock": True, "text": f"Groq request failed: {str(e)}", "raw": None, "debug": dict(debug, error=str(e))}
+
+    try:
+        text = data["choices"][0]["message"]["content"]
+    except Exception:
+        text = json.dumps(data)[:10000]
+
+    return {"mock": False, "text": text, "raw": data, "debug": debug}
+
+class _AsyncPool:
+    """
+    httpx clients sharded into small connection pools. httpcore scans every
+    connection on each request, so one large pool degrades quadratically; a
+    semaphore also keeps requests from queueing inside the clients.
+    """
+
+    def __init__(self, size):
+        shards = max(1, -(-size // LLM_ASYNC_SHARD_SIZE))
+        per_shard = max(1, -(-size // shards))
+        limits = _httpx.Limits(max_connections=per_shard, max_keepalive_connections=per_shard)
+        self.clients = [_httpx.AsyncClient(limits=limits) for _ in range(shards)]
+        self.slots = asyncio.Semaphore(size)
+        self._next = itertools.cycle(self.clients)
+
+    def client(self):
+        return next(self._next)
+
+    @property
+    def is_closed(self):
+        return any(c.is_closed for c in self.clients)
+
+    async def aclose(self):
+        for c in self.clients:
+            await c.aclose()
+
+def get_async_client(pool_size: int = None) -> _AsyncPool:
+    """Pooled async HTTP clients for the running event loop (clients cannot be shared across loops)."""
+    if _httpx is None:
+        raise RuntimeError("the async LLM client needs the httpx package")
+    loop = asyncio.get_running_loop()
+    owner, pool = _async_clients.get(id(loop), (None, None))
+    if owner is not loop or pool.is_closed:
+        # drop pools whose loops have finished
+        for k, (l, _) in list(_async_clients.items()):
+            if l.is_closed():
+                del _async_clients[k]
+        pool = _AsyncPool(pool_size or LLM_POOL_SIZE)
+        _async_clients[id(loop)] = (loop, pool)
+    return pool
+
+async def close_async_client():
+    _, pool = _async_clients.pop(id(asyncio.get_running_loop()), (None, None))
+    if pool is not None:
+        await pool.aclose()
+
+async def _post_with_retry_async(headers, payload, timeout, max_retries: int = None):
+    if max_retries is None:
+        max_retries = LLM_MAX_RETRIES
+    pool = get_async_client()
+    attempt = 0
+    while True:
+        start = None
+        try:
+            async with pool.slots:
+                start = time.perf_counter()
+                resp = await pool.client().post(GROQ_URL, headers=headers, json=payload, timeout=timeout)
+        except _httpx.TransportError:
+            if start is not None:
+                metrics.observe("mcp_llm_request_seconds", time.perf_counter() - start, status="error")
+            if attempt >= max_retries:
+                raise
+            metrics.inc("mcp_llm_retries_total", reason="connection")
+            await asyncio.sleep(_retry_delay(None, attempt))
+            attempt += 1
+            continue
+        metrics.observe("mcp_llm_request_seconds", time.perf_counter() - start, status=resp.status_code)
+        if resp.status_code not in RETRY_STATUSES or attempt >= max_retries:
+            return resp
+        metrics.inc("mcp_llm_retries_total", reason=resp.status_code)
+        await asyncio.sleep(_retry_delay(resp, attempt))
+        attempt += 1
+
+async def make_llm_call_async(prompt: str, max_tokens: int = LLM_PARAMS["max_tokens"],
+                              temperature: float = LLM_PARAMS["temperature"]) -> Dict[str, Any]:
+    """Async counterpart of make_llm_call; the (cached) key probe runs in a worker thread."""
+    headers, payload, debug, mock_resp = await asyncio.to_thread(_prepare_call, prompt, max_tokens, temperature)
+    if mock_resp is not None:
+        return mock_resp
     try:
-        resp = requests.post(GROQ_URL, headers=headers, json=payload, timeout=120)
+        resp = await _post_with_retry_async(headers, payload, timeout=120)
         resp.raise_for_status()
         data = resp.json()
     except Exception as e:
-        return {"mock": True, "text": f"Groq request failed: {str(e)}", "raw": None, "debug": {"found": True, "source": source, "masked": _mask_key(key), "error": str(e)}}
+        return {"mock": True, "text": f"Groq request failed: {str(e)}", "raw": None, "debug": dict(debug, error=str(e))}
 
     try:
         text = data["choices"][0]["message"]["content"]
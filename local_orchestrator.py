@@ -1,64 +1,312 @@
+import os
 import time
-import json
-from tools_registry import tools
-from audit_model import save_audit_step
+import asyncio
+import sqlite3
+import logging
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from tools_registry import tools, get_async_tool
+from tool_cache import last_cache_status, reset_cache_status
+from audit_model import save_audit_step, flush_audit, save_audit_step_async, flush_audit_async
 from utils import make_run_id, now_iso
-from llm_client import make_llm_call
+from llm_client import make_llm_call, make_llm_call_async, GROQ_MODEL, LLM_PARAMS
+import llm_cache
+from prompt_builder import build_prompt
+import metrics
 
-def compose_prompt(ticker, quote, history, fundamentals, params):
-    return f"""
-Analyze stock {ticker} based on:
+# Per-tool timeout (seconds) and size of the shared tool thread pool
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "10"))
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "8"))
+# TOOL_TIMEOUT counts from when a tool starts running; a call still waiting for a
+# worker after this long is dropped and reported separately
+TOOL_QUEUE_TIMEOUT = float(os.getenv("TOOL_QUEUE_TIMEOUT", "30"))
 
-Quote: {json.dumps(quote)}
-Fundamentals: {json.dumps(fundamentals)}
-History sample: {str(history)[:800]}
-Params: {params}
+# Module-level pool: a timed-out tool keeps its worker busy until it returns,
+# so we never block on shutdown of a per-run executor.
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="mcp-tool")
 
-Return JSON with:
-- technical_summary
-- fundamental_summary
-- risk_assessment
-- final_recommendation
-"""
+log = logging.getLogger(__name__)
 
-def run_analysis(ticker: str, params={}, run_id=None):
+def compose_prompt(ticker, quote, history, fundamentals, params, budget=None):
+    return build_prompt(ticker, quote, history, fundamentals, params, budget)[0]
+
+def _flush_run():
+    # a locked DB must not fail a run whose LLM call already succeeded:
+    # the rows stay buffered and the background writer retries them
+    try:
+        flush_audit()
+    except sqlite3.OperationalError as e:
+        log.warning("audit flush failed, left to the background writer: %s", e)
+
+async def _flush_run_async():
+    try:
+        await flush_audit_async()
+    except sqlite3.OperationalError as e:
+        log.warning("audit flush failed, left to the background writer: %s", e)
+
+def _record_tool(tool, out, duration, cache=None):
+    metrics.observe("mcp_tool_seconds", duration, tool=tool, cache=cache or "none")
+    if isinstance(out, dict) and "error" in out:
+        metrics.inc("mcp_tool_errors_total", tool=tool)
+
+class _Started(threading.Event):
+    """Set by the worker, with the start time in `at`, when a queued tool call begins to run."""
+    at = None
+
+    def mark(self, t):
+        self.at = t
+        self.set()
+
+def _timed_call(fn, *args, tool=None, submitted=None, started=None):
+    reset_cache_status()
+    start = time.perf_counter()
+    if started is not None:
+        started.mark(start)
+    if submitted is not None:
+        metrics.observe("mcp_tool_queue_seconds", start - submitted, tool=tool)
+    try:
+        out = fn(*args)
+    except Exception as e:
+        out = {"error": f"{type(e).__name__}: {e}"}
+    duration = time.perf_counter() - start
+    cache = last_cache_status()
+    _record_tool(tool or getattr(fn, "__name__", "tool"), out, duration, cache)
+    return out, duration, cache
+
+def _tool_specs(ticker, params):
+    return [
+        ("quote", "quote_tool", (ticker,)),
+        ("history", "history_tool", (ticker, params.get("period", "1mo"))),
+        ("fundamentals", "fundamentals_tool", (ticker,)),
+    ]
+
+def run_tools(ticker: str, params={}, timeout: float = None, pool=None):
+    """
+    Run the independent data tools concurrently on `pool` (default: shared tool pool).
+    Returns a list of step dicts in fixed order (quote, history, fundamentals);
+    a failed or timed-out tool yields {"error": ...} as its output. `timeout`
+    applies from when each tool starts running, so time queued behind a busy
+    pool does not count; a tool that gets no worker within TOOL_QUEUE_TIMEOUT
+    is dropped with its own error. `cache` is "hit"/"miss"/"coalesced" for
+    cached tools, None otherwise.
+    """
+    if timeout is None:
+        timeout = TOOL_TIMEOUT
+    if pool is None:
+        pool = _tool_pool
+    specs = _tool_specs(ticker, params)
+    start = time.perf_counter()
+    started = [_Started() for _ in specs]
+    futures = [pool.submit(_timed_call, tools[tool], *args, tool=tool, submitted=start, started=s)
+               for (_, tool, args), s in zip(specs, started)]
+
+    steps = []
+    for (name, tool, _), fut, began in zip(specs, futures, started):
+        if not began.wait(max(0.0, start + TOOL_QUEUE_TIMEOUT - time.perf_counter())) and fut.cancel():
+            output, duration, cache = {"error": f"no free tool worker within {TOOL_QUEUE_TIMEOUT}s"}, 0.0, None
+            metrics.inc("mcp_tool_errors_total", tool=tool)
+        else:
+            began.wait()
+            try:
+                output, duration, cache = fut.result(timeout=max(0.0, began.at + timeout - time.perf_counter()))
+            except Exception:
+                output, duration, cache = {"error": f"timeout after {timeout}s"}, time.perf_counter() - began.at, None
+                metrics.inc("mcp_tool_errors_total", tool=tool)
+        steps.append({"name": name, "tool": tool, "input": {"ticker": ticker}, "output": output, "duration": duration, "cache": cache})
+    return steps
+
+def _call_llm(prompt, on_token=None):
+    if on_token is None:
+        return make_llm_call(prompt), {}
+    stream = make_llm_call(prompt, stream=True)
+    for token in stream:
+        on_token(token)
+    resp = stream.result
+    if resp is None:
+        resp = {"mock": True, "text": "", "raw": None, "error": "stream produced no result"}
+    if resp.get("ttft") is not None:
+        metrics.observe("mcp_llm_ttft_seconds", resp["ttft"])
+    return resp, {"stream": True, "ttft": resp.get("ttft"), "llm_duration": resp.get("duration")}
+
+def _llm_step(prompt, params, llm_gate=None, on_token=None):
+    """
+    LLM step behind the response cache. Returns (response, duration, meta) where
+    meta["status"] is "cache_hit", "cache_miss", "cache_bypass" or "uncached".
+    Hits skip the LLM gate entirely.
+    """
+    key = None
+    if not llm_cache.LLM_CACHE:
+        status = "uncached"
+    elif params.get("no_cache"):
+        status = "cache_bypass"
+    else:
+        status = "cache_miss"
+        key = llm_cache.make_key(GROQ_MODEL, LLM_PARAMS, prompt)
+        start = time.perf_counter()
+        try:
+            hit = llm_cache.get_cache().get(key)
+        except sqlite3.Error:
+            hit = None
+        if hit is not None:
+            duration = time.perf_counter() - start
+            metrics.observe("mcp_llm_seconds", duration, status="cache_hit")
+            resp = dict(hit["response"], cached=True)
+            if on_token is not None:
+                on_token(resp.get("text", ""))
+            return resp, duration, {"status": "cache_hit", "cache_key": key[:16],
+                                    "latency_saved": max(0.0, (hit["duration"] or 0.0) - duration)}
+
+    queued = time.perf_counter()
+    with llm_gate or nullcontext():
+        start = time.perf_counter()
+        metrics.observe("mcp_llm_queue_seconds", start - queued)
+        resp, meta = _call_llm(prompt, on_token)
+        duration = time.perf_counter() - start
+    metrics.observe("mcp_llm_seconds", duration, status=status)
+    if key is not None and not resp.get("mock") and not resp.get("error"):
+        try:
+            llm_cache.get_cache().put(key, GROQ_MODEL, resp, duration)
+        except sqlite3.Error:
+            pass
+    return resp, duration, dict(meta, status=status)
+
+def run_analysis(ticker: str, params={}, run_id=None, tool_pool=None, llm_gate=None, on_token=None, on_step=None):
+    """
+    Run the full MCP pipeline for one ticker.
+    `tool_pool` overrides the executor used for tool calls and `llm_gate`
+    (e.g. a semaphore) bounds concurrent LLM calls; both are used by batch runs.
+    When `on_token` is given the LLM response is streamed and `on_token(token)`
+    is called for every token as it arrives; `on_step(step)` is called with each
+    trace entry once it is recorded. params["no_cache"] bypasses the LLM
+    response cache.
+    """
     if run_id is None:
         run_id = make_run_id("mcp")
+    run_start = time.perf_counter()
 
     trace = []
     idx = 0
 
-    # STEP 1 — QUOTE
-    start = time.time()
-    quote = tools["quote_tool"](ticker)
-    duration = time.time() - start
-    save_audit_step(run_id, idx, "quote", "quote_tool", {"ticker": ticker}, quote, duration, now_iso())
-    trace.append({"name": "quote", "tool": "quote_tool", "input": {"ticker": ticker}, "output": quote})
-    idx += 1
-
-    # STEP 2 — HISTORY
-    start = time.time()
-    history = tools["history_tool"](ticker, params.get("period", "1mo"))
-    duration = time.time() - start
-    save_audit_step(run_id, idx, "history", "history_tool", {"ticker": ticker}, history, duration, now_iso())
-    trace.append({"name": "history", "tool": "history_tool", "input": {}, "output": history})
-    idx += 1
-
-    # STEP 3 — FUNDAMENTALS
-    start = time.time()
-    fundamentals = tools["fundamentals_tool"](ticker)
-    duration = time.time() - start
-    save_audit_step(run_id, idx, "fundamentals", "fundamentals_tool", {"ticker": ticker}, fundamentals, duration, now_iso())
-    trace.append({"name": "fundamentals", "tool": "fundamentals_tool", "input": {}, "output": fundamentals})
-    idx += 1
+    # STEPS 1-3 — QUOTE / HISTORY / FUNDAMENTALS (concurrent, recorded in fixed order)
+    tool_steps = run_tools(ticker, params, pool=tool_pool)
+    for step in tool_steps:
+        save_audit_step(run_id, idx, step["name"], step["tool"], step["input"], step["output"], step["duration"], now_iso(),
+                        meta={"cache": step["cache"]})
+        trace.append({"name": step["name"], "tool": step["tool"], "input": step["input"], "output": step["output"], "cache": step["cache"]})
+        if on_step is not None:
+            on_step(trace[-1])
+        idx += 1
+    quote, history, fundamentals = (s["output"] for s in tool_steps)
 
     # STEP 4 — LLM
-    prompt = compose_prompt(ticker, quote, history, fundamentals, params)
-    start = time.time()
-    llm_resp = make_llm_call(prompt)
-    duration = time.time() - start
+    prompt, prompt_stats = build_prompt(ticker, quote, history, fundamentals, params, params.get("prompt_budget"))
+    llm_resp, duration, llm_meta = _llm_step(prompt, params, llm_gate, on_token)
+    llm_meta = dict(llm_meta, **prompt_stats)
+
+    save_audit_step(run_id, idx, "llm_analysis", "gpt-oss-120b", {"prompt": prompt[:1500]}, llm_resp, duration, now_iso(),
+                    meta=llm_meta)
+    trace.append({"name": "llm_analysis", "tool": "gpt-oss-120b", "input": {}, "output": llm_resp, "meta": llm_meta})
+    # one transaction for the whole run
+    _flush_run()
+    if on_step is not None:
+        on_step(trace[-1])
+    metrics.observe("mcp_run_seconds", time.perf_counter() - run_start, mode="sync")
+
+    return {"run_id": run_id, "trace": trace, "result": llm_resp}
+
+async def _call_async(name, args):
+    # runs in its own task under wait_for, so the cache status is read here
+    reset_cache_status()
+    out = await get_async_tool(name)(*args)
+    return out, last_cache_status()
+
+async def _timed_call_async(name, args, timeout):
+    start = time.perf_counter()
+    cache = None
+    try:
+        out, cache = await asyncio.wait_for(_call_async(name, args), timeout)
+    except asyncio.TimeoutError:
+        out = {"error": f"timeout after {timeout}s"}
+    except Exception as e:
+        out = {"error": f"{type(e).__name__}: {e}"}
+    duration = time.perf_counter() - start
+    _record_tool(name, out, duration, cache)
+    return out, duration, cache
+
+async def run_tools_async(ticker: str, params={}, timeout: float = None):
+    """Async counterpart of run_tools: gathers the tools on the running event loop."""
+    if timeout is None:
+        timeout = TOOL_TIMEOUT
+    specs = _tool_specs(ticker, params)
+    results = await asyncio.gather(*(_timed_call_async(tool, args, timeout) for _, tool, args in specs))
+    return [{"name": name, "tool": tool, "input": {"ticker": ticker}, "output": out, "duration": duration, "cache": cache}
+            for (name, tool, _), (out, duration, cache) in zip(specs, results)]
+
+async def _llm_step_async(prompt, params, llm_gate=None):
+    key = None
+    if not llm_cache.LLM_CACHE:
+        status = "uncached"
+    elif params.get("no_cache"):
+        status = "cache_bypass"
+    else:
+        status = "cache_miss"
+        key = llm_cache.make_key(GROQ_MODEL, LLM_PARAMS, prompt)
+        start = time.perf_counter()
+        try:
+            hit = await asyncio.to_thread(llm_cache.get_cache().get, key)
+        except sqlite3.Error:
+            hit = None
+        if hit is not None:
+            duration = time.perf_counter() - start
+            metrics.observe("mcp_llm_seconds", duration, status="cache_hit")
+            return dict(hit["response"], cached=True), duration, {
+                "status": "cache_hit", "cache_key": key[:16],
+                "latency_saved": max(0.0, (hit["duration"] or 0.0) - duration)}
+
+    queued = time.perf_counter()
+    async with llm_gate or nullcontext():
+        start = time.perf_counter()
+        metrics.observe("mcp_llm_queue_seconds", start - queued)
+        resp = await make_llm_call_async(prompt)
+        duration = time.perf_counter() - start
+    metrics.observe("mcp_llm_seconds", duration, status=status)
+    if key is not None and not resp.get("mock") and not resp.get("error"):
+        try:
+            await asyncio.to_thread(llm_cache.get_cache().put, key, GROQ_MODEL, resp, duration)
+        except sqlite3.Error:
+            pass
+    return resp, duration, {"status": status}
+
+async def run_analysis_async(ticker: str, params={}, run_id=None, llm_gate=None):
+    """
+    Event-loop version of run_analysis. Async tools run natively, sync tools in
+    the loop's executor; `llm_gate` may be an asyncio.Semaphore bounding LLM calls.
+    Produces the same audit steps and return value as run_analysis.
+    """
+    if run_id is None:
+        run_id = make_run_id("mcp")
+    run_start = time.perf_counter()
+
+    trace = []
+    idx = 0
+
+    tool_steps = await run_tools_async(ticker, params)
+    for step in tool_steps:
+        await save_audit_step_async(run_id, idx, step["name"], step["tool"], step["input"], step["output"], step["duration"],
+                                    now_iso(), meta={"cache": step["cache"]})
+        trace.append({"name": step["name"], "tool": step["tool"], "input": step["input"], "output": step["output"], "cache": step["cache"]})
+        idx += 1
+    quote, history, fundamentals = (s["output"] for s in tool_steps)
+
+    prompt, prompt_stats = build_prompt(ticker, quote, history, fundamentals, params, params.get("prompt_budget"))
+    llm_resp, duration, llm_meta = await _llm_step_async(prompt, params, llm_gate)
+    llm_meta = dict(llm_meta, **prompt_stats)
 
-    save_audit_step(run_id, idx, "llm_analysis", "gpt-oss-120b", {"prompt": prompt[:1500]}, llm_resp, duration, now_iso())
-    trace.append({"name": "llm_analysis", "tool": "gpt-oss-120b", "input": {}, "output": llm_resp})
+    await save_audit_step_async(run_id, idx, "llm_analysis", "gpt-oss-120b", {"prompt": prompt[:1500]}, llm_resp, duration,
+                                now_iso(), meta=llm_meta)
+    trace.append({"name": "llm_analysis", "tool": "gpt-oss-120b", "input": {}, "output": llm_resp, "meta": llm_meta})
+    await _flush_run_async()
+    metrics.observe("mcp_run_seconds", time.perf_counter() - run_start, mode="async")
 
     return {"run_id": run_id, "trace": trace, "result": llm_resp}
@@ -0,0 +1,190 @@
+import os
+import time
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+# METRICS=0 turns every observe/inc into a no-op
+METRICS = os.getenv("METRICS", "1") != "0"
+# Optional file the Prometheus text is written to by write_prometheus()
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+# Log-linear buckets over microseconds: 2**_SUB_BITS sub-buckets per power of two
+# keeps every recorded value within ~3% (HDR histogram layout).
+_SUB_BITS = 5
+_SUB = 1 << _SUB_BITS
+_MAX_EXP = 40  # ~12 days in microseconds
+
+def _bucket(us: int) -> int:
+    if us < _SUB:
+        return max(us, 0)
+    e = us.bit_length() - 1 - _SUB_BITS
+    return _SUB + e * _SUB + (us >> e) - _SUB
+
+def _bucket_value(idx: int) -> float:
+    """Midpoint of a bucket, in microseconds."""
+    if idx < _SUB:
+        return float(idx)
+    e, sub = divmod(idx - _SUB, _SUB)
+    lo = (sub + _SUB) << e
+    return lo + ((1 << e) - 1) / 2.0
+
+class Histogram:
+    """Fixed-memory latency histogram (seconds in, seconds out) with percentile queries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (_SUB + _MAX_EXP * _SUB)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds: float):
+        idx = min(_bucket(int(seconds * 1e6)), len(self.counts) - 1)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.sum += seconds
+            self.min = seconds if self.min is None else min(self.min, seconds)
+            self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            if not self.count:
+                return None
+            rank = max(1, round(q * self.count))
+            seen = 0
+            for idx, c in enumerate(self.counts):
+                seen += c
+                if seen >= rank:
+                    return min(max(_bucket_value(idx) / 1e6, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        out = {"count": self.count, "sum": self.sum, "mean": self.sum / self.count if self.count else None,
+               "min": self.min, "max": self.max}
+        out.update({f"p{round(q * 100)}": self.percentile(q) for q in QUANTILES})
+        return out
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Registry:
+    """Named histograms and counters, each keyed by a sorted tuple of labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.help = {}
+
+    def histogram(self, name, **labels) -> Histogram:
+        key = _key(name, labels)
+        h = self.histograms.get(key)
+        if h is None:
+            with self._lock:
+                h = self.histograms.setdefault(key, Histogram())
+        return h
+
+    def observe(self, name, seconds, **labels):
+        if METRICS:
+            self.histogram(name, **labels).observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        if not METRICS:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def snapshot(self):
+        """{"histograms": [{name, labels, count, p50, ...}], "counters": [{name, labels, value}]}"""
+        with self._lock:
+            hists = list(self.histograms.items())
+            counters = list(self.counters.items())
+        return {
+            "histograms": [dict(name=n, labels=dict(l), **h.summary()) for (n, l), h in sorted(hists, key=lambda x: x[0])],
+            "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(counters)],
+        }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition: histograms as summaries with quantiles, counters as counters."""
+        snap = self.snapshot()
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for h in snap["histograms"]:
+            header(h["name"], "summary")
+            for q in QUANTILES:
+                lines.append(f"{h['name']}{_labels(h['labels'], quantile=q)} {h[f'p{round(q * 100)}']:.6g}")
+            lines.append(f"{h['name']}_sum{_labels(h['labels'])} {h['sum']:.6g}")
+            lines.append(f"{h['name']}_count{_labels(h['labels'])} {h['count']}")
+        for c in snap["counters"]:
+            header(c["name"], "counter")
+            lines.append(f"{c['name']}{_labels(c['labels'])} {c['value']}")
+        return "\n".join(lines) + "\n"
+
+def _labels(labels, **extra):
+    items = dict(labels, **extra)
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items.items()) + "}"
+
+registry = Registry()
+observe = registry.observe
+inc = registry.inc
+snapshot = registry.snapshot
+render_prometheus = registry.render_prometheus
+
+@contextmanager
+def timer(name, **labels):
+    """Time a block with the monotonic perf counter and record it in `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - start, **labels)
+
+def write_prometheus(path=None):
+    """Write the Prometheus text atomically to `path` (default METRICS_FILE) for a textfile collector."""
+    path = Path(path or METRICS_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(render_prometheus())
+    os.replace(tmp, path)
+    return path
+
+for _name, _text in {
+    "mcp_run_seconds": "End-to-end analysis latency.",
+    "mcp_tool_seconds": "Tool execution time.",
+    "mcp_tool_queue_seconds": "Time a tool call waited for a worker thread.",
+    "mcp_llm_seconds": "LLM step latency including cache lookups.",
+    "mcp_llm_queue_seconds": "Time spent waiting for the LLM concurrency gate.",
+    "mcp_llm_request_seconds": "HTTP request time to the LLM endpoint.",
+    "mcp_llm_ttft_seconds": "LLM time to first token (streaming).",
+    "mcp_llm_retries_total": "LLM requests retried, by reason.",
+    "mcp_tool_errors_total": "Tool calls that returned an error or timed out.",
+    "mcp_tool_cache_total": "Tool cache hits, misses, coalesced waits, evictions and expirations.",
+    "mcp_audit_flush_seconds": "Audit buffer flush (one transaction) time.",
+    "mcp_audit_dropped_rows_total": "Audit rows dropped because they could not be written.",
+    "mcp_api_request_seconds": "HTTP API request latency.",
+}.items():
+    registry.describe(_name, _text)
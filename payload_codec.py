@@ -0,0 +1,138 @@
+import json
+import zlib
+import struct
+import hashlib
+from array import array
+
+# zstd is optional; fall back to zlib when the package is missing
+try:
+    import zstandard as _zstd
+except Exception:
+    _zstd = None
+
+MAGIC = b"MCP1"
+# Lists of at least this many dicts with identical keys are stored column-wise
+MIN_TABLE_ROWS = 8
+_INT64 = (-(2 ** 63), 2 ** 63 - 1)
+# Single-key dicts with these keys are codec markers; user dicts shaped like them are escaped
+_TABLE = "__table__"
+_ESCAPED = "__escaped__"
+
+def available_codecs():
+    return ["json", "zlib"] + (["zstd"] if _zstd is not None else [])
+
+def resolve_codec(codec: str) -> str:
+    if codec == "zstd" and _zstd is None:
+        return "zlib"
+    if codec not in ("json", "zlib", "zstd"):
+        raise ValueError(f"unknown payload codec: {codec}")
+    return codec
+
+def _column(values):
+    """Pack a column into array('q') / array('d') if it is homogeneous int / float, else None."""
+    if all(type(v) is int for v in values):
+        if all(_INT64[0] <= v <= _INT64[1] for v in values):
+            return "q", array("q", values)
+        return None
+    if all(type(v) is float for v in values):
+        return "d", array("d", values)
+    return None
+
+def _pack(obj, buffers):
+    if isinstance(obj, list):
+        if len(obj) >= MIN_TABLE_ROWS and all(isinstance(x, dict) for x in obj):
+            keys = list(obj[0].keys())
+            if all(isinstance(k, str) for k in keys) and all(list(x.keys()) == keys for x in obj):
+                cols = {}
+                for k in keys:
+                    values = [x[k] for x in obj]
+                    packed = _column(values)
+                    if packed is None:
+                        cols[k] = {"v": _pack(values, buffers)}
+                    else:
+                        cols[k] = {"b": len(buffers), "t": packed[0]}
+                        buffers.append(packed[1].tobytes())
+                return {_TABLE: {"keys": keys, "n": len(obj), "cols": cols}}
+        return [_pack(x, buffers) for x in obj]
+    if isinstance(obj, dict):
+        packed = {k: _pack(v, buffers) for k, v in obj.items()}
+        return {_ESCAPED: packed} if len(obj) == 1 and next(iter(obj)) in (_TABLE, _ESCAPED) else packed
+    return obj
+
+def _unpack(obj, buffers):
+    if isinstance(obj, list):
+        return [_unpack(x, buffers) for x in obj]
+    if isinstance(obj, dict):
+        if len(obj) == 1 and _ESCAPED in obj:
+            return {k: _unpack(v, buffers) for k, v in obj[_ESCAPED].items()}
+        table = obj.get(_TABLE) if len(obj) == 1 else None
+        if table is None:
+            return {k: _unpack(v, buffers) for k, v in obj.items()}
+        columns = []
+        for k in table["keys"]:
+            col = table["cols"][k]
+            if "b" in col:
+                arr = array(col["t"])
+                arr.frombytes(buffers[col["b"]])
+                columns.append(arr.tolist())
+            else:
+                columns.append(_unpack(col["v"], buffers))
+        return [dict(zip(table["keys"], row)) for row in zip(*columns)]
+    return obj
+
+def _serialize(obj) -> bytes:
+    # MAGIC | header length | header JSON | length-prefixed column buffers
+    buffers = []
+    header = json.dumps(_pack(obj, buffers), separators=(",", ":")).encode()
+    parts = [MAGIC, struct.pack("<I", len(header)), header, struct.pack("<I", len(buffers))]
+    for b in buffers:
+        parts.append(struct.pack("<I", len(b)))
+        parts.append(b)
+    return b"".join(parts)
+
+def _deserialize(data: bytes):
+    if data[:4] != MAGIC:
+        raise ValueError("not a packed payload")
+    pos = 4
+    (hlen,) = struct.unpack_from("<I", data, pos)
+    pos += 4
+    header = json.loads(data[pos:pos + hlen])
+    pos += hlen
+    (nbuf,) = struct.unpack_from("<I", data, pos)
+    pos += 4
+    buffers = []
+    for _ in range(nbuf):
+        (blen,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        buffers.append(data[pos:pos + blen])
+        pos += blen
+    return _unpack(header, buffers)
+
+def encode(obj, codec: str = "zlib"):
+    """
+    Encode a JSON-compatible object. Returns (data, codec) where data is a
+    str for codec "json" and compressed bytes otherwise.
+    """
+    codec = resolve_codec(codec)
+    if codec == "json":
+        return json.dumps(obj), "json"
+    raw = _serialize(obj)
+    if codec == "zstd":
+        return _zstd.ZstdCompressor(level=3).compress(raw), "zstd"
+    return zlib.compress(raw, 6), "zlib"
+
+def decode(data, codec):
+    if codec in (None, "json"):
+        return json.loads(data)
+    if codec == "zstd":
+        if _zstd is None:
+            raise RuntimeError("payload is zstd-compressed but the zstandard package is not installed")
+        return _deserialize(_zstd.ZstdDecompressor().decompress(data))
+    if codec == "zlib":
+        return _deserialize(zlib.decompress(data))
+    raise ValueError(f"unknown payload codec: {codec}")
+
+def content_hash(data) -> str:
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha256(data).hexdigest()
@@ -0,0 +1,322 @@
+import os
+import sys
+import time
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import local_orchestrator
+import llm_cache
+import metrics
+import tool_cache
+import tools_registry
+from tool_cache import DEFAULT_TTLS
+
+# How many tickers past the cursor to warm, and the in-flight budget shared with the foreground
+PREFETCH_DEPTH = int(os.getenv("PREFETCH_DEPTH", "3"))
+PREFETCH_BUDGET = int(os.getenv("PREFETCH_BUDGET", "2"))
+# A finished prefetch is only useful while its prompt still matches, i.e. until
+# the cached quote it was built from expires. Without the tool cache it is
+# considered fresh for PREFETCH_TTL seconds after it finished.
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", str(DEFAULT_TTLS["quote_tool"])))
+
+class _Preempted(Exception):
+    pass
+
+class _Task:
+    __slots__ = ("ticker", "future", "cancelled", "preempt", "joined", "stage", "tools_done", "llm_called",
+                 "finished_at", "expires_at")
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+        self.future = None
+        self.cancelled = threading.Event()
+        self.preempt = threading.Event()
+        self.joined = False  # a foreground analyze() is waiting on this task
+        self.stage = "queued"
+        self.tools_done = False
+        self.llm_called = False
+        self.finished_at = None
+        self.expires_at = None
+
+class PrefetchScheduler:
+    """
+    Warms the tool cache and the LLM response cache for the next `depth`
+    tickers of a watchlist while the user reads the current one, so the
+    foreground run_analysis finds both hot.
+
+    Foreground analyses and prefetch stages (tools, LLM) share one in-flight
+    budget, and the foreground has priority: it never waits for a slot, no
+    prefetch stage starts while it runs, and running prefetch LLM calls are
+    streamed and abandoned at the next token (pre-empted, then retried once
+    the foreground is done). Prefetch tools run on their own pool so they do
+    not queue ahead of the foreground's. Moving the cursor cancels prefetches
+    that fell out of the window: queued ones are dropped, running ones stop
+    before their next stage or token. Tool and LLM work that never served a
+    foreground request is counted as wasted in stats().
+    """
+
+    def __init__(self, watchlist=(), params={}, depth=None, budget=None, ttl=None):
+        self.params = dict(params)
+        self.depth = depth if depth is not None else PREFETCH_DEPTH
+        self.budget = budget or PREFETCH_BUDGET
+        self.ttl = ttl if ttl is not None else PREFETCH_TTL
+        self.watchlist = []
+        self.cursor = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.budget, thread_name_prefix="prefetch")
+        self._tool_pool = ThreadPoolExecutor(max_workers=3 * self.budget, thread_name_prefix="prefetch-tool")
+        self._cond = threading.Condition()
+        self._tasks = {}
+        self._foreground = 0
+        self._active = 0  # prefetch stages holding a budget slot
+        self._stats = {"requests": 0, "hits": 0, "joined": 0, "misses": 0, "started": 0, "completed": 0,
+                       "cancelled": 0, "stale": 0, "preempted": 0, "wasted_tool_runs": 0, "wasted_llm_calls": 0}
+        if watchlist:
+            self.set_watchlist(watchlist)
+
+    # -- foreground ----------------------------------------------------------
+
+    def set_watchlist(self, tickers, cursor=0):
+        with self._cond:
+            self.watchlist = [t.strip().upper() for t in tickers if t and t.strip()]
+        self.seek(cursor)
+
+    def seek(self, cursor: int):
+        """Move the cursor (e.g. the user jumped ahead) and retarget prefetches."""
+        with self._cond:
+            self.cursor = max(0, min(cursor, len(self.watchlist)))
+            self._retarget()
+
+    def analyze(self, ticker: str = None, **kwargs):
+        """
+        Foreground run_analysis for `ticker` (default: the ticker at the cursor).
+        Waits for an in-flight prefetch of the same ticker instead of duplicating
+        its LLM call, pauses other prefetches while it runs (pre-empting their
+        LLM calls), then moves the cursor past the ticker and prefetches the
+        following ones.
+        """
+        with self._cond:
+            if ticker is None and self.cursor >= len(self.watchlist):
+                raise ValueError("end of watchlist")
+            ticker = (ticker or self.watchlist[self.cursor]).strip().upper()
+            if ticker in self.watchlist:
+                self.cursor = self.watchlist.index(ticker)
+            task = self._tasks.pop(ticker, None)
+            self._stats["requests"] += 1
+            # from here on no prefetch stage starts
+            self._foreground += 1
+            if task is not None and task.finished_at is None and task.stage == "llm":
+                task.joined = True
+            elif task is not None and task.finished_at is None:
+                # not at the LLM yet: running it here now is no slower than waiting for it
+                task.cancelled.set()
+                if task.future.cancel():
+                    self._stats["cancelled"] += 1
+                task = None
+            self._cond.notify_all()
+        outcome = "miss"
+        try:
+            if task is not None and task.joined:
+                # calling the LLM: let it finish rather than calling the LLM twice
+                outcome = "joined"
+                try:
+                    task.future.result()
+                except Exception:
+                    pass
+            elif task is not None and not self._fresh(task):
+                self._discard(task, stale=True)
+                task = None
+            if task is None:
+                self._preempt()
+            resp = local_orchestrator.run_analysis(ticker, self.params, **kwargs)
+        finally:
+            with self._cond:
+                self._foreground -= 1
+                self._cond.notify_all()
+
+        llm_status = (resp["trace"][-1].get("meta") or {}).get("status") if resp.get("trace") else None
+        if task is None or llm_status != "cache_hit":
+            if task is not None:
+                # prefetched but the prompt no longer matched (e.g. quote refreshed)
+                self._discard(task, stale=True)
+            outcome = "miss"
+        elif outcome != "joined":
+            outcome = "hit"
+        metrics.inc("mcp_prefetch_requests_total", outcome=outcome)
+        with self._cond:
+            self._stats[{"hit": "hits", "joined": "joined", "miss": "misses"}[outcome]] += 1
+            if ticker in self.watchlist:
+                self.cursor = self.watchlist.index(ticker) + 1
+                self._retarget()
+        return resp
+
+    # -- scheduling ----------------------------------------------------------
+
+    def _window(self):
+        return self.watchlist[self.cursor:self.cursor + self.depth]
+
+    def _retarget(self):
+        """Cancel prefetches outside the window and submit missing ones. Caller holds _cond."""
+        wanted = self._window()
+        for ticker in [t for t in self._tasks if t not in wanted]:
+            task = self._tasks.pop(ticker)
+            task.cancelled.set()
+            if task.future.cancel():
+                self._stats["cancelled"] += 1
+            elif task.finished_at is not None:
+                self._discard(task)
+            # running tasks count their own waste when they stop
+        for ticker in wanted:
+            task = self._tasks.get(ticker)
+            if task is not None and task.finished_at is not None and not self._fresh(task):
+                self._discard(self._tasks.pop(ticker), stale=True)
+                task = None
+            if task is None:
+                task = self._tasks[ticker] = _Task(ticker)
+                task.future = self._pool.submit(self._prefetch, task)
+        self._cond.notify_all()
+
+    def _preempt(self):
+        """The foreground is about to call the LLM: running prefetch LLM calls give way."""
+        with self._cond:
+            for task in self._tasks.values():
+                if task.stage == "llm":
+                    task.preempt.set()
+
+    def _fresh(self, task):
+        """Whether a finished prefetch's prompt still matches: its cached quote has not expired yet."""
+        if task.expires_at is not None:
+            return time.monotonic() < task.expires_at
+        return time.monotonic() - task.finished_at <= self.ttl
+
+    def _quote_expiry(self, ticker):
+        if not tools_registry.TOOL_CACHE:
+            return None
+        return tool_cache.default_cache.expires_at(tool_cache.make_key("quote_tool", (ticker,)))
+
+    def _discard(self, task, stale=False):
+        """Count the work of a prefetch that will never serve a request."""
+        with self._cond:
+            self._stats["stale"] += stale
+            self._stats["wasted_tool_runs"] += task.tools_done
+            self._stats["wasted_llm_calls"] += task.llm_called
+        if task.tools_done:
+            metrics.inc("mcp_prefetch_wasted_total", kind="tools")
+        if task.llm_called:
+            metrics.inc("mcp_prefetch_wasted_total", kind="llm")
+
+    def _acquire(self, task):
+        """
+        Take a budget slot for the next stage. Waits while a foreground analysis
+        runs (unless it is waiting on this task) or the budget is used up;
+        False if the task was cancelled meanwhile.
+        """
+        with self._cond:
+            while not task.cancelled.is_set() and not task.joined and (self._foreground or self._active >= self.budget):
+                self._cond.wait()
+            if task.cancelled.is_set():
+                return False
+            self._active += 1
+            task.preempt.clear()
+            return True
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _llm(self, task, prompt):
+        """Streamed LLM step, abandoned at the next token if pre-empted or cancelled."""
+        def on_token(_):
+            if task.cancelled.is_set() or (task.preempt.is_set() and not task.joined):
+                raise _Preempted()
+        return local_orchestrator._llm_step(prompt, self.params, on_token=on_token)
+
+    def _prefetch(self, task):
+        if not self._acquire(task):
+            return
+        with self._cond:
+            self._stats["started"] += 1
+        try:
+            try:
+                task.stage = "tools"
+                steps = local_orchestrator.run_tools(task.ticker, self.params, pool=self._tool_pool)
+                task.tools_done = True
+                task.expires_at = self._quote_expiry(task.ticker)
+            finally:
+                self._release()
+            quote, history, fundamentals = (s["output"] for s in steps)
+            prompt, _ = local_orchestrator.build_prompt(task.ticker, quote, history, fundamentals, self.params,
+                                                        self.params.get("prompt_budget"))
+            while True:
+                if not self._acquire(task):
+                    return
+                task.stage = "llm"
+                try:
+                    _, _, meta = self._llm(task, prompt)
+                    break
+                except _Preempted:
+                    # the partial call is lost either way; retry unless cancelled
+                    with self._cond:
+                        self._stats["preempted"] += 1
+                        self._stats["wasted_llm_calls"] += 1
+                    metrics.inc("mcp_prefetch_wasted_total", kind="llm")
+                    task.stage = "preempted"
+                finally:
+                    self._release()
+            task.llm_called = meta.get("status") != "cache_hit"
+            task.stage = "done"
+            with self._cond:
+                self._stats["completed"] += 1
+        finally:
+            # under the lock so _retarget sees either a running or a finished task
+            with self._cond:
+                task.finished_at = time.monotonic()
+                if task.cancelled.is_set():
+                    self._discard(task)
+
+    def stats(self):
+        with self._cond:
+            s = dict(self._stats)
+            s["in_flight"] = sum(1 for t in self._tasks.values() if t.finished_at is None and t.stage != "queued")
+            s["ready"] = [t for t, task in self._tasks.items() if task.stage == "done"]
+        served = s["hits"] + s["joined"]
+        s["hit_rate"] = served / s["requests"] if s["requests"] else None
+        return s
+
+    def close(self):
+        with self._cond:
+            for task in self._tasks.values():
+                task.cancelled.set()
+                task.future.cancel()
+            self._tasks.clear()
+            self._cond.notify_all()
+        self._pool.shutdown(wait=True)
+        self._tool_pool.shutdown(wait=True)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Step through a watchlist with LLM prefetch of the next tickers.")
+    ap.add_argument("tickers", nargs="+")
+    ap.add_argument("--period", default="1y")
+    ap.add_argument("--depth", type=int, default=PREFETCH_DEPTH)
+    ap.add_argument("--budget", type=int, default=PREFETCH_BUDGET)
+    ap.add_argument("--think", type=float, default=5.0, help="seconds spent reading each result")
+    args = ap.parse_args(argv)
+    if not llm_cache.LLM_CACHE:
+        print("LLM_CACHE=0: only tool results can be prefetched")
+
+    sched = PrefetchScheduler(args.tickers, {"period": args.period}, args.depth, args.budget)
+    try:
+        for _ in sched.watchlist:
+            start = time.perf_counter()
+            resp = sched.analyze()
+            status = (resp["trace"][-1].get("meta") or {}).get("status")
+            print(f"{resp['trace'][0]['input']['ticker']:<8} {time.perf_counter() - start:6.2f}s  llm {status}")
+            time.sleep(args.think)
+    finally:
+        sched.close()
+    print(json.dumps(sched.stats()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
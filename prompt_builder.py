@@ -0,0 +1,135 @@
+import os
+import re
+import json
+from indicators import summarize_history, history_to_array
+
+# Token budget for the user prompt sent to the LLM
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "400"))
+# Upper bound on downsampled price points included alongside the indicators
+PROMPT_MAX_POINTS = int(os.getenv("PROMPT_MAX_POINTS", "60"))
+
+# tiktoken is optional; without it we use a regex approximation of BPE counts
+try:
+    import tiktoken as _tiktoken
+except Exception:
+    _tiktoken = None
+
+_encoding = None
+_TOKEN_RE = re.compile(r"\d{1,3}|[A-Za-z]+|[^\sA-Za-z\d]")
+
+INSTRUCTIONS = """Return JSON with:
+- technical_summary
+- fundamental_summary
+- risk_assessment
+- final_recommendation"""
+
+# Fields dropped from tool outputs before serialization (redundant with the header)
+_DROP_FIELDS = {"quote": {"ticker"}}
+# Indicator fields in the order they are dropped when the budget is tight
+_INDICATOR_DROP_ORDER = ["ema_12", "ema_26", "bb_lower", "bb_upper", "macd_signal", "volatility_20_ann",
+                         "drawdown", "sma_50", "macd", "days"]
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and _tiktoken is not None:
+        try:
+            _encoding = _tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    return _encoding or None
+
+def count_tokens(text: str) -> int:
+    enc = _get_encoding()
+    if enc is not None:
+        return len(enc.encode(text))
+    return len(_TOKEN_RE.findall(text))
+
+def _round(x, digits=4):
+    # `digits` significant digits, but never coarser than cents: 1234.56 stays 1234.56
+    if isinstance(x, float):
+        return float(f"{x:.{digits}g}") if abs(x) < 10 ** (digits - 2) else round(x, 2)
+    if isinstance(x, dict):
+        return {k: _round(v, digits) for k, v in x.items()}
+    if isinstance(x, list):
+        return [_round(v, digits) for v in x]
+    return x
+
+def compact(obj) -> str:
+    """Stable, compact JSON: sorted keys, no spaces, floats at 4 significant digits (at least 2 decimals), None values dropped."""
+    if isinstance(obj, dict):
+        obj = {k: v for k, v in obj.items() if v is not None}
+    return json.dumps(_round(obj), sort_keys=True, separators=(",", ":"))
+
+def history_summary(history):
+    """Indicator summary of the history series, or the tool error if it failed."""
+    if isinstance(history, dict) or not history:
+        return {"error": (history or {}).get("error", "no history")}
+    try:
+        return summarize_history(history)
+    except (KeyError, TypeError, ValueError) as e:
+        return {"error": f"bad history: {e}"}
+
+def downsample(history, points: int):
+    """Evenly spaced closing prices (always including the last one)."""
+    if points <= 0 or isinstance(history, dict) or not history:
+        return []
+    prices = history_to_array(history)
+    if len(prices) <= points:
+        return [float(p) for p in prices]
+    idx = [round(i * (len(prices) - 1) / (points - 1)) for i in range(points)] if points > 1 else [len(prices) - 1]
+    return [float(prices[i]) for i in idx]
+
+def _strip(name, obj):
+    if isinstance(obj, dict):
+        return {k: v for k, v in obj.items() if k not in _DROP_FIELDS.get(name, ())}
+    return obj
+
+def _render(ticker, quote, fundamentals, indicators, series, period):
+    lines = [f"Analyze stock {ticker} (window {period}) based on:", "",
+             f"Quote: {compact(quote)}",
+             f"Fundamentals: {compact(fundamentals)}",
+             f"Indicators: {compact(indicators)}"]
+    if series:
+        lines.append(f"Prices ({len(series)} evenly spaced points, oldest first): {compact(series)}")
+    lines += ["", INSTRUCTIONS]
+    return "\n".join(lines)
+
+def build_prompt(ticker, quote, history, fundamentals, params, budget: int = None):
+    """
+    Build the analysis prompt within `budget` tokens. The indicator summary
+    covers the full window; a downsampled price series fills what is left of
+    the budget, and low-priority indicator fields are dropped if still over.
+    Returns (prompt, stats) with stats = {prompt_tokens, budget, history_points, dropped}.
+    """
+    budget = budget or PROMPT_TOKEN_BUDGET
+    period = (params or {}).get("period", "1mo")
+    quote = _strip("quote", quote)
+    fundamentals = _strip("fundamentals", fundamentals)
+    indicators = dict(history_summary(history))
+
+    base = _render(ticker, quote, fundamentals, indicators, [], period)
+    base_tokens = count_tokens(base)
+    dropped = []
+    for field in _INDICATOR_DROP_ORDER:
+        if base_tokens <= budget:
+            break
+        if field in indicators:
+            indicators.pop(field)
+            dropped.append(field)
+            base = _render(ticker, quote, fundamentals, indicators, [], period)
+            base_tokens = count_tokens(base)
+
+    # largest series that fits, found by bisection on the point count
+    prompt, tokens, points = base, base_tokens, 0
+    lo, hi = 2, min(PROMPT_MAX_POINTS, len(history) if isinstance(history, list) else 0)
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        candidate = _render(ticker, quote, fundamentals, indicators, downsample(history, mid), period)
+        n = count_tokens(candidate)
+        if n <= budget:
+            prompt, tokens, points = candidate, n, mid
+            lo = mid + 1
+        else:
+            hi = mid - 1
+
+    return prompt, {"prompt_tokens": tokens, "budget": budget, "history_points": points, "dropped": dropped}
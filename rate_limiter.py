@@ -1,25 +1,141 @@
-import time, threading, os
+import time, threading, os, sqlite3
+from pathlib import Path
 from typing import Dict
 from fastapi import HTTPException
 
 RATE_LIMIT_PER_MIN = int(os.getenv("RATE_LIMIT_PER_MIN", "120"))
-_lock = threading.Lock()
-_state: Dict[str, Dict] = {}
-
-def _refill(key):
-    now = time.time()
-    s = _state.setdefault(key, {"tokens": RATE_LIMIT_PER_MIN, "last": now})
-    elapsed = now - s["last"]
-    refill_amount = (elapsed / 60.0) * RATE_LIMIT_PER_MIN
-    if refill_amount > 0:
-        s["tokens"] = min(RATE_LIMIT_PER_MIN, s["tokens"] + refill_amount)
-        s["last"] = now
-    return s
-
-def check_rate_limit(api_key: str):
-    with _lock:
-        s = _refill(api_key)
-        if s["tokens"] >= 1:
-            s["tokens"] -= 1
-            return
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+# Per-key and per-route overrides, e.g. RATE_LIMIT_KEYS="ci-key=600" RATE_LIMIT_ROUTES="/mcp/rpc=300,/mcp/manifest=30"
+RATE_LIMIT_KEYS = os.getenv("RATE_LIMIT_KEYS", "")
+RATE_LIMIT_ROUTES = os.getenv("RATE_LIMIT_ROUTES", "")
+# "memory" is per process; "sqlite" shares buckets between processes (e.g. uvicorn workers)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_PATH = Path(os.getenv("RATE_LIMIT_DB_PATH", "data/rate_limit.db"))
+RATE_LIMIT_SHARDS = int(os.getenv("RATE_LIMIT_SHARDS", "64"))
+# Buckets idle this long are dropped; a bucket refills completely within 60s, so
+# anything >= 60 forgets nothing.
+RATE_LIMIT_IDLE_TTL = float(os.getenv("RATE_LIMIT_IDLE_TTL", "300"))
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    out = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, value = item.rsplit("=", 1)
+            out[name.strip()] = int(value)
+    return out
+
+KEY_LIMITS = _parse_limits(RATE_LIMIT_KEYS)
+ROUTE_LIMITS = _parse_limits(RATE_LIMIT_ROUTES)
+
+def limit_for(api_key: str, route: str = None) -> int:
+    """Requests per minute for this key on this route: the tighter of the key and route overrides."""
+    limits = [l for l in (KEY_LIMITS.get(api_key), ROUTE_LIMITS.get(route)) if l is not None]
+    return min(limits) if limits else RATE_LIMIT_PER_MIN
+
+class MemoryRateLimiter:
+    """
+    In-process token buckets, lock-striped over `shards` dicts so threads
+    checking different keys rarely contend. Each shard drops its idle buckets
+    at most once per idle_ttl / 2.
+    """
+
+    def __init__(self, shards=None, idle_ttl=None, clock=time.monotonic):
+        n = shards or RATE_LIMIT_SHARDS
+        self.idle_ttl = idle_ttl if idle_ttl is not None else RATE_LIMIT_IDLE_TTL
+        self.clock = clock
+        self._locks = [threading.Lock() for _ in range(n)]
+        self._buckets = [{} for _ in range(n)]
+        self._swept = [clock()] * n
+
+    def allow(self, key: str, per_min: int) -> bool:
+        i = hash(key) % len(self._locks)
+        now = self.clock()
+        with self._locks[i]:
+            buckets = self._buckets[i]
+            if now - self._swept[i] >= self.idle_ttl / 2:
+                self._sweep(buckets, now)
+                self._swept[i] = now
+            b = buckets.get(key)
+            if b is None:
+                b = buckets[key] = [float(per_min), now]
+            else:
+                b[0] = min(per_min, b[0] + (now - b[1]) * per_min / 60.0)
+                b[1] = now
+            if b[0] >= 1:
+                b[0] -= 1
+                return True
+            return False
+
+    def _sweep(self, buckets, now):
+        for key in [k for k, b in buckets.items() if now - b[1] >= self.idle_ttl]:
+            del buckets[key]
+
+    def __len__(self):
+        return sum(len(b) for b in self._buckets)
+
+class SQLiteRateLimiter:
+    """
+    Token buckets in a SQLite table, shared by every process that opens the
+    same file. Each check is one atomic upsert; a denied check changes no row.
+    """
+
+    def __init__(self, path=None, idle_ttl=None, clock=time.time):
+        self.path = Path(path or RATE_LIMIT_DB_PATH)
+        self.idle_ttl = idle_ttl if idle_ttl is not None else RATE_LIMIT_IDLE_TTL
+        self.clock = clock
+        self._local = threading.local()
+        self._swept = 0.0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS rate_buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL,
+            last REAL
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_buckets_last ON rate_buckets (last)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit: every statement is its own transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def allow(self, key: str, per_min: int) -> bool:
+        now = self.clock()
+        conn = self._conn()
+        if now - self._swept >= self.idle_ttl / 2:
+            self._swept = now
+            conn.execute("DELETE FROM rate_buckets WHERE last <= ?", (now - self.idle_ttl,))
+        refill = f"min(:cap, tokens + (:now - last) * :cap / 60.0)"
+        cur = conn.execute(f"""
+            INSERT INTO rate_buckets (key, tokens, last) VALUES (:key, :cap - 1, :now)
+            ON CONFLICT(key) DO UPDATE SET tokens = {refill} - 1, last = :now
+            WHERE {refill} >= 1
+        """, {"key": key, "cap": float(per_min), "now": now})
+        return cur.rowcount > 0
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = SQLiteRateLimiter() if RATE_LIMIT_BACKEND == "sqlite" else MemoryRateLimiter()
+        return _limiter
+
+def check_rate_limit(api_key: str, route: str = None):
+    per_min = limit_for(api_key, route)
+    key = f"{api_key}|{route}" if route in ROUTE_LIMITS else api_key
+    if get_limiter().allow(key, per_min):
+        return
+    raise HTTPException(status_code=429, detail="Rate limit exceeded",
+                        headers={"Retry-After": str(max(1, round(60 / per_min)))})
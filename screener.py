@@ -0,0 +1,236 @@
+import os
+import ast
+import sys
+import json
+import argparse
+import functools
+import numpy as np
+import tool_cache
+import tools_registry
+from tools_registry import mock_bulk_fetch, quote_row, fundamentals_row
+
+# Columns the bulk loader provides; momentum_* are derived from lagged closes
+BASE_COLUMNS = ["price", "close_21", "close_63", "close_252", "market_cap", "pe_ratio", "roe"]
+SCREEN_TOP_N = int(os.getenv("SCREEN_TOP_N", "20"))
+
+class Universe:
+    """Columnar snapshot of quotes and fundamentals: `tickers` plus one float64 array per column."""
+
+    def __init__(self, tickers, columns):
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.columns = {k: np.asarray(v, dtype=np.float64) for k, v in columns.items()}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for lag, name in ((21, "momentum_1m"), (63, "momentum_3m"), (252, "momentum_12m")):
+                if f"close_{lag}" in self.columns and name not in self.columns:
+                    self.columns[name] = self.columns["price"] / self.columns[f"close_{lag}"] - 1.0
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def take(self, idx):
+        return Universe(self.tickers[idx], {k: v[idx] for k, v in self.columns.items()})
+
+    def rows(self, idx=None):
+        idx = range(len(self)) if idx is None else idx
+        return [{"ticker": self.tickers[i], **{k: _num(v[i]) for k, v in self.columns.items()}} for i in idx]
+
+def _num(x):
+    x = float(x)
+    return None if np.isnan(x) or np.isinf(x) else x
+
+def _tool_cache():
+    return tool_cache.default_cache if tools_registry.TOOL_CACHE else None
+
+def _overlay_cached(tickers, columns, cache):
+    """Replace bulk values with fresh quote_tool / fundamentals_tool results already in the tool cache."""
+    row = {t: i for i, t in enumerate(tickers)}
+    for tool, fields in (("quote_tool", ("price",)), ("fundamentals_tool", ("market_cap", "pe_ratio", "roe"))):
+        for (_, args, kwargs), value in cache.entries(tool):
+            i = row.get(args[0]) if len(args) == 1 and not kwargs else None
+            if i is None or not isinstance(value, dict):
+                continue
+            for k in fields:
+                if k in value:
+                    columns[k][i] = np.nan if value[k] is None else value[k]
+
+def load_universe(tickers, bulk_fetch=None, chunk=5000, cache=None):
+    """
+    Bulk-load quotes and fundamentals for `tickers` into a Universe, `chunk`
+    tickers per request. Quotes and fundamentals the tools already hold in the
+    tool cache win over the bulk values, so the screen sees what the
+    orchestrator will see.
+    """
+    tickers = [t.strip().upper() for t in tickers if t and t.strip()]
+    fetch = bulk_fetch or mock_bulk_fetch
+    parts = [fetch(tickers[i:i + chunk]) for i in range(0, len(tickers), chunk)]
+    columns = {k: np.concatenate([p[k] for p in parts]).astype(np.float64) for k in parts[0]} if parts \
+        else {k: [] for k in BASE_COLUMNS}
+    cache = cache or _tool_cache()
+    if cache is not None and tickers:
+        _overlay_cached(tickers, columns, cache)
+    return Universe(tickers, columns)
+
+def seed_tool_cache(universe, idx, cache=None):
+    """
+    Store rows `idx` as quote_tool / fundamentals_tool results, so analysing the
+    survivors reuses the screened values instead of fetching them again.
+    """
+    cache = cache or _tool_cache()
+    if cache is None:
+        return
+    for i in idx:
+        t = str(universe.tickers[i])
+        cache.put(tool_cache.make_key("quote_tool", (t,)), quote_row(t, universe.columns, i))
+        cache.put(tool_cache.make_key("fundamentals_tool", (t,)), fundamentals_row(universe.columns, i))
+
+def synthetic_universe(n, prefix="S"):
+    return load_universe([f"{prefix}{i:05d}" for i in range(n)])
+
+# -- expressions -------------------------------------------------------------
+
+def _pct_rank(x):
+    """Percentile rank in [0, 1]; NaN stays NaN."""
+    out = np.full(x.shape, np.nan)
+    ok = ~np.isnan(x)
+    if ok.any():
+        order = np.argsort(np.argsort(x[ok], kind="stable"), kind="stable")
+        out[ok] = order / max(1, ok.sum() - 1)
+    return out
+
+def _zscore(x):
+    sd = np.nanstd(x)
+    return (x - np.nanmean(x)) / sd if sd else np.zeros_like(x)
+
+FUNCTIONS = {"abs": np.abs, "log": np.log, "sqrt": np.sqrt, "rank": _pct_rank, "zscore": _zscore,
+             "isnan": np.isnan, "min": np.fmin, "max": np.fmax}
+_BINOPS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide, ast.Pow: np.power,
+           ast.BitAnd: np.logical_and, ast.BitOr: np.logical_or}
+_CMPOPS = {ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+           ast.Eq: np.equal, ast.NotEq: np.not_equal}
+
+@functools.lru_cache(maxsize=256)
+def compile_expr(expr: str):
+    """
+    Compile a filter/rank expression over column names into fn(universe) -> array.
+    Supports numbers, columns, + - * / **, comparisons (chained), and/or/not
+    (& | ~), and FUNCTIONS. Anything else raises ValueError.
+    """
+    try:
+        tree = ast.parse(expr, mode="eval").body
+    except SyntaxError as e:
+        raise ValueError(f"bad expression {expr!r}: {e.msg}") from None
+
+    def build(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            v = float(node.value)
+            return lambda u: v
+        if isinstance(node, ast.Name):
+            name = node.id
+            return lambda u: u[name]
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+            op, a, b = _BINOPS[type(node.op)], build(node.left), build(node.right)
+            return lambda u: op(a(u), b(u))
+        if isinstance(node, ast.UnaryOp):
+            a = build(node.operand)
+            if isinstance(node.op, ast.USub):
+                return lambda u: np.negative(a(u))
+            if isinstance(node.op, (ast.Not, ast.Invert)):
+                return lambda u: np.logical_not(a(u))
+        if isinstance(node, ast.BoolOp):
+            op = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            parts = [build(v) for v in node.values]
+            return lambda u: functools.reduce(op, (p(u) for p in parts))
+        if isinstance(node, ast.Compare) and all(type(o) in _CMPOPS for o in node.ops):
+            terms = [build(node.left)] + [build(c) for c in node.comparators]
+            ops = [_CMPOPS[type(o)] for o in node.ops]
+
+            def compare(u):
+                vals = [t(u) for t in terms]
+                return functools.reduce(np.logical_and, (op(vals[i], vals[i + 1]) for i, op in enumerate(ops)))
+            return compare
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords:
+            fn, args = FUNCTIONS[node.func.id], [build(a) for a in node.args]
+            return lambda u: fn(*(a(u) for a in args))
+        raise ValueError(f"unsupported syntax in {expr!r}: {ast.dump(node)[:60]}")
+
+    fn = build(tree)
+    names = {n.id for n in ast.walk(tree) if isinstance(n, ast.Name)} - set(FUNCTIONS)
+
+    def evaluate(universe):
+        unknown = names - set(universe.columns)
+        if unknown:
+            raise ValueError(f"unknown column(s) {sorted(unknown)}; available: {sorted(universe.columns)}")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.broadcast_to(fn(universe), (len(universe),))
+    return evaluate
+
+def screen(universe: Universe, where: str = None, rank_by: str = None, top_n: int = None, ascending: bool = False):
+    """
+    Filter with `where` and return the indices of the top `top_n` survivors by
+    `rank_by` (descending unless `ascending`), plus the number that passed.
+    NaN in a filter counts as failing; NaN scores rank last.
+    """
+    top_n = SCREEN_TOP_N if top_n is None else top_n
+    mask = compile_expr(where)(universe).astype(bool) if where else np.ones(len(universe), dtype=bool)
+    idx = np.flatnonzero(mask)
+    if rank_by is None:
+        return idx[:top_n], len(idx)
+    score = compile_expr(rank_by)(universe)[idx].astype(np.float64)
+    score = np.where(np.isnan(score), np.inf, score if ascending else -score)
+    if top_n < len(idx):
+        part = np.argpartition(score, top_n)[:top_n]
+    else:
+        part = np.arange(len(idx))
+    order = part[np.lexsort((idx[part], score[part]))]
+    return idx[order], len(idx)
+
+def screen_and_analyze(tickers_or_universe, where=None, rank_by=None, top_n=None, params={}, analyze=True,
+                       ascending=False, **batch_kwargs):
+    """
+    Screen a universe (or load one from a ticker list) and send only the top-N
+    survivors through run_batch_analysis. Returns {"screened", "passed", "top", "batch"}.
+    """
+    universe = tickers_or_universe if isinstance(tickers_or_universe, Universe) else load_universe(tickers_or_universe)
+    idx, passed = screen(universe, where, rank_by, top_n, ascending)
+    top = universe.rows(idx)
+    batch = None
+    if analyze and top:
+        seed_tool_cache(universe, idx)
+        from batch_runner import run_batch_analysis
+        batch = run_batch_analysis([r["ticker"] for r in top], params, **batch_kwargs)
+    return {"screened": len(universe), "passed": passed, "top": top, "batch": batch}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Screen tickers on quotes/fundamentals, then analyse the top N.")
+    ap.add_argument("tickers", nargs="*")
+    ap.add_argument("--file", help="ticker list, one per line")
+    ap.add_argument("--synthetic", type=int, help="screen N synthetic tickers instead")
+    ap.add_argument("--where", help='filter, e.g. "pe_ratio < 25 and roe > 10 and momentum_3m > 0"')
+    ap.add_argument("--rank", help='rank expression, e.g. "rank(momentum_3m) + rank(roe)"')
+    ap.add_argument("--top", type=int, default=SCREEN_TOP_N)
+    ap.add_argument("--ascending", action="store_true")
+    ap.add_argument("--analyze", action="store_true", help="run the orchestrator on the survivors")
+    ap.add_argument("--period", default="1y")
+    args = ap.parse_args(argv)
+
+    tickers = list(args.tickers)
+    if args.file:
+        with open(args.file) as f:
+            tickers += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    universe = synthetic_universe(args.synthetic) if args.synthetic else load_universe(tickers)
+    if not len(universe):
+        ap.error("no tickers given")
+    res = screen_and_analyze(universe, args.where, args.rank, args.top, {"period": args.period},
+                             analyze=args.analyze, ascending=args.ascending)
+    print(f"{res['passed']}/{res['screened']} passed; top {len(res['top'])}:")
+    for row in res["top"]:
+        print(json.dumps(row))
+    if res["batch"]:
+        print(f"analysed {res['batch']['ok']}/{res['batch']['total']} -> {res['batch']['summary_path']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,37 @@
 import streamlit as st
 import os
 import json
-from local_orchestrator import run_analysis
-from audit_model import list_runs, get_trace
+import audit_model
+import metrics
+from job_queue import get_queue, ACTIVE, STEPS_PER_JOB
 
 st.set_page_config(page_title="MCP Stock Analyzer", layout="wide")
 st.title("📈 MCP Stock Analyzer")
 
+# -----------------------
+# Cached resources. Streamlit re-executes this script on every interaction, so
+# the audit connection lives in cache_resource and audit queries in cache_data,
+# keyed by audit_version(), the (oldest, newest) step id pair: a new run or a
+# retention prune changes it and invalidates them.
+# The orchestrator (LLM client, tools, numpy) is imported on the first run only.
+# -----------------------
+@st.cache_resource
+def job_queue():
+    # one worker pool per server process, shared by every session
+    return get_queue().start()
+
+@st.cache_resource
+def audit_reader():
+    return audit_model.open_reader()
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def cached_runs(limit, version):
+    return audit_model.list_runs(limit=limit, conn=audit_reader())
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_trace(run_id, version):
+    return audit_model.get_trace(run_id, conn=audit_reader())
+
 # -----------------------
 # Top: Instructions / Diagnostics
 # -----------------------
@@ -81,76 +106,120 @@ with left_col:
 
     run_button = st.button(" Run MCP Pipeline")
 
+    # Runs execute on the shared job queue's worker threads; this script only
+    # submits and polls, so a slow LLM call never blocks the session.
+    if "jobs" not in st.session_state:
+        st.session_state.jobs = []  # job ids submitted from this session, newest first
     if run_button:
         if not ticker or not ticker.strip():
             st.error("Please enter a valid ticker.")
         else:
-            with st.spinner("Running MCP orchestrator (tools → LLM) ..."):
-                resp = run_analysis(ticker.strip(), {"period": period})
-            st.success("Run finished — see results below")
-
-            # LLM Final Output
-            st.subheader("LLM Final Output")
-            llm_result = resp.get("result")
-            if isinstance(llm_result, dict) and llm_result.get("mock"):
-                st.error("LLM returned a mock response (no key or probe failed). See debug below.")
-                st.code(llm_result.get("text"))
-                st.json(llm_result.get("debug"))
+            job_id = job_queue().submit(ticker.strip(), {"period": period})
+            if job_id in st.session_state.jobs:
+                st.session_state.jobs.remove(job_id)
+            st.session_state.jobs.insert(0, job_id)
+            del st.session_state.jobs[10:]
+
+    session_jobs = job_queue().jobs(st.session_state.jobs)
+    was_active = any(j["status"] in ACTIVE for j in session_jobs)
+
+    @st.fragment(run_every=1.0 if was_active else None)
+    def job_panel():
+        jobs = job_queue().jobs(st.session_state.jobs)
+        if was_active and not any(j["status"] in ACTIVE for j in jobs):
+            st.rerun()  # a job finished: redraw results and past runs
+        if not jobs:
+            return
+        st.dataframe([{"ticker": j["ticker"], "period": j["params"].get("period"), "status": j["status"],
+                       "steps": f"{j['steps']}/{STEPS_PER_JOB}", "run_id": j["run_id"]} for j in jobs],
+                     use_container_width=True, hide_index=True)
+        current = jobs[0]
+        if current["status"] in ACTIVE:
+            label = "queued" if current["status"] == "queued" else f"running: {current['step'] or 'tools'}"
+            st.progress(current["steps"] / STEPS_PER_JOB, text=f"{current['ticker']} — {label}")
+            if current["partial"]:
+                st.subheader("Live LLM Output")
+                st.markdown(current["partial"])
+
+    st.subheader("Jobs")
+    job_panel()
+
+    latest = session_jobs[0] if session_jobs else None
+    if latest and latest["status"] == "failed":
+        st.error(f"Run failed: {latest['error']}")
+    elif latest and latest["status"] == "done":
+        st.success(f"{latest['ticker']} finished — see results below")
+        llm_result = latest["result"]
+        trace = cached_trace(latest["run_id"], audit_model.audit_version(conn=audit_reader()))
+        llm_meta = trace[-1]["output"] if trace else {}
+        if isinstance(llm_meta, dict) and llm_meta.get("ttft") is not None:
+            st.caption(f"Time to first token: {llm_meta['ttft']:.2f}s — total LLM time: {llm_meta.get('duration', 0):.2f}s")
+
+        # LLM Final Output
+        st.subheader("LLM Final Output")
+        if isinstance(llm_result, dict) and llm_result.get("mock"):
+            st.error("LLM returned a mock response (no key or probe failed). See debug below.")
+            st.code(llm_result.get("text"))
+            st.json(llm_result.get("debug"))
+        else:
+            # normally llm_result is dict with "text"
+            if isinstance(llm_result, dict) and "text" in llm_result:
+                st.markdown("**Model output (raw):**")
+                st.text_area("LLM output", value=llm_result["text"], height=200)
             else:
-                # normally llm_result is dict with "text"
-                if isinstance(llm_result, dict) and "text" in llm_result:
-                    st.markdown("**Model output (raw):**")
-                    st.text_area("LLM output", value=llm_result["text"], height=200)
+                st.write(llm_result)
+
+        # MCP Trace (expanders)
+        st.subheader("Full MCP Trace")
+        for i, step in enumerate(trace):
+            label = f"Step {i+1}: {step.get('name')} — {step.get('tool')}"
+            meta = step.get("meta") or {}
+            if meta.get("cache") in ("hit", "coalesced") or meta.get("status") == "cache_hit":
+                label += " (cached)"
+            with st.expander(label, expanded=(i == len(trace) - 1)):
+                st.write("**Input**")
+                try:
+                    st.json(step.get("input", {}))
+                except Exception:
+                    st.write(step.get("input", {}))
+                st.write("**Output**")
+                out = step.get("output", {})
+                # If LLM output, show text + debug if available
+                if isinstance(out, dict) and out.get("text"):
+                    st.text_area("LLM text (truncated)", value=out.get("text")[:6000], height=140)
+                    if out.get("debug"):
+                        st.write("LLM Debug (safe):")
+                        st.json(out.get("debug"))
                 else:
-                    st.write(llm_result)
-
-            # MCP Trace (expanders)
-            st.subheader("Full MCP Trace")
-            for i, step in enumerate(resp.get("trace", [])):
-                label = f"Step {i+1}: {step.get('name')} — {step.get('tool')}"
-                with st.expander(label, expanded=(i == len(resp.get("trace", [])) - 1)):
-                    st.write("**Input**")
                     try:
-                        st.json(step.get("input", {}))
+                        st.json(out)
                     except Exception:
-                        st.write(step.get("input", {}))
-                    st.write("**Output**")
-                    out = step.get("output", {})
-                    # If LLM output, show text + debug if available
-                    if isinstance(out, dict) and out.get("text"):
-                        st.text_area("LLM text (truncated)", value=out.get("text")[:6000], height=140)
-                        if out.get("debug"):
-                            st.write("LLM Debug (safe):")
-                            st.json(out.get("debug"))
-                    else:
-                        try:
-                            st.json(out)
-                        except Exception:
-                            st.write(str(out))
-
-            # Conclusion area: try to present a short final takeaway
-            st.markdown("---")
-            st.subheader("Conclusion / Final Recommendation")
-            conclusion_text = ""
-            # extract from LLM result if available
-            if isinstance(llm_result, dict) and llm_result.get("text"):
-                # simple heuristic: take first 400 chars or last paragraph as "conclusion"
-                text = llm_result.get("text").strip()
-                # prefer last paragraph if it's short
-                paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
-                if len(paragraphs) >= 2:
-                    conclusion_text = paragraphs[-1]
-                else:
-                    conclusion_text = text[:800]
+                        st.write(str(out))
+
+        # Conclusion area: try to present a short final takeaway
+        st.markdown("---")
+        st.subheader("Conclusion / Final Recommendation")
+        conclusion_text = ""
+        # extract from LLM result if available
+        if isinstance(llm_result, dict) and llm_result.get("text"):
+            # simple heuristic: take first 400 chars or last paragraph as "conclusion"
+            text = llm_result.get("text").strip()
+            # prefer last paragraph if it's short
+            paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+            if len(paragraphs) >= 2:
+                conclusion_text = paragraphs[-1]
             else:
-                conclusion_text = "No LLM conclusion available (mock response or empty output)."
-            st.info(conclusion_text)
+                conclusion_text = text[:800]
+        else:
+            conclusion_text = "No LLM conclusion available (mock response or empty output)."
+        st.info(conclusion_text)
 
 
 with right_col:
     st.header("Past Runs (Audit)")
     st.markdown("**Stored runs (ephemeral)** — click an item to expand details.")
-    runs = list_runs(limit=50)
+    audit_ver = audit_model.audit_version(conn=audit_reader())
+    runs = cached_runs(50, audit_ver)
 
 
     runs_json = []
@@ -213,10 +282,28 @@ with right_col:
     run_ids = [r["run_id"] for r in runs_json]
     sel = st.selectbox("Select run id", options=run_ids or ["-"])
     if sel and sel != "-":
-        trace = get_trace(sel)
+        trace = cached_trace(sel, audit_ver)
         st.markdown(f"**Trace for {sel}**")
         st.json(trace)
 
+st.markdown("---")
+with st.expander("⏱ Performance (this process)", expanded=False):
+    # In-process histograms from metrics.py; no audit table scan
+    snap = metrics.snapshot()
+    if not snap["histograms"]:
+        st.write("No measurements yet. Run an analysis first.")
+    else:
+        ms = lambda v: round(v * 1000, 1) if v is not None else None
+        st.dataframe([
+            {"metric": h["name"], **h["labels"], "count": h["count"],
+             "p50 ms": ms(h["p50"]), "p95 ms": ms(h["p95"]), "p99 ms": ms(h["p99"]), "max ms": ms(h["max"])}
+            for h in snap["histograms"]
+        ], use_container_width=True)
+    if snap["counters"]:
+        st.dataframe([{"counter": c["name"], **c["labels"], "value": c["value"]} for c in snap["counters"]],
+                     use_container_width=True)
+    st.download_button("Prometheus text", metrics.render_prometheus(), file_name="metrics.prom")
+
 st.markdown("---")
 st.caption("UI Notes: Past Runs are shown on the right in a scrollable compact panel to keep the main trace readable. Audit DB is ephemeral on Streamlit Cloud.")
 
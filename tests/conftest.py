@@ -0,0 +1,24 @@
+import sys
+import pytest
+sys.path.insert(0, "")
+import audit_model
+import llm_cache
+import history_store
+import batch_runner
+import job_queue
+
+@pytest.fixture(autouse=True)
+def _tmp_data(tmp_path_factory, monkeypatch):
+    """Point the audit DB, LLM cache, history store, batch summaries and job queue at a temp dir, not data/."""
+    root = tmp_path_factory.mktemp("data")
+    audit_model.close_audit_writer()
+    monkeypatch.setattr(audit_model, "DB_PATH", root / "audit.db")
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_PATH", root / "llm_cache.db")
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setattr(history_store, "HISTORY_STORE_DIR", root / "history")
+    monkeypatch.setattr(history_store, "_store", None)
+    monkeypatch.setattr(batch_runner, "BATCH_DIR", root / "batches")
+    monkeypatch.setattr(job_queue, "JOB_DB_PATH", root / "jobs.db")
+    monkeypatch.setattr(job_queue, "_queue", None)
+    yield root
+    audit_model.close_audit_writer()
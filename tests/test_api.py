@@ -1,6 +1,8 @@
 from fastapi.testclient import TestClient
 import sys
 sys.path.insert(0, "")
+import rate_limiter
+import metrics
 from api import app
 client = TestClient(app)
 
@@ -12,3 +14,40 @@ def test_manifest_and_rpc():
     r2 = client.post("/mcp/rpc", json=payload, headers=headers)
     assert r2.status_code == 200
     assert "result" in r2.json() or "error" in r2.json()
+
+def test_rpc_auth_batch_and_errors():
+    r = client.get("/mcp/manifest", headers={"X-API-KEY": "wrong"})
+    assert r.status_code == 401
+    headers = {"X-API-KEY": "dev-local-key"}
+    batch = [
+        {"id": 1, "method": "tool.call", "params": {"tool": "get_fundamentals", "args": {"symbol": "MSFT"}}},
+        {"id": 2, "method": "tool.call", "params": {"tool": "get_quote", "args": {}}},
+        {"id": 3, "method": "no.such.method"},
+        {"id": 4, "method": "audit.list_runs", "params": {"limit": 1}},
+    ]
+    r = client.post("/mcp/rpc", json=batch, headers=headers)
+    assert r.status_code == 200
+    out = r.json()
+    assert [o["id"] for o in out] == [1, 2, 3, 4]
+    assert "pe_ratio" in out[0]["result"]
+    assert out[1]["error"]["code"] == -32602
+    assert out[2]["error"]["code"] == -32601
+    assert "runs" in out[3]["result"]
+
+def test_rpc_batch_entries_are_rate_limited(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_PER_MIN", 3)
+    monkeypatch.setattr(rate_limiter, "_limiter", rate_limiter.MemoryRateLimiter())
+    headers = {"X-API-KEY": "dev-local-key"}
+    batch = [{"id": i, "method": "audit.list_runs", "params": {"limit": 1}} for i in range(5)]
+    out = client.post("/mcp/rpc", json=batch, headers=headers).json()
+    assert [o["id"] for o in out] == [0, 1, 2, 3, 4]
+    assert all("result" in o for o in out[:3])
+    assert [o["error"]["code"] for o in out[3:]] == [-32000, -32000]
+    assert client.post("/mcp/rpc", json=batch[0], headers=headers).status_code == 429
+
+def test_request_metrics_are_labelled_by_route_template():
+    metrics.registry.reset()
+    for path in ("/healthz", "/scan/1", "/scan/2", "/wp-admin.php"):
+        client.get(path)
+    routes = {h["labels"]["route"] for h in metrics.snapshot()["histograms"] if h["name"] == "mcp_api_request_seconds"}
+    assert routes == {"/healthz", "unmatched"}
@@ -0,0 +1,99 @@
+import sys
+import time
+import asyncio
+sys.path.insert(0, "")
+import tool_cache
+import tools_registry
+import local_orchestrator
+
+def _patch(monkeypatch, saved, llm_delay=0.0):
+    async def save(*a, **kw):
+        saved.append(a)
+
+    async def flush():
+        pass
+
+    async def fake_llm(prompt):
+        await asyncio.sleep(llm_delay)
+        return {"mock": True, "text": "ok", "raw": None}
+
+    monkeypatch.setattr(local_orchestrator, "save_audit_step_async", save)
+    monkeypatch.setattr(local_orchestrator, "flush_audit_async", flush)
+    monkeypatch.setattr(local_orchestrator, "make_llm_call_async", fake_llm)
+
+def test_hundreds_of_concurrent_runs_on_one_loop(monkeypatch):
+    saved = []
+    _patch(monkeypatch, saved, llm_delay=0.2)
+
+    async def main():
+        gate = asyncio.Semaphore(200)
+        return await asyncio.gather(*(local_orchestrator.run_analysis_async(f"T{i}", {}, llm_gate=gate) for i in range(200)))
+
+    start = time.time()
+    results = asyncio.run(main())
+    elapsed = time.time() - start
+    assert len(results) == 200
+    assert all([s["name"] for s in r["trace"]] == ["quote", "history", "fundamentals", "llm_analysis"] for r in results)
+    # 200 serial runs would take 170s; concurrently it is ~one run (0.3s tools + 0.2s LLM)
+    assert elapsed < 3.0
+    assert len(saved) == 800
+
+def test_sync_tools_are_wrapped_and_errors_are_partial(monkeypatch):
+    saved = []
+    _patch(monkeypatch, saved)
+
+    def sync_fundamentals(ticker):
+        return {"pe_ratio": 12.0}
+
+    async def broken_history(ticker, period="1mo"):
+        raise ValueError("upstream down")
+
+    monkeypatch.delitem(tools_registry.async_tools, "fundamentals_tool")
+    monkeypatch.setitem(tools_registry.tools, "fundamentals_tool", sync_fundamentals)
+    monkeypatch.setitem(tools_registry.async_tools, "history_tool", broken_history)
+    steps = asyncio.run(local_orchestrator.run_tools_async("AAPL", {}))
+    assert steps[2]["output"] == {"pe_ratio": 12.0}
+    assert "upstream down" in steps[1]["output"]["error"]
+    assert steps[0]["output"]["ticker"] == "AAPL"
+
+def test_async_tools_share_the_tool_cache(monkeypatch):
+    saved = []
+    _patch(monkeypatch, saved)
+    monkeypatch.setattr(tool_cache, "default_cache", tool_cache.ToolCache())
+    calls = []
+
+    async def slow_quote(ticker):
+        calls.append(ticker)
+        await asyncio.sleep(0.05)
+        return {"ticker": ticker, "price": 1.0}
+
+    monkeypatch.setitem(tools_registry.async_tools, "quote_tool", tool_cache.cached_tool("quote_tool")(slow_quote))
+
+    async def main():
+        first = await asyncio.gather(*(local_orchestrator.run_tools_async("CSCO", {}) for _ in range(5)))
+        return first, await local_orchestrator.run_tools_async("CSCO", {})
+    first, again = asyncio.run(main())
+    assert calls == ["CSCO"]
+    assert sorted(steps[0]["cache"] for steps in first) == ["coalesced"] * 4 + ["miss"]
+    assert [s["cache"] for s in again] == ["hit", "hit", "hit"]
+    # the sync tool reads the entry the async one stored
+    tool_cache.reset_cache_status()
+    assert tools_registry.tools["quote_tool"]("CSCO") == {"ticker": "CSCO", "price": 1.0}
+    assert tool_cache.last_cache_status() == "hit"
+
+def test_registered_sync_tools_are_cached(monkeypatch):
+    saved = []
+    _patch(monkeypatch, saved)
+    monkeypatch.setattr(tool_cache, "default_cache", tool_cache.ToolCache())
+    monkeypatch.setattr(tools_registry, "TOOL_CACHE", True)
+    # restored after the test; register_tool replaces them
+    for d in (tools_registry.tools, tools_registry.raw_tools, tools_registry.async_tools, tools_registry.raw_async_tools):
+        monkeypatch.setitem(d, "fundamentals_tool", d["fundamentals_tool"])
+    calls = []
+    tools_registry.register_tool("fundamentals_tool", lambda t: calls.append(t) or {"pe_ratio": 9.0})
+    assert tools_registry.tools["fundamentals_tool"]("ORCL") == tools_registry.tools["fundamentals_tool"]("ORCL")
+    steps = asyncio.run(local_orchestrator.run_tools_async("ORCL", {}))
+    assert calls == ["ORCL"] and steps[2]["cache"] == "hit"
+    # a ticker the sync path never saw: the async path runs the new tool too
+    steps = asyncio.run(local_orchestrator.run_tools_async("IBM", {}))
+    assert calls == ["ORCL", "IBM"] and steps[2]["output"] == {"pe_ratio": 9.0}
@@ -0,0 +1,56 @@
+import sys
+import gzip
+import json
+sys.path.insert(0, "")
+import pytest
+import audit_model
+import audit_archive
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_model, "DB_PATH", tmp_path / "audit.db")
+    monkeypatch.setattr(audit_model, "AUDIT_BLOB_THRESHOLD", 200)
+    audit_model.close_audit_writer()
+    # 20 runs on consecutive days, 3 steps each; step 1 is a large payload shared by every run
+    shared = [{"day": i, "price": 100.0 + i} for i in range(50)]
+    for day in range(20):
+        ts = f"2026-01-{day + 1:02d}T12:00:0"
+        run = f"run_{day:02d}"
+        audit_model.save_audit_step(run, 0, "quote", "quote_tool", {"ticker": "aapl"}, {"price": day}, 0.1, ts + "0Z")
+        audit_model.save_audit_step(run, 1, "history", "history_tool", {"ticker": "aapl"}, shared, 0.1, ts + "1Z")
+        audit_model.save_audit_step(run, 2, "llm", "llm", {}, {"text": f"only {day} " * 40}, 0.1, ts + "2Z")
+    audit_model.flush_audit()
+    yield tmp_path
+    audit_model.close_audit_writer()
+
+def test_export_streams_time_range_to_jsonl_and_parquet(db):
+    res = audit_archive.export_runs(db / "out.jsonl.gz", since="2026-01-05", until="2026-01-10", chunk=4)
+    assert res["runs"] == 5 and res["steps"] == 15
+    with gzip.open(db / "out.jsonl.gz", "rt") as f:
+        rows = [json.loads(line) for line in f]
+    assert [(r["run_id"], r["step_index"]) for r in rows[:4]] == [("run_04", 0), ("run_04", 1), ("run_04", 2), ("run_05", 0)]
+    assert rows[1]["output"][3] == {"day": 3, "price": 103.0} and rows[0]["ticker"] == "AAPL"
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    res = audit_archive.export_runs(db / "out.parquet", chunk=7)
+    table = pq.read_table(db / "out.parquet")
+    assert res["steps"] == table.num_rows == 60
+    assert json.loads(table.column("output")[2].as_py())["text"].startswith("only 0")
+
+def test_prune_archives_and_deletes_in_batches_then_vacuums(db):
+    before_stats = audit_archive.db_stats()
+    assert before_stats["auto_vacuum"] == 2 and before_stats["blobs"] == 21
+    v0 = audit_model.audit_version()
+    res = audit_archive.prune("2026-01-15", archive_dir=db / "archive", batch=4)
+    assert res["runs"] == 14 and res["steps"] == 42 and res["batches"] == 4
+    assert res["blobs"] == 14  # per-run llm payloads; the shared history blob is still referenced
+    assert res["freed_pages"] > 0 and res["bytes_after"] < res["bytes_before"]
+    with gzip.open(res["archive"], "rt") as f:
+        archived = [json.loads(line) for line in f]
+    assert len(archived) == 42 and {r["run_id"] for r in archived} == {f"run_{d:02d}" for d in range(14)}
+
+    assert [r["run_id"] for r in audit_model.list_runs(limit=100)][-1] == "run_14"
+    assert audit_model.get_trace("run_19")[1]["output"][0] == {"day": 0, "price": 100.0}
+    assert audit_model.get_trace("run_00") == []
+    assert audit_model.audit_version() != v0
+    assert audit_archive.prune("2026-01-15", archive_dir=db / "archive")["archive"] is None  # nothing left to do
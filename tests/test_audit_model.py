@@ -0,0 +1,135 @@
+import sys
+import time
+sys.path.insert(0, "")
+import pytest
+import audit_model
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_model, "DB_PATH", tmp_path / "audit.db")
+    audit_model.close_audit_writer()
+    audit_model.init_db()
+    yield tmp_path / "audit.db"
+    audit_model.close_audit_writer()
+
+def _rows(db_path):
+    conn = audit_model.sqlite3.connect(db_path)
+    n = conn.execute("SELECT COUNT(*) FROM audit_steps").fetchone()[0]
+    conn.close()
+    return n
+
+def test_writer_buffers_until_flush(db):
+    w = audit_model.AuditWriter(db, flush_rows=1000, flush_interval=60)
+    for i in range(5):
+        w.write(audit_model._step_row("r1", i, "s", "t", {}, {"i": i}, 0.1, "now"))
+    assert _rows(db) == 0 and w.pending() == 5
+    assert w.flush() == 5
+    assert _rows(db) == 5
+    w.close()
+
+def test_writer_flushes_by_row_count_and_on_close(db):
+    w = audit_model.AuditWriter(db, flush_rows=3, flush_interval=60)
+    for i in range(3):
+        w.write(audit_model._step_row("r1", i, "s", "t", {}, {}, 0.1, "now"))
+    deadline = time.time() + 2
+    while _rows(db) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert _rows(db) == 3
+    w.write(audit_model._step_row("r1", 3, "s", "t", {}, {}, 0.1, "now"))
+    w.close()
+    assert _rows(db) == 4
+
+def test_writer_retries_locked_db_and_drops_bad_rows(db, monkeypatch):
+    monkeypatch.setattr(audit_model, "AUDIT_BUSY_TIMEOUT", 0.05)
+    w = audit_model.AuditWriter(db, flush_rows=1000, flush_interval=60)
+    for i in range(3):
+        w.write(audit_model._step_row("r1", i, "s", "t", {}, {}, 0.1, "now"))
+    blocker = audit_model.sqlite3.connect(db)
+    blocker.execute("BEGIN EXCLUSIVE")
+    with pytest.raises(audit_model.sqlite3.OperationalError):
+        w.flush()
+    assert w.pending() == 3  # locked: kept for the next flush
+    blocker.rollback()
+    blocker.close()
+
+    bad = list(audit_model._step_row("r1", 3, "s", "t", {}, {}, 0.1, "now"))
+    bad[6] = object()  # cannot be bound: fails on every retry
+    w.write(tuple(bad))
+    assert w.flush() == 3
+    assert w.pending() == 0 and _rows(db) == 3
+    w.close()
+
+def test_reads_see_buffered_steps(db):
+    for i in range(4):
+        audit_model.save_audit_step("run_x", i, f"s{i}", "t", {"a": i}, {"b": i}, 0.01, f"2026-01-01T00:00:0{i}Z")
+    trace = audit_model.get_trace("run_x")
+    assert [s["step_index"] for s in trace] == [0, 1, 2, 3]
+    assert audit_model.list_runs()[0]["run_id"] == "run_x"
+
+def test_list_runs_keyset_pagination_and_filters(db):
+    for i in range(5):
+        ticker = "AAPL" if i % 2 == 0 else "msft"
+        audit_model.save_audit_step(f"run_{i}", 0, "quote", "quote_tool", {"ticker": ticker}, {}, 0.1, f"2026-01-0{i + 1}T00:00:00Z")
+        audit_model.save_audit_step(f"run_{i}", 1, "llm_analysis", "llm", {}, {}, 0.1, f"2026-01-0{i + 1}T00:00:01Z")
+    page1 = audit_model.list_runs_page(limit=2)
+    assert [r["run_id"] for r in page1["runs"]] == ["run_4", "run_3"]
+    page2 = audit_model.list_runs_page(cursor=page1["next_cursor"], limit=2)
+    page3 = audit_model.list_runs_page(cursor=page2["next_cursor"], limit=2)
+    assert [r["run_id"] for r in page2["runs"] + page3["runs"]] == ["run_2", "run_1", "run_0"]
+    assert page3["next_cursor"] is None
+    assert page1["runs"][0]["steps"] == 1
+    assert [r["run_id"] for r in audit_model.list_runs(ticker="msft")] == ["run_3", "run_1"]
+    assert [r["run_id"] for r in audit_model.list_runs(since="2026-01-04")] == ["run_4", "run_3"]
+    assert [s["name"] for s in audit_model.get_trace("run_2", tool="llm")] == ["llm_analysis"]
+
+def test_migration_backfills_runs(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    conn = audit_model.sqlite3.connect(path)
+    conn.execute("""CREATE TABLE audit_steps (id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT NOT NULL,
+        step_index INTEGER NOT NULL, name TEXT, tool TEXT, input_json TEXT, output_json TEXT, duration REAL, created_at TEXT)""")
+    conn.executemany("INSERT INTO audit_steps (run_id, step_index, input_json, output_json, created_at) VALUES (?, ?, ?, '{}', ?)",
+                     [("old_1", 0, '{"ticker": "aapl"}', "2025-01-01"), ("old_1", 3, "{}", "2025-01-02")])
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(audit_model, "DB_PATH", path)
+    audit_model.close_audit_writer()
+    audit_model.init_db()
+    assert audit_model.list_runs() == [{"run_id": "old_1", "ticker": "AAPL", "started_at": "2025-01-01", "last_at": "2025-01-02", "steps": 3}]
+    audit_model.close_audit_writer()
+
+def test_compressed_blob_payloads_dedupe_and_read_back(db, monkeypatch):
+    monkeypatch.setattr(audit_model, "AUDIT_CODEC", "zlib")
+    monkeypatch.setattr(audit_model, "AUDIT_BLOB_THRESHOLD", 256)
+    history = [{"day": i, "price": 100.0 + i / 7} for i in range(500)]
+    for run in ("a", "b"):
+        audit_model.save_audit_step(run, 0, "history", "history_tool", {"ticker": "AAPL"}, history, 0.3, "2026-01-01")
+        audit_model.save_audit_step(run, 1, "quote", "quote_tool", {"ticker": "AAPL"}, {"price": 1.0}, 0.2, "2026-01-01")
+    assert audit_model.get_trace("a")[0]["output"] == history
+    assert audit_model.get_trace("b")[1]["output"] == {"price": 1.0}
+    conn = audit_model.sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 1
+    conn.close()
+
+def test_lazy_init_reader_and_version(tmp_path, monkeypatch):
+    import subprocess
+    # importing the library neither creates the DB nor pulls in streamlit
+    code = "import sys, os; import local_orchestrator; print('streamlit' in sys.modules, os.path.exists('data'))"
+    out = subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {str(audit_model.Path.cwd())!r}); {code}"],
+                         cwd=tmp_path, capture_output=True, text=True, timeout=60)
+    assert out.stdout.split() == ["False", "False"], out.stderr
+
+    path = tmp_path / "lazy" / "audit.db"
+    monkeypatch.setattr(audit_model, "DB_PATH", path)
+    audit_model.close_audit_writer()
+    assert audit_model.audit_version() == (0, 0) and path.exists()  # schema created on first use
+    reader = audit_model.open_reader()
+    audit_model.save_audit_step("run_v", 0, "s", "t", {"ticker": "aapl"}, {}, 0.1, "2026-01-01T00:00:00Z")
+    v1 = audit_model.audit_version(conn=reader)
+    assert v1 > (0, 0) and audit_model.list_runs(conn=reader)[0]["ticker"] == "AAPL"
+    with pytest.raises(audit_model.sqlite3.OperationalError):
+        reader.execute("DELETE FROM runs")
+    audit_model.save_audit_step("run_v", 1, "s", "t", {}, {}, 0.1, "2026-01-01T00:00:01Z")
+    assert audit_model.audit_version(conn=reader) > v1
+    assert len(audit_model.get_trace("run_v", conn=reader)) == 2
+    reader.close()
+    audit_model.close_audit_writer()
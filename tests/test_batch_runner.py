@@ -0,0 +1,51 @@
+import sys
+import json
+import time
+import threading
+sys.path.insert(0, "")
+import llm_cache
+import batch_runner
+import local_orchestrator
+
+def test_batch_bounds_llm_streams_results_and_survives_failures(tmp_path, monkeypatch):
+    lock = threading.Lock()
+    inflight, peak = [0], [0]
+
+    def fake_llm(prompt):
+        with lock:
+            inflight[0] += 1
+            peak[0] = max(peak[0], inflight[0])
+        # the first ticker submitted is the slowest to analyse
+        time.sleep(0.5 if "BSLOW" in prompt else 0.05)
+        with lock:
+            inflight[0] -= 1
+        return {"mock": True, "text": "ok", "raw": None}
+
+    real_run = batch_runner.run_analysis
+
+    def run_analysis(ticker, *args, **kwargs):
+        if ticker == "BFAIL":
+            raise RuntimeError("upstream exploded")
+        return real_run(ticker, *args, **kwargs)
+
+    monkeypatch.setattr(llm_cache, "LLM_CACHE", False)
+    monkeypatch.setattr(local_orchestrator, "make_llm_call", fake_llm)
+    monkeypatch.setattr(batch_runner, "run_analysis", run_analysis)
+    monkeypatch.setattr(batch_runner, "BATCH_DIR", tmp_path / "batches")
+
+    tickers = ["BSLOW", "BFAIL"] + [f"B{i:02d}" for i in range(8)]
+    seen = []
+    summary = batch_runner.run_batch_analysis(tickers, {"period": "1m"}, max_workers=8, max_inflight_llm=2,
+                                              on_result=lambda r: seen.append(r["ticker"]))
+
+    assert peak[0] == 2  # LLM calls overlap, but never more than max_inflight_llm
+    assert sorted(seen) == sorted(tickers) and seen != tickers
+    assert seen.index("BSLOW") > seen.index("B00")  # yielded as completed, not in submission order
+    assert (summary["total"], summary["ok"], summary["failed"]) == (10, 9, 1)
+    failed = [r for r in summary["runs"] if not r["ok"]]
+    assert failed[0]["ticker"] == "BFAIL" and "upstream exploded" in failed[0]["error"]
+
+    path = tmp_path / "batches" / f"{summary['batch_id']}.json"
+    assert summary["summary_path"] == str(path)
+    on_disk = json.loads(path.read_text())
+    assert on_disk["failed"] == 1 and len(on_disk["runs"]) == 10 and on_disk["max_inflight_llm"] == 2
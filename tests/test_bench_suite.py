@@ -0,0 +1,26 @@
+import sys
+import json
+sys.path.insert(0, "")
+sys.path.insert(0, "benchmarks")
+import suite
+import tools_registry
+
+def test_seeded_tools_are_deterministic():
+    a, _ = suite.seeded_tools(7, latency_scale=0)
+    b, _ = suite.seeded_tools(7, latency_scale=0)
+    c, _ = suite.seeded_tools(8, latency_scale=0)
+    assert a["history_tool"]("AAPL", "1y") == b["history_tool"]("AAPL", "1y")
+    assert len(a["history_tool"]("AAPL", "5y")) == 1260
+    assert a["quote_tool"]("AAPL") != c["quote_tool"]("AAPL")
+
+def test_quick_suite_writes_comparable_json(tmp_path):
+    before = dict(tools_registry.tools)
+    out = tmp_path / "r.json"
+    argv = ["--quick", "--tool-latency", "0", "--llm-latency", "0", "--runs", "2", "--out", str(out)]
+    report = suite.main(argv)
+    assert set(report["results"]) == set(suite.SCENARIOS)
+    assert report["results"]["batch"]["ok"] == report["results"]["batch"]["tickers"]
+    assert json.loads(out.read_text())["meta"]["config"]["seed"] == 1234
+    rows = suite.compare(report, report)
+    assert rows and all(change == 0 for _, _, _, change in rows if change is not None)
+    assert tools_registry.tools == before
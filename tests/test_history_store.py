@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import asyncio
+import multiprocessing
+import numpy as np
+import pytest
+sys.path.insert(0, "")
+import history_store
+from history_store import HistoryStore, _mock_prices
+
+ASOF = "2026-03-13"  # a Friday
+
+def _store(tmp_path, calls):
+    def fetch(ticker, start, end):
+        calls.append((str(start), str(end)))
+        return _mock_prices(ticker, start, end)
+
+    async def fetch_async(ticker, start, end):
+        return fetch(ticker, start, end)
+    return HistoryStore(tmp_path, fetch=fetch, fetch_async=fetch_async)
+
+def test_widening_and_rolling_windows_fetch_only_missing_segments(tmp_path):
+    calls = []
+    store = _store(tmp_path, calls)
+    dates, one_year = store.get("aapl", "1y", asof=ASOF)
+    assert len(one_year) == 252 and str(dates[-1]) == ASOF
+    store.get("AAPL", "3m", asof=ASOF)
+    assert len(calls) == 1
+    _, five_years = store.get("AAPL", "5y", asof=ASOF)
+    assert len(calls) == 2 and calls[1][1] == str(dates[0])  # head segment only
+    dates, _ = store.get("AAPL", "1m", asof="2026-03-17")
+    assert calls[2] == ("2026-03-16", "2026-03-18")  # two new sessions at the tail
+    assert store.stats["fetched_days"] == 1260 + 2
+    # values match a single upstream fetch of the whole range
+    start, end = store.coverage("AAPL")
+    _, stored = store.get_range("AAPL", start, end)
+    np.testing.assert_allclose(stored, _mock_prices("AAPL", start, end))
+    assert np.array_equal(five_years[-252:], one_year)
+
+def test_slices_are_zero_copy_views(tmp_path):
+    store = _store(tmp_path, [])
+    _, a = store.get("MSFT", "1y", asof=ASOF)
+    _, b = store.get("MSFT", "1m", asof=ASOF)
+    assert isinstance(a, np.memmap) and not a.flags.writeable
+    assert np.shares_memory(a, b)
+
+def test_async_get_and_tool_rows(tmp_path):
+    calls = []
+    store = _store(tmp_path, calls)
+    dates, prices = asyncio.run(store.get_async("NVDA", "6m", asof=ASOF))
+    assert len(prices) == 126 and len(calls) == 1
+    rows = history_store.history_rows(dates, prices)
+    assert rows[-1]["date"] == ASOF and rows[0]["day"] == 0 and isinstance(rows[0]["price"], float)
+
+def test_head_fetches_are_chunked(tmp_path):
+    calls = []
+    store = _store(tmp_path, calls)
+    store.head_chunk = 126
+    for period in ("1m", "3m", "6m", "1y"):
+        store.get("AMD", period, asof=ASOF)
+    # 1m pulls 126 days (covers 3m and 6m), 1y extends the head once
+    assert len(calls) == 2 and store.stats["fetched_days"] == 252
+
+def test_invalid_tickers_are_rejected(tmp_path, monkeypatch):
+    store = _store(tmp_path, [])
+    for bad in ("../evil", "BRK/B", "", "..", "A" * 16):
+        with pytest.raises(ValueError):
+            store.get(bad, "1m", asof=ASOF)
+    assert store.get("brk.b", "1m", asof=ASOF)[1].size == 21
+    assert {p.stem for p in tmp_path.iterdir()} == {"BRK.B"}
+    monkeypatch.setattr(history_store, "_store", store)
+    import tools_registry
+    assert "error" in tools_registry.history_tool("../evil", "1m")
+    assert "error" in asyncio.run(tools_registry.history_tool_async("BRK/B", "1m"))
+
+def test_open_memmaps_are_bounded(tmp_path):
+    store = _store(tmp_path, [])
+    store.max_maps = 4
+    fds = len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else None
+    for i in range(50):
+        store.get(f"T{i}", "1m", asof=ASOF)
+    assert len(store._maps) == 4
+    if fds is not None:
+        assert len(os.listdir("/proc/self/fd")) <= fds + 4
+
+def _fill(root, ticker, start, end):
+    HistoryStore(root, fetch=lambda t, a, b: (time.sleep(0.2), _mock_prices(t, a, b))[1]).get_range(ticker, start, end)
+
+def test_processes_filling_one_ticker_do_not_append_twice(tmp_path):
+    start, end = history_store.window("1y", ASOF)
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_fill, args=(tmp_path, "IBM", start, end)) for _ in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    store = HistoryStore(tmp_path)
+    s0, e0 = store.coverage("IBM")
+    assert (tmp_path / "IBM.f64").stat().st_size == np.busday_count(s0, e0) * 8
+    np.testing.assert_allclose(store.get_range("IBM", start, end)[1], _mock_prices("IBM", start, end))
@@ -0,0 +1,37 @@
+import sys
+import random
+sys.path.insert(0, "")
+import numpy as np
+import indicators
+
+def _series(n, seed=1):
+    rnd = random.Random(seed)
+    return [100 + i * 0.3 + rnd.uniform(-2, 2) for i in range(n)]
+
+def test_sma_ema_match_reference_loops():
+    prices = _series(60)
+    assert np.isclose(indicators.sma(prices, 20)[0, -1], sum(prices[-20:]) / 20)
+    assert np.isnan(indicators.sma(prices, 20)[0, 18])
+    e = prices[0]
+    for p in prices[1:]:
+        e = (2 / 13) * p + (11 / 13) * e
+    assert np.isclose(indicators.ema(prices, 12)[0, -1], e)
+
+def test_rsi_bounds_and_drawdown():
+    up = list(range(1, 40))
+    assert indicators.rsi(up)[0, -1] == 100.0
+    dd = indicators.drawdown([10, 12, 9, 11])[0]
+    assert np.allclose(dd, [0, 0, -0.25, 11 / 12 - 1])
+
+def test_batch_matches_single_ticker_summaries():
+    histories = [[{"day": i, "price": p} for i, p in enumerate(_series(120, seed))] for seed in range(5)]
+    batch = indicators.summarize_batch(indicators.stack_histories(histories))
+    for h, row in zip(histories, batch):
+        assert indicators.summarize_history(h) == row
+    assert set(batch[0]) >= {"rsi_14", "macd", "bb_upper", "max_drawdown", "volatility_ann"}
+
+def test_rolling_std_and_bollinger():
+    prices = _series(40)
+    assert np.isclose(indicators.rolling_std(prices, 20)[0, -1], np.std(prices[-20:]))
+    low, mid, high = indicators.bollinger(prices)
+    assert np.isclose(high[0, -1] - mid[0, -1], 2 * np.std(prices[-20:]))
@@ -0,0 +1,116 @@
+import sys
+import time
+import threading
+sys.path.insert(0, "")
+from job_queue import JobQueue
+
+def _runner(calls, gate=None, fail=()):
+    def run(ticker, params, run_id=None, on_token=None, on_step=None):
+        calls.append((ticker, params.get("period"), run_id))
+        for name in ("quote", "history", "fundamentals"):
+            on_step({"name": name})
+        if gate is not None:
+            gate.wait(5)
+        if ticker in fail:
+            raise RuntimeError("upstream down")
+        for token in ("all", " good"):
+            on_token(token)
+        on_step({"name": "llm_analysis"})
+        return {"run_id": run_id, "result": {"text": "all good", "mock": False, "raw": {"big": 1}}}
+    return run
+
+def test_duplicate_submits_share_the_in_flight_job(tmp_path):
+    calls, gate = [], threading.Event()
+    q = JobQueue(tmp_path / "jobs.db", runner=_runner(calls, gate), poll_interval=0.02)
+    a = q.submit("aapl", {"period": "1y"})
+    assert q.submit("AAPL ", {"period": "1y"}) == a
+    other = q.submit("AAPL", {"period": "3m"})
+    assert other != a and q.get(a)["status"] == "queued"
+    q.start(2)
+    deadline = time.time() + 5
+    while q.get(a)["steps"] < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    job = q.get(a)
+    assert job["status"] == "running" and job["step"] == "fundamentals"
+    assert q.submit("AAPL", {"period": "1y"}) == a  # still deduplicated while running
+    gate.set()
+    job = q.wait(a, timeout=5)
+    assert job["status"] == "done" and job["steps"] == 4 and job["partial"] == "all good"
+    assert job["result"] == {"text": "all good", "mock": False} and [c[2] for c in calls if c[1] == "1y"] == [job["run_id"]]
+    assert q.wait(other, timeout=5)["status"] == "done"
+    assert q.submit("AAPL", {"period": "1y"}) != a  # finished jobs do not absorb new submits
+    q.stop()
+    assert len(calls) == 2
+
+def test_workers_in_two_queues_claim_each_job_once(tmp_path):
+    calls = []
+    queues = [JobQueue(tmp_path / "jobs.db", runner=_runner(calls, fail={"T03"}), poll_interval=0.02) for _ in range(2)]
+    ids = [queues[i % 2].submit(f"T{i:02d}", {"period": "1m"}) for i in range(20)]
+    for q in queues:
+        q.start(3)
+    jobs = [queues[0].wait(j, timeout=10) for j in ids]
+    for q in queues:
+        q.stop()
+    assert sorted(c[0] for c in calls) == [f"T{i:02d}" for i in range(20)]
+    assert queues[0].counts() == {"done": 19, "failed": 1}
+    assert jobs[3]["status"] == "failed" and "upstream down" in jobs[3]["error"]
+
+def test_stale_running_jobs_are_requeued(tmp_path):
+    q = JobQueue(tmp_path / "jobs.db", runner=_runner([]), stale_after=0)
+    job_id = q.submit("MSFT")
+    assert q.claim("dead-worker")["job_id"] == job_id
+    assert q.claim("other") is None
+    first_run = q.get(job_id)["run_id"]
+    time.sleep(0.01)
+    assert q.requeue_stale() == 1
+    retry = q.claim("other")
+    assert retry["job_id"] == job_id
+    assert retry["run_id"] != first_run  # the retry's audit steps are kept apart
+
+def test_long_running_jobs_keep_their_heartbeat(tmp_path):
+    calls, gate = [], threading.Event()
+    q = JobQueue(tmp_path / "jobs.db", runner=_runner(calls, gate), poll_interval=0.02, stale_after=0.3)
+    job_id = q.submit("NVDA")
+    q.start(1)
+    deadline = time.time() + 5
+    while q.get(job_id)["steps"] < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    # no progress callbacks while the LLM call is blocked, for well over stale_after
+    other = JobQueue(tmp_path / "jobs.db", stale_after=0.3)
+    for _ in range(10):
+        time.sleep(0.1)
+        assert other.requeue_stale() == 0
+    gate.set()
+    assert q.wait(job_id, timeout=5)["status"] == "done"
+    q.stop()
+    assert len(calls) == 1
+
+def test_workers_survive_queue_errors_and_progress_is_best_effort(tmp_path, monkeypatch):
+    import sqlite3
+    q = JobQueue(tmp_path / "jobs.db", runner=_runner([]), poll_interval=0.02)
+    claim, failures = q.claim, [2]
+
+    def flaky_claim(worker):
+        if failures[0]:
+            failures[0] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return claim(worker)
+
+    class LockedProgress:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def execute(self, sql, *args):
+            if sql.startswith("UPDATE jobs SET steps") or sql.startswith("UPDATE jobs SET partial"):
+                raise sqlite3.OperationalError("database is locked")
+            return self.conn.execute(sql, *args)
+
+    conn = q._conn
+    monkeypatch.setattr(q, "claim", flaky_claim)
+    monkeypatch.setattr(q, "_conn", lambda: LockedProgress(conn()))
+    job_id = q.submit("AMD")
+    q.start(1)
+    job = q.wait(job_id, timeout=5)
+    q.stop()
+    assert failures == [0]
+    assert job["status"] == "done" and job["steps"] == 0 and job["result"]["text"] == "all good"
@@ -0,0 +1,53 @@
+import sys
+import time
+sys.path.insert(0, "")
+import llm_cache
+import local_orchestrator
+
+def test_keys_are_canonical_and_snap_near_duplicates():
+    k1 = llm_cache.make_key("m", {"temperature": 0.0, "max_tokens": 800}, "price 187.23", tolerance=0)
+    k2 = llm_cache.make_key("m", {"max_tokens": 800, "temperature": 0.0}, "price 187.23", tolerance=0)
+    assert k1 == k2
+    assert k1 != llm_cache.make_key("m", {"max_tokens": 800, "temperature": 0.0}, "price 187.31", tolerance=0)
+    assert llm_cache.snap_numbers("price 187.23 pe 21.04", 0.01) == llm_cache.snap_numbers("price 187.31 pe 21.01", 0.01)
+    assert llm_cache.snap_numbers("price 187.23", 0.01) != llm_cache.snap_numbers("price 195.0", 0.01)
+
+def test_snapping_leaves_digits_in_names_alone():
+    snapped = llm_cache.snap_numbers('stock X12 (window 3m): {"close_252":187.23,"momentum_12m":-0.04123}', 0.01)
+    assert snapped == 'stock X12 (window 3m): {"close_252":187.0,"momentum_12m":-0.0412}'
+    assert llm_cache.make_key("m", {}, '{"close_252":1.5}', tolerance=0.01) != \
+        llm_cache.make_key("m", {}, '{"close_253":1.5}', tolerance=0.01)
+
+def test_ttl_and_size_eviction(tmp_path):
+    cache = llm_cache.LLMCache(tmp_path / "c.db", ttl=0.2, max_bytes=200)
+    cache.put("a", "m", {"text": "x" * 50}, 2.0)
+    assert cache.get("a")["duration"] == 2.0
+    time.sleep(0.25)
+    assert cache.get("a") is None
+    for k in "bcde":
+        cache.put(k, "m", {"text": "y" * 50}, 1.0)
+    assert cache.stats()["bytes"] <= 200
+    assert cache.get("b") is None and cache.get("e") is not None
+
+def test_run_analysis_reports_cache_hit(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache.LLMCache(tmp_path / "c.db"))
+    monkeypatch.setattr(llm_cache, "LLM_CACHE", True)
+    monkeypatch.setattr(local_orchestrator, "save_audit_step", lambda *a, **kw: None)
+    calls = []
+
+    def fake_llm(prompt):
+        calls.append(prompt)
+        time.sleep(0.1)
+        return {"mock": False, "text": "buy", "raw": {}, "debug": {}}
+
+    monkeypatch.setattr(local_orchestrator, "make_llm_call", fake_llm)
+    monkeypatch.setattr(local_orchestrator, "build_prompt", lambda *a: ("same prompt", {"prompt_tokens": 2}))
+    first = local_orchestrator.run_analysis("AAPL", {})
+    second = local_orchestrator.run_analysis("AAPL", {})
+    bypass = local_orchestrator.run_analysis("AAPL", {"no_cache": True})
+    assert len(calls) == 2
+    assert first["trace"][-1]["meta"]["status"] == "cache_miss"
+    meta = second["trace"][-1]["meta"]
+    assert meta["status"] == "cache_hit" and meta["latency_saved"] > 0.05
+    assert second["result"]["text"] == "buy" and second["result"]["cached"] is True
+    assert bypass["trace"][-1]["meta"]["status"] == "cache_bypass"
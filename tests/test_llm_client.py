@@ -0,0 +1,143 @@
+import sys
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.insert(0, "")
+import pytest
+import llm_client
+
+class StubGroq(BaseHTTPRequestHandler):
+    """Stand-in for the Groq chat completions endpoint."""
+    protocol_version = "HTTP/1.1"
+    script = []  # queued (status, headers) responses; default 200
+    calls = []
+    ports = set()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        StubGroq.calls.append(body)
+        StubGroq.ports.add(self.client_address[1])
+        status, headers = StubGroq.script.pop(0) if StubGroq.script else (200, {})
+        if body.get("stream") and status == 200:
+            return self._stream(["stub", " says", " hi"])
+        data = json.dumps({"choices": [{"message": {"content": "stub says hi"}}]}).encode()
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for tok in tokens:
+            chunk = {"choices": [{"delta": {"content": tok}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGroq)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StubGroq.script, StubGroq.calls, StubGroq.ports = [], [], set()
+    monkeypatch.setenv("GROQ_API_KEY", "gsk_test_key")
+    monkeypatch.setattr(llm_client, "GROQ_URL", f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions")
+    monkeypatch.setattr(llm_client, "LLM_BACKOFF_BASE", 0.01)
+    llm_client.reset_session()
+    llm_client.clear_probe_cache()
+    yield StubGroq
+    server.shutdown()
+    llm_client.reset_session()
+
+def test_probe_cached_and_connection_reused(stub):
+    r1 = llm_client.make_llm_call("analyze AAPL")
+    r2 = llm_client.make_llm_call("analyze MSFT")
+    assert not r1["mock"] and r2["text"] == "stub says hi"
+    # one probe + two completions, all over a single keep-alive connection
+    assert [c["messages"][-1]["content"] for c in stub.calls] == ["ping", "analyze AAPL", "analyze MSFT"]
+    assert len(stub.ports) == 1
+    assert r2["debug"]["probe"]["cached"] is True
+
+def test_retries_honour_retry_after(stub):
+    llm_client.make_llm_call("warm up probe")
+    stub.script = [(429, {"Retry-After": "0"}), (503, {})]
+    resp = llm_client.make_llm_call("analyze NVDA")
+    assert not resp["mock"]
+    assert len(stub.calls) == 2 + 3
+
+def test_retries_are_bounded(stub, monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 1)
+    llm_client.make_llm_call("warm up probe")
+    stub.script = [(500, {}), (500, {}), (500, {})]
+    resp = llm_client.make_llm_call("analyze TSLA")
+    assert resp["mock"] and "500" in resp["text"]
+    assert len(stub.calls) == 2 + 2
+
+def test_streaming_yields_tokens_and_records_timing(stub):
+    stream = llm_client.make_llm_call("analyze AMD", stream=True)
+    tokens = list(stream)
+    assert tokens == ["stub", " says", " hi"]
+    res = stream.result
+    assert res["text"] == "stub says hi" and not res["mock"]
+    assert 0 <= res["ttft"] <= res["duration"]
+    assert stub.calls[-1]["stream"] is True
+
+def test_stream_failure_keeps_partial_text(stub, monkeypatch):
+    def broken(resp):
+        for tok in ["stub", " says"]:
+            yield {"choices": [{"delta": {"content": tok}}]}
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(llm_client, "_iter_sse_data", broken)
+    stream = llm_client.make_llm_call("analyze AMD", stream=True)
+    assert list(stream) == ["stub", " says"]
+    res = stream.result
+    assert res["text"] == "stub says" and not res["mock"]
+    assert "connection reset" in res["error"]
+
+def test_stream_error_status_releases_the_connection(stub, monkeypatch):
+    responses = []
+    post = llm_client._post_with_retry
+    monkeypatch.setattr(llm_client, "_post_with_retry", lambda *a, **kw: responses.append(post(*a, **kw)) or responses[-1])
+    stub.script = [(200, {}), (401, {})]  # probe, then the stream
+    stream = llm_client.make_llm_call("analyze AMD", stream=True)
+    assert "401" in "".join(stream) and "401" in stream.result["error"]
+    assert responses[-1].raw.closed  # not left holding a pooled connection
+
+def test_stream_stopped_early_still_has_result(stub):
+    stream = llm_client.make_llm_call("analyze AMD", stream=True)
+    it = iter(stream)
+    assert next(it) == "stub"
+    it.close()
+    res = stream.result
+    assert res["text"] == "stub" and res["error"]
+
+def test_streaming_without_key_yields_mock_text(monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    monkeypatch.setattr(llm_client, "_st", None)
+    stream = llm_client.make_llm_call("x", stream=True)
+    assert "".join(stream) == stream.result["text"]
+    assert stream.result["mock"] is True
+
+def test_async_client_against_stub(stub):
+    import asyncio
+
+    async def main():
+        try:
+            return await asyncio.gather(*(llm_client.make_llm_call_async(f"analyze {i}") for i in range(5)))
+        finally:
+            await llm_client.close_async_client()
+
+    stub.script = [(200, {}), (429, {"Retry-After": "0"})]
+    results = asyncio.run(main())
+    assert all(r["text"] == "stub says hi" and not r["mock"] for r in results)
+    assert len(stub.calls) == 1 + 5 + 1
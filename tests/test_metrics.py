@@ -0,0 +1,43 @@
+import sys
+import random
+sys.path.insert(0, "")
+import metrics
+from metrics import Histogram, Registry
+
+def test_histogram_percentiles_within_bucket_error():
+    rnd = random.Random(7)
+    values = sorted(rnd.lognormvariate(-3, 1.2) for _ in range(20000))
+    h = Histogram()
+    for v in values:
+        h.observe(v)
+    for q in (0.5, 0.95, 0.99):
+        exact = values[round(q * len(values)) - 1]
+        assert abs(h.percentile(q) - exact) / exact < 0.04
+    s = h.summary()
+    assert s["count"] == 20000 and s["min"] == values[0] and s["max"] == values[-1]
+
+def test_prometheus_text_format():
+    reg = Registry()
+    reg.describe("demo_seconds", "Demo latency.")
+    for v in (0.01, 0.02, 0.03):
+        reg.observe("demo_seconds", v, tool='q"t')
+    reg.inc("demo_total", status=429)
+    reg.inc("demo_total", status="error")
+    text = reg.render_prometheus()
+    assert "# HELP demo_seconds Demo latency.\n# TYPE demo_seconds summary" in text
+    assert 'demo_seconds{tool="q\\"t",quantile="0.5"} 0.02' in text
+    assert 'demo_seconds_count{tool="q\\"t"} 3' in text
+    assert 'demo_total{status="429"} 1' in text
+
+def test_orchestrator_records_steps(monkeypatch):
+    import local_orchestrator
+    metrics.registry.reset()
+    monkeypatch.setitem(local_orchestrator.tools, "quote_tool", lambda t: {"price": 1})
+    monkeypatch.setattr(local_orchestrator, "save_audit_step", lambda *a, **kw: None)
+    monkeypatch.setattr(local_orchestrator.llm_cache, "LLM_CACHE", False)
+    monkeypatch.setattr(local_orchestrator, "make_llm_call", lambda p, **kw: {"mock": True, "text": "x"})
+    local_orchestrator.run_analysis("AAPL", {"period": "1m"})
+    names = {(h["name"], h["labels"].get("tool")) for h in metrics.snapshot()["histograms"]}
+    assert ("mcp_tool_seconds", "quote_tool") in names
+    assert ("mcp_tool_queue_seconds", "history_tool") in names
+    assert ("mcp_llm_seconds", None) in names and ("mcp_run_seconds", None) in names
@@ -0,0 +1,89 @@
+import sys
+import time
+sys.path.insert(0, "")
+import local_orchestrator
+
+def _patch(monkeypatch, saved):
+    monkeypatch.setattr(local_orchestrator, "save_audit_step", lambda *a, **kw: saved.append(a))
+    monkeypatch.setattr(local_orchestrator, "make_llm_call", lambda prompt: {"mock": True, "text": "ok", "raw": None})
+
+def test_tools_run_concurrently_in_fixed_order(monkeypatch):
+    saved = []
+    _patch(monkeypatch, saved)
+    start = time.time()
+    resp = local_orchestrator.run_analysis("AAPL", {"period": "1y"}, run_id="t_run")
+    elapsed = time.time() - start
+    assert [s["name"] for s in resp["trace"]] == ["quote", "history", "fundamentals", "llm_analysis"]
+    assert [a[1] for a in saved] == [0, 1, 2, 3]
+    # slowest mock tool sleeps 0.3s; the serial sum is 0.65s
+    assert elapsed < 0.55
+
+def test_tool_failure_and_timeout_are_partial(monkeypatch):
+    saved = []
+    _patch(monkeypatch, saved)
+
+    def boom(ticker, period="1mo"):
+        raise ValueError("no data")
+
+    def slow(ticker):
+        time.sleep(1.0)
+        return {}
+
+    monkeypatch.setitem(local_orchestrator.tools, "history_tool", boom)
+    monkeypatch.setitem(local_orchestrator.tools, "fundamentals_tool", slow)
+    steps = local_orchestrator.run_tools("AAPL", {}, timeout=0.4)
+    assert steps[0]["output"]["ticker"] == "AAPL"
+    assert "no data" in steps[1]["output"]["error"]
+    assert "timeout" in steps[2]["output"]["error"]
+
+def test_streaming_run_records_final_text_and_ttft(monkeypatch):
+    import llm_client
+    saved = []
+    monkeypatch.setattr(local_orchestrator, "save_audit_step", lambda *a, **kw: saved.append((a, kw)))
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    monkeypatch.setattr(llm_client, "_st", None)
+    tokens = []
+    resp = local_orchestrator.run_analysis("AAPL", {}, on_token=tokens.append)
+    assert "".join(tokens) == resp["result"]["text"]
+    args, kw = saved[-1]
+    assert args[5]["text"] == resp["result"]["text"]
+    assert kw["meta"]["stream"] is True and kw["meta"]["ttft"] is not None
+
+def test_tool_timeout_starts_when_the_tool_runs(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    def slowish(ticker, *args):
+        time.sleep(0.25)
+        return {"ok": ticker}
+
+    for name in ("quote_tool", "history_tool", "fundamentals_tool"):
+        monkeypatch.setitem(local_orchestrator.tools, name, slowish)
+    with ThreadPoolExecutor(1) as pool:
+        # serially 0.75s on one worker, but no tool runs longer than 0.4s
+        steps = local_orchestrator.run_tools("AAPL", {}, timeout=0.4, pool=pool)
+        assert [s["output"] for s in steps] == [{"ok": "AAPL"}] * 3
+
+        # a pool stuck on something else: reported as queued out, not as a tool timeout
+        monkeypatch.setattr(local_orchestrator, "TOOL_QUEUE_TIMEOUT", 0.1)
+        pool.submit(time.sleep, 0.5)
+        steps = local_orchestrator.run_tools("AAPL", {}, timeout=0.4, pool=pool)
+        assert all("no free tool worker" in s["output"]["error"] for s in steps)
+
+def test_locked_audit_db_does_not_fail_the_run(monkeypatch):
+    import asyncio
+    import sqlite3
+    saved = []
+    _patch(monkeypatch, saved)
+
+    def locked():
+        raise sqlite3.OperationalError("database is locked")
+
+    async def locked_async():
+        locked()
+
+    monkeypatch.setattr(local_orchestrator, "flush_audit", locked)
+    monkeypatch.setattr(local_orchestrator, "flush_audit_async", locked_async)
+    monkeypatch.setattr(local_orchestrator, "save_audit_step_async", lambda *a, **kw: asyncio.sleep(0))
+    monkeypatch.setattr(local_orchestrator, "make_llm_call_async", lambda prompt: asyncio.sleep(0, {"mock": True, "text": "ok"}))
+    assert local_orchestrator.run_analysis("AAPL", {})["result"]["text"] == "ok"
+    assert asyncio.run(local_orchestrator.run_analysis_async("AAPL", {}))["result"]["text"] == "ok"
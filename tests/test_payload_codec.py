@@ -0,0 +1,32 @@
+import sys
+import json
+import random
+sys.path.insert(0, "")
+import payload_codec
+
+HISTORY = [{"day": i, "price": 100 + i * 0.4 + random.random(), "note": None if i % 3 else "x"} for i in range(300)]
+
+def test_roundtrip_is_lossless():
+    obj = {"history": HISTORY, "raw": {"choices": [{"message": {"content": "hi"}}]}, "n": 3, "flag": True}
+    for codec in payload_codec.available_codecs():
+        data, used = payload_codec.encode(obj, codec)
+        assert payload_codec.decode(data, used) == obj
+
+def test_numeric_series_are_packed_and_smaller():
+    data, codec = payload_codec.encode(HISTORY, "zlib")
+    assert codec == "zlib"
+    assert len(data) < len(json.dumps(HISTORY)) / 2
+    header = payload_codec._pack(HISTORY, [])
+    assert header["__table__"]["cols"]["price"]["t"] == "d"
+    assert header["__table__"]["cols"]["day"]["t"] == "q"
+
+def test_mixed_and_short_lists_stay_generic():
+    obj = [{"a": 1}, {"b": 2}] * 10 + [{"a": 1.5}]
+    data, codec = payload_codec.encode(obj, "zlib")
+    assert payload_codec.decode(data, codec) == obj
+    assert payload_codec.decode(*payload_codec.encode([{"a": 1, "b": 2.0}], "zlib")) == [{"a": 1, "b": 2.0}]
+
+def test_dicts_shaped_like_codec_markers_roundtrip():
+    for obj in ({"__table__": {"keys": ["a"], "cols": {}}}, {"__table__": 1}, {"__escaped__": {"__table__": []}},
+                [{"__table__": i} for i in range(10)]):
+        assert payload_codec.decode(*payload_codec.encode(obj, "zlib")) == obj
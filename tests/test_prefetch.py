@@ -0,0 +1,144 @@
+import sys
+import time
+import threading
+sys.path.insert(0, "")
+import pytest
+import llm_cache
+import tool_cache
+import tools_registry
+import local_orchestrator
+from prefetch import PrefetchScheduler
+
+class FakeLLM:
+    """LLM taking `tokens` x 0.05s per call; streamed calls yield one token per step."""
+
+    def __init__(self, tokens=4):
+        self.tokens = tokens
+        self.calls = []
+        self.finished = []
+        self.lock = threading.Lock()
+        self.started = {}  # ticker in prompt -> Event set when its call starts
+
+    def _start(self, prompt):
+        with self.lock:
+            self.calls.append(prompt)
+        for ticker, ev in list(self.started.items()):
+            if f"stock {ticker} " in prompt:
+                ev.set()
+
+    def __call__(self, prompt, stream=False):
+        if stream:
+            return _FakeStream(self, prompt)
+        self._start(prompt)
+        time.sleep(0.05 * self.tokens)
+        self.finished.append(prompt)
+        return {"mock": False, "text": "ok", "raw": None}
+
+class _FakeStream:
+    def __init__(self, llm, prompt):
+        self.llm, self.prompt, self.result = llm, prompt, None
+
+    def __iter__(self):
+        self.llm._start(self.prompt)
+        for _ in range(self.llm.tokens):
+            time.sleep(0.05)
+            yield "ok "
+        self.llm.finished.append(self.prompt)
+        self.result = {"mock": False, "text": "ok " * self.llm.tokens, "raw": None}
+
+@pytest.fixture
+def llm(tmp_path, monkeypatch):
+    """Deterministic tools, an LLM that takes 0.2s per call, and a fresh response cache."""
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache.LLMCache(tmp_path / "c.db"))
+    monkeypatch.setattr(llm_cache, "LLM_CACHE", True)
+    monkeypatch.setattr(local_orchestrator, "save_audit_step", lambda *a, **kw: None)
+    monkeypatch.setitem(local_orchestrator.tools, "quote_tool", lambda t: {"ticker": t, "price": 100.0})
+    monkeypatch.setitem(local_orchestrator.tools, "history_tool", lambda t, p="1mo": [{"day": 0, "price": 100.0}])
+    monkeypatch.setitem(local_orchestrator.tools, "fundamentals_tool", lambda t: {"pe_ratio": 20.0})
+    fake = FakeLLM()
+    monkeypatch.setattr(local_orchestrator, "make_llm_call", fake)
+    return fake
+
+def _wait_ready(sched, n, timeout=5):
+    deadline = time.time() + timeout
+    while len(sched.stats()["ready"]) < n and time.time() < deadline:
+        time.sleep(0.01)
+
+def test_next_tickers_are_served_from_prefetch(llm):
+    sched = PrefetchScheduler(["A", "B", "C", "D"], {"period": "1m"}, depth=2, budget=2)
+    try:
+        _wait_ready(sched, 2)
+        assert sorted(sched.stats()["ready"]) == ["A", "B"]
+        start = time.perf_counter()
+        resp = sched.analyze()
+        assert time.perf_counter() - start < 0.15  # no LLM wait
+        assert resp["trace"][-1]["meta"]["status"] == "cache_hit"
+        _wait_ready(sched, 2)
+        sched.analyze()
+        s = sched.stats()
+        assert s["hits"] == 2 and s["misses"] == 0 and s["hit_rate"] == 1.0
+        assert len(llm.calls) >= 3 and len(set(llm.calls)) == len(llm.calls)  # A, B, C (maybe D), none twice
+    finally:
+        sched.close()
+
+def test_foreground_joins_in_flight_prefetch_and_pauses_others(llm):
+    llm.started["A"] = threading.Event()
+    sched = PrefetchScheduler(["A", "B"], {"period": "1m"}, depth=2, budget=1)
+    try:
+        assert llm.started["A"].wait(2)  # A's prefetch is calling the LLM, B waits for the budget
+        sched.analyze("A")
+        s = sched.stats()
+        assert s["joined"] == 1 and s["preempted"] == 0 and len(llm.calls) == 1
+    finally:
+        sched.close()
+
+def test_foreground_preempts_running_prefetch_llm_calls(llm):
+    llm.tokens = 20  # 1s per call
+    llm.started["B"] = threading.Event()
+    sched = PrefetchScheduler(["A", "B", "C"], {"period": "1m"}, depth=3, budget=1)
+    try:
+        sched.seek(1)  # prefetch B (then C) with the whole budget
+        assert llm.started["B"].wait(2)
+        start = time.perf_counter()
+        sched.analyze("A")  # outside the window: a plain miss
+        waited = time.perf_counter() - start
+        s = sched.stats()
+        assert s["misses"] == 1 and s["preempted"] >= 1 and s["wasted_llm_calls"] >= 1
+        # B started first but stopped at its next token, so the foreground finished first
+        assert "stock A " in llm.finished[0]
+        assert waited < 1.5
+        _wait_ready(sched, 2)
+        assert sorted(sched.stats()["ready"]) == ["B", "C"]  # retried once the foreground was done
+    finally:
+        sched.close()
+
+def test_freshness_follows_the_cached_quote(llm, monkeypatch):
+    monkeypatch.setattr(tool_cache, "default_cache", tool_cache.ToolCache())
+    monkeypatch.setattr(tools_registry, "TOOL_CACHE", True)
+    monkeypatch.setitem(local_orchestrator.tools, "quote_tool",
+                        tool_cache.cached_tool("quote_tool", ttl=0.5)(lambda t: {"ticker": t, "price": 100.0}))
+    sched = PrefetchScheduler(["A"], {"period": "1m"}, depth=1, budget=1, ttl=3600)
+    try:
+        _wait_ready(sched, 1)
+        task = sched._tasks["A"]
+        assert task.expires_at == tool_cache.default_cache.expires_at(tool_cache.make_key("quote_tool", ("A",)))
+        assert sched._fresh(task)
+        time.sleep(task.expires_at - time.monotonic() + 0.01)
+        assert not sched._fresh(task)  # the quote expired long before PREFETCH_TTL
+    finally:
+        sched.close()
+
+def test_jumping_ahead_cancels_and_counts_waste(llm):
+    sched = PrefetchScheduler([f"T{i}" for i in range(10)], {"period": "1m"}, depth=3, budget=1)
+    try:
+        _wait_ready(sched, 1)
+        sched.seek(6)  # T0 done (wasted), T1 running or queued, T2 queued
+        _wait_ready(sched, 3)
+        s = sched.stats()
+        assert sorted(s["ready"]) == ["T6", "T7", "T8"]
+        assert s["cancelled"] >= 1 and s["wasted_llm_calls"] >= 1
+        assert s["started"] - s["completed"] <= 1  # at most the one running at the jump was cut short
+        resp = sched.analyze()
+        assert resp["trace"][-1]["meta"]["status"] == "cache_hit" and sched.cursor == 7
+    finally:
+        sched.close()
@@ -0,0 +1,37 @@
+import sys
+import random
+sys.path.insert(0, "")
+import prompt_builder
+
+def _history(n):
+    rnd = random.Random(n)
+    return [{"day": i, "price": 100 + i * 0.2 + rnd.uniform(-1, 1)} for i in range(n)]
+
+QUOTE = {"ticker": "AAPL", "price": 123.456789, "currency": "USD"}
+FUND = {"market_cap": 5_500_000_000, "pe_ratio": 21.3, "roe": 12.0}
+
+def test_prompt_fits_budget_for_long_windows():
+    for n in (20, 250, 1260):
+        prompt, stats = prompt_builder.build_prompt("AAPL", QUOTE, _history(n), FUND, {"period": "5y"}, budget=400)
+        assert stats["prompt_tokens"] == prompt_builder.count_tokens(prompt) <= 400
+        assert "Indicators:" in prompt and "final_recommendation" in prompt
+
+def test_tight_budget_drops_series_then_low_priority_fields():
+    _, roomy = prompt_builder.build_prompt("AAPL", QUOTE, _history(500), FUND, {}, budget=2000)
+    _, tight = prompt_builder.build_prompt("AAPL", QUOTE, _history(500), FUND, {}, budget=150)
+    assert roomy["history_points"] == prompt_builder.PROMPT_MAX_POINTS and roomy["dropped"] == []
+    assert tight["history_points"] == 0 and "ema_12" in tight["dropped"]
+
+def test_serialization_is_compact_and_stable():
+    a, _ = prompt_builder.build_prompt("AAPL", QUOTE, _history(100), FUND, {}, budget=500)
+    b, _ = prompt_builder.build_prompt("AAPL", dict(reversed(list(QUOTE.items()))), _history(100), FUND, {}, budget=500)
+    assert a == b
+    assert '"price":123.46' in a and '"ticker"' not in a
+
+def test_large_prices_keep_their_cents():
+    assert prompt_builder.compact({"p": 1234.56, "q": 12345.6, "r": 0.012345, "s": 12.3456}) == \
+        '{"p":1234.56,"q":12345.6,"r":0.01235,"s":12.35}'
+
+def test_tool_error_is_passed_through():
+    prompt, stats = prompt_builder.build_prompt("AAPL", QUOTE, {"error": "timeout after 10s"}, FUND, {})
+    assert "timeout after 10s" in prompt and stats["history_points"] == 0
@@ -0,0 +1,95 @@
+import sys
+import pytest
+import threading
+import multiprocessing
+sys.path.insert(0, "")
+from fastapi import HTTPException
+import rate_limiter
+from rate_limiter import MemoryRateLimiter, SQLiteRateLimiter, check_rate_limit
+
+class FakeClock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_limiter(request, tmp_path):
+    def make(clock, idle_ttl=300):
+        if request.param == "memory":
+            return MemoryRateLimiter(shards=4, idle_ttl=idle_ttl, clock=clock)
+        return SQLiteRateLimiter(tmp_path / "rl.db", idle_ttl=idle_ttl, clock=clock)
+    return make
+
+def test_bucket_capacity_and_refill(make_limiter):
+    clock = FakeClock()
+    lim = make_limiter(clock)
+    assert [lim.allow("k", 3) for _ in range(4)] == [True, True, True, False]
+    assert lim.allow("other", 3)
+    clock.t += 20  # 60 / 3 seconds refills one token
+    assert lim.allow("k", 3)
+    assert not lim.allow("k", 3)
+
+def test_idle_keys_are_evicted(make_limiter):
+    clock = FakeClock()
+    lim = make_limiter(clock, idle_ttl=60)
+    for i in range(50):
+        lim.allow(f"key{i}", 10)
+    assert len(lim) == 50
+    clock.t += 61
+    # each shard sweeps when it is next touched; 50 new keys reach all of them
+    for i in range(50):
+        lim.allow(f"fresh{i}", 10)
+    assert len(lim) == 50
+
+def test_sqlite_buckets_are_shared(tmp_path):
+    clock = FakeClock()
+    a = SQLiteRateLimiter(tmp_path / "rl.db", clock=clock)
+    b = SQLiteRateLimiter(tmp_path / "rl.db", clock=clock)
+    assert a.allow("k", 2) and b.allow("k", 2)
+    assert not a.allow("k", 2) and not b.allow("k", 2)
+
+def _hammer(path, n, out):
+    lim = SQLiteRateLimiter(path)
+    out.put(sum(lim.allow("shared", 100) for _ in range(n)))
+
+def test_sqlite_limit_holds_across_processes(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_hammer, args=(tmp_path / "rl.db", 60, out)) for _ in range(3)]
+    for p in procs:
+        p.start()
+    allowed = sum(out.get(timeout=60) for _ in procs)
+    for p in procs:
+        p.join()
+    # 100 tokens plus at most a couple refilled while the processes ran
+    assert 100 <= allowed <= 105
+
+def test_memory_limiter_threads_never_overspend():
+    lim = MemoryRateLimiter(shards=8)
+    allowed = []
+
+    def worker():
+        allowed.append(sum(lim.allow(f"k{i % 4}", 100) for i in range(400)))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert 400 <= sum(allowed) <= 410
+
+def test_route_and_key_limits(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_limiter", MemoryRateLimiter())
+    monkeypatch.setattr(rate_limiter, "ROUTE_LIMITS", {"/slow": 2})
+    monkeypatch.setattr(rate_limiter, "KEY_LIMITS", {"tight": 1})
+    check_rate_limit("a", "/slow")
+    check_rate_limit("a", "/slow")
+    with pytest.raises(HTTPException) as e:
+        check_rate_limit("a", "/slow")
+    assert e.value.status_code == 429 and e.value.headers["Retry-After"] == "30"
+    check_rate_limit("a", "/fast")  # other routes use the key-wide bucket
+    check_rate_limit("tight", "/fast")
+    with pytest.raises(HTTPException):
+        check_rate_limit("tight", "/other")
@@ -0,0 +1,79 @@
+import sys
+import numpy as np
+import pytest
+sys.path.insert(0, "")
+import screener
+from screener import Universe, compile_expr, screen, load_universe
+
+def _universe():
+    return Universe(["A", "B", "C", "D", "E"], {
+        "price": [10, 20, 30, 40, 50],
+        "close_63": [8, 25, 20, 40, 25],
+        "pe_ratio": [12, np.nan, 30, 15, 9],
+        "roe": [15, 20, 5, 12, 25],
+    })
+
+def test_filter_and_rank_top_n():
+    u = _universe()
+    assert np.allclose(u["momentum_3m"], [0.25, -0.2, 0.5, 0.0, 1.0])
+    idx, passed = screen(u, "pe_ratio < 20 and roe > 10", "momentum_3m", top_n=2)
+    assert passed == 3  # NaN pe_ratio fails the filter
+    assert list(u.tickers[idx]) == ["E", "A"]
+    idx, _ = screen(u, None, "pe_ratio", top_n=10, ascending=True)
+    assert list(u.tickers[idx]) == ["E", "A", "D", "C", "B"]  # NaN ranks last
+
+def test_expressions_are_vectorized_and_restricted():
+    u = _universe()
+    assert compile_expr("10 < price <= 40")(u).tolist() == [False, True, True, True, False]
+    assert compile_expr("(roe > 14) & ~(price > 40) | isnan(pe_ratio)")(u).tolist() == [True, True, False, False, False]
+    assert np.allclose(compile_expr("rank(roe)")(u), [0.5, 0.75, 0.0, 0.25, 1.0])
+    for bad in ("__import__('os')", "price.real", "roe if 1 else 2", "unknown > 1"):
+        with pytest.raises(ValueError):
+            compile_expr(bad)(u)
+
+def test_bulk_load_is_deterministic_and_only_top_n_are_analyzed(monkeypatch):
+    a = load_universe(["msft", "aapl", "nvda"])
+    b = load_universe(["AAPL", "NVDA"], chunk=1)
+    assert list(a.tickers) == ["MSFT", "AAPL", "NVDA"]
+    assert a["roe"][1:].tolist() == b["roe"].tolist()
+
+    seen = []
+    import batch_runner
+    monkeypatch.setattr(batch_runner, "run_batch_analysis", lambda tickers, params, **kw: seen.append(tickers) or {"ok": len(tickers)})
+    u = screener.synthetic_universe(1000)
+    res = screener.screen_and_analyze(u, "roe > 0", "momentum_12m", top_n=5, params={"period": "1y"})
+    assert res["screened"] == 1000 and len(res["top"]) == 5 and seen == [[r["ticker"] for r in res["top"]]]
+    assert res["top"][0]["momentum_12m"] >= res["top"][-1]["momentum_12m"]
+
+def test_screen_uses_the_same_data_as_the_tools(monkeypatch):
+    import tool_cache
+    import tools_registry
+    import batch_runner
+    monkeypatch.setattr(tools_registry, "TOOL_CACHE", True)
+    monkeypatch.setattr(tool_cache, "default_cache", tool_cache.ToolCache())
+    u = load_universe(["IBM", "KO"])
+    # the per-ticker tools serve the same numbers as the bulk load
+    assert tools_registry._quote_data("IBM")["price"] == u["price"][0]
+    assert tools_registry._fundamentals_data("KO")["roe"] == u["roe"][1]
+
+    # fresh tool-cache results win over the bulk values
+    tool_cache.default_cache.put(tool_cache.make_key("quote_tool", ("KO",)), {"ticker": "KO", "price": 61.5, "currency": "USD"})
+    assert load_universe(["IBM", "KO"])["price"].tolist() == [u["price"][0], 61.5]
+
+    # survivors are analysed on the values they were screened on, without refetching
+    monkeypatch.setattr(batch_runner, "run_batch_analysis", lambda tickers, params, **kw: {"ok": len(tickers)})
+    res = screener.screen_and_analyze(screener.synthetic_universe(300), "roe > 0", "momentum_3m", top_n=3)
+    for row in res["top"]:
+        tool_cache.reset_cache_status()
+        assert tools_registry.tools["quote_tool"](row["ticker"])["price"] == row["price"]
+        assert tools_registry.tools["fundamentals_tool"](row["ticker"])["pe_ratio"] == row["pe_ratio"]
+        assert tool_cache.last_cache_status() == "hit"
+
+def test_quote_and_momentum_inputs_come_from_the_history_series():
+    import tools_registry
+    from history_store import get_store, history_rows
+    u = load_universe(["AAPL", "NVDA"])
+    for i, t in enumerate(u.tickers):
+        rows = history_rows(*get_store().get(t, "1y"))
+        assert tools_registry._quote_data(t)["price"] == rows[-1]["price"] == u["price"][i]
+        assert u["close_21"][i] == rows[-22]["price"] and u["close_63"][i] == rows[-64]["price"]
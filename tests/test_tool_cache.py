@@ -0,0 +1,106 @@
+import sys
+import time
+import threading
+sys.path.insert(0, "")
+import metrics
+from tool_cache import ToolCache, cached_tool, last_cache_status
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+def test_ttl_hit_and_expiry():
+    clock = FakeClock()
+    cache = ToolCache(clock=clock)
+    calls = []
+    tool = cached_tool("quote_tool", ttl=10, cache=cache)(lambda t: calls.append(t) or {"ticker": t})
+    assert tool("AAPL") == {"ticker": "AAPL"}
+    assert last_cache_status() == "miss"
+    tool("AAPL")
+    assert last_cache_status() == "hit"
+    clock.t = 11
+    tool("AAPL")
+    assert calls == ["AAPL", "AAPL"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+
+def test_lru_eviction_by_count_and_bytes():
+    cache = ToolCache(max_entries=2, max_bytes=10_000)
+    tool = cached_tool("t", ttl=60, cache=cache)(lambda x: {"x": x})
+    tool(1); tool(2); tool(1); tool(3)  # 2 is least recently used
+    assert cache.stats()["evictions"] == 1
+    tool(1)
+    assert last_cache_status() == "hit"
+    tool(2)
+    assert last_cache_status() == "miss"
+
+    small = ToolCache(max_entries=100, max_bytes=50)
+    big = cached_tool("t", ttl=60, cache=small)(lambda n: "x" * n)
+    big(20); big(20 + 1); big(22)
+    assert small.stats()["bytes"] <= 50
+    assert small.stats()["evictions"] >= 1
+
+def test_single_flight_collapses_concurrent_misses():
+    cache = ToolCache()
+    calls = []
+
+    def slow(t):
+        calls.append(t)
+        time.sleep(0.2)
+        return {"ticker": t}
+
+    tool = cached_tool("history_tool", ttl=60, cache=cache)(slow)
+    threads = [threading.Thread(target=tool, args=("MSFT",)) for _ in range(8)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert calls == ["MSFT"]
+    assert cache.stats()["coalesced"] == 7
+
+def test_aborted_leader_releases_waiters_and_stats_reach_metrics():
+    cache = ToolCache()
+    started, release = threading.Event(), threading.Event()
+
+    def leader_fn(t):
+        started.set()
+        release.wait()
+        raise KeyboardInterrupt
+
+    leader_error, waiter_error = [], []
+
+    def lead():
+        try:
+            cache.get_or_call(("quote_tool", ("X",), ()), 60, leader_fn, "X")
+        except BaseException as e:
+            leader_error.append(e)
+
+    def wait():
+        try:
+            cache.get_or_call(("quote_tool", ("X",), ()), 60, leader_fn, "X")
+        except BaseException as e:
+            waiter_error.append(e)
+    t1 = threading.Thread(target=lead)
+    t1.start()
+    started.wait()
+    t2 = threading.Thread(target=wait)
+    t2.start()
+    while cache.stats()["coalesced"] == 0:
+        time.sleep(0.001)
+    release.set()
+    t1.join(2)
+    t2.join(2)
+    assert not t2.is_alive()
+    assert isinstance(leader_error[0], KeyboardInterrupt) and isinstance(waiter_error[0], RuntimeError)
+    assert cache.stats()["entries"] == 0
+
+    metrics.registry.reset()
+    tool = cached_tool("fundamentals_tool", ttl=60, cache=cache)(lambda t: {"t": t})
+    tool("A"); tool("A")
+    counters = {(c["labels"]["tool"], c["labels"]["event"]): c["value"] for c in metrics.snapshot()["counters"]
+                if c["name"] == "mcp_tool_cache_total"}
+    assert counters == {("fundamentals_tool", "misses"): 1, ("fundamentals_tool", "hits"): 1}
+    assert 'mcp_tool_cache_total{' in metrics.render_prometheus()
@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import functools
+import contextvars
+from collections import OrderedDict
+import metrics
+
+# Default TTLs (seconds) per tool: quotes go stale fast, history/fundamentals don't
+DEFAULT_TTLS = {
+    "quote_tool": float(os.getenv("CACHE_TTL_QUOTE", "15")),
+    "history_tool": float(os.getenv("CACHE_TTL_HISTORY", str(6 * 3600))),
+    "fundamentals_tool": float(os.getenv("CACHE_TTL_FUNDAMENTALS", str(12 * 3600))),
+}
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# per thread, and per asyncio task for the async tools
+_status = contextvars.ContextVar("tool_cache_status", default=None)
+
+def last_cache_status():
+    """Cache status ("hit", "miss", "coalesced") of the last cached call in this thread or task, or None."""
+    return _status.get()
+
+def reset_cache_status():
+    _status.set(None)
+
+def _set_status(status):
+    _status.set(status)
+
+def make_key(name, args=(), kwargs=None):
+    """Cache key of a call `tools[name](*args, **kwargs)`."""
+    return name, tuple(args), tuple(sorted((kwargs or {}).items()))
+
+def _sizeof(value) -> int:
+    try:
+        return len(json.dumps(value, default=str))
+    except Exception:
+        return len(repr(value))
+
+class _Flight:
+    __slots__ = ("event", "value", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = []  # (loop, future) of coalesced async callers
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def _resolve(self, fut):
+        if fut.done():  # the waiting task was cancelled
+            return
+        if self.error is not None:
+            fut.set_exception(self.error)
+        else:
+            fut.set_result(self.value)
+
+class ToolCache:
+    """
+    Thread-safe TTL cache with LRU eviction by entry count and approximate byte size.
+    Concurrent misses on the same key are collapsed into a single call (single-flight).
+    Cached values are shared between callers and should be treated as read-only.
+    Hits, misses, evictions etc. are also counted in metrics as
+    mcp_tool_cache_total{tool, event}.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._inflight = {}
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expirations": 0}
+
+    def _count(self, stat, key):
+        """Bump a stats() counter and its metric. Caller holds _lock."""
+        self._stats[stat] += 1
+        metrics.inc("mcp_tool_cache_total", tool=key[0] if isinstance(key, tuple) and key else "", event=stat)
+
+    def _drop(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def _put(self, key, value, ttl):
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._drop(key)
+        self._data[key] = (self._clock() + ttl, size, value)
+        self._bytes += size
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            old_key, (_, old_size, _) = self._data.popitem(last=False)
+            self._bytes -= old_size
+            self._count("evictions", old_key)
+
+    def _begin(self, key, loop=None):
+        """
+        ("hit", value), ("lead", flight) or ("wait", flight) for `key`. With an
+        event `loop` a waiter gets ("wait", future) resolved on that loop instead.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._data.move_to_end(key)
+                    self._count("hits", key)
+                    return "hit", entry[2]
+                self._drop(key)
+                self._count("expirations", key)
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = self._inflight[key] = _Flight()
+                self._count("misses", key)
+                return "lead", flight
+            self._count("coalesced", key)
+            if loop is None:
+                return "wait", flight
+            fut = loop.create_future()
+            flight.waiters.append((loop, fut))
+            return "wait", fut
+
+    def _abort(self, flight, e):
+        # KeyboardInterrupt, task cancellation etc. must not be re-raised in other callers
+        flight.error = e if isinstance(e, Exception) else RuntimeError(f"cached call aborted: {type(e).__name__}")
+
+    def _land(self, key, flight, ttl):
+        """Store the leader's value and release every waiter, whatever the leader raised."""
+        with self._lock:
+            if flight.error is None:
+                self._put(key, flight.value, ttl)
+            del self._inflight[key]
+        flight.event.set()
+        for loop, fut in flight.waiters:
+            loop.call_soon_threadsafe(flight._resolve, fut)
+
+    def get_or_call(self, key, ttl, fn, *args, **kwargs):
+        kind, got = self._begin(key)
+        if kind == "hit":
+            _set_status("hit")
+            return got
+        if kind == "wait":
+            got.event.wait()
+            _set_status("coalesced")
+            return got.result()
+        try:
+            got.value = fn(*args, **kwargs)
+        except BaseException as e:
+            self._abort(got, e)
+            raise
+        finally:
+            self._land(key, got, ttl)
+        _set_status("miss")
+        return got.value
+
+    async def get_or_call_async(self, key, ttl, fn, *args, **kwargs):
+        """get_or_call for a coroutine function, sharing entries and in-flight calls with the sync path."""
+        kind, got = self._begin(key, asyncio.get_running_loop())
+        if kind == "hit":
+            _set_status("hit")
+            return got
+        if kind == "wait":
+            value = await got
+            _set_status("coalesced")
+            return value
+        try:
+            got.value = await fn(*args, **kwargs)
+        except BaseException as e:
+            self._abort(got, e)
+            raise
+        finally:
+            self._land(key, got, ttl)
+        _set_status("miss")
+        return got.value
+
+    def peek(self, key):
+        """The fresh cached value for `key`, or None; does not count as a hit or touch the LRU order."""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[2] if entry is not None and entry[0] > self._clock() else None
+
+    def expires_at(self, key):
+        """Clock time at which the entry for `key` expires, or None if it is not cached."""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[0] if entry is not None else None
+
+    def entries(self, tool):
+        """[(key, value)] of the fresh entries cached for tool name `tool`."""
+        now = self._clock()
+        with self._lock:
+            return [(k, e[2]) for k, e in self._data.items() if k[0] == tool and e[0] > now]
+
+    def put(self, key, value, ttl=None):
+        """Store a value produced outside get_or_call (e.g. by a bulk load) under a tool's key."""
+        ttl = ttl if ttl is not None else DEFAULT_TTLS.get(key[0], 60.0)
+        with self._lock:
+            self._put(key, value, ttl)
+
+    def invalidate(self, tool=None):
+        """Drop all entries, or only those cached for tool name `tool`."""
+        with self._lock:
+            for key in [k for k in self._data if tool is None or k[0] == tool]:
+                self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            out["entries"] = len(self._data)
+            out["bytes"] = self._bytes
+            return out
+
+default_cache = ToolCache()
+
+def cached_tool(name, ttl=None, cache=None):
+    """
+    Decorator caching a tool's results under (name, args, kwargs). Works on
+    sync and `async def` tools; both share one key space, so the sync and
+    async versions of a tool serve each other's entries.
+    """
+    def deco(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                key = make_key(name, args, kwargs)
+                t = ttl if ttl is not None else DEFAULT_TTLS.get(name, 60.0)
+                return await (cache or default_cache).get_or_call_async(key, t, fn, *args, **kwargs)
+            async_wrapper.__wrapped__ = fn
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = make_key(name, args, kwargs)
+            t = ttl if ttl is not None else DEFAULT_TTLS.get(name, 60.0)
+            return (cache or default_cache).get_or_call(key, t, fn, *args, **kwargs)
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return deco
+
+async def to_thread(fn, *args, **kwargs):
+    """asyncio.to_thread for a sync (cached) tool; its cache status is visible to the caller."""
+    ctx = contextvars.copy_context()
+    out = await asyncio.get_running_loop().run_in_executor(None, functools.partial(ctx.run, fn, *args, **kwargs))
+    _set_status(ctx.get(_status))
+    return out
+
+def wrap_tools(tools, ttls=None, cache=None):
+    """Return a copy of a tools dict with every tool wrapped by `cached_tool`."""
+    ttls = ttls or {}
+    return {name: cached_tool(name, ttls.get(name), cache)(fn) for name, fn in tools.items()}
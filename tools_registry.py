@@ -1,31 +1,152 @@
+import os
 import time
-import random
+import asyncio
+import functools
+import numpy as np
+import tool_cache
+from tool_cache import wrap_tools, cached_tool, to_thread
+from history_store import get_store, history_rows, window, check_ticker, mock_closes, ticker_seed, session_index, _mock_prices
 
-def quote_tool(ticker: str):
-    time.sleep(0.2)
+# Set TOOL_CACHE=0 to disable the TTL/LRU cache in front of the tools
+TOOL_CACHE = os.getenv("TOOL_CACHE", "1") != "0"
+# Serve history from the local incremental store (HISTORY_STORE=0: regenerate every call)
+HISTORY_STORE = os.getenv("HISTORY_STORE", "1") != "0"
+
+def _splitmix(x):
+    """Uniform [0, 1) floats from uint64 keys (splitmix64 finaliser)."""
+    z = x + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / 2 ** 53
+
+def mock_bulk_fetch(tickers, asof=None):
+    """
+    Stand-in for a bulk quotes + fundamentals endpoint: one vectorized call for
+    all tickers, deterministic per ticker. Returns {column: array}. quote_tool
+    and fundamentals_tool serve single-ticker slices of it, so a screen and the
+    orchestrator see the same numbers. Prices are the history store's mock
+    closes: `price` is the last session's close (the last history_tool row)
+    and close_21/63/252 the closes that many sessions earlier.
+    """
+    seeds = np.fromiter((ticker_seed(t) for t in tickers), dtype=np.uint64, count=len(tickers))
+    u = lambda k: _splitmix(seeds + np.uint64(k << 32))
+    day = session_index(asof)
     return {
-        "ticker": ticker.upper(),
-        "price": round(100 + random.random() * 50, 2),
-        "currency": "USD"
+        "price": mock_closes(seeds, day),
+        "close_21": mock_closes(seeds, day - 21),
+        "close_63": mock_closes(seeds, day - 63),
+        "close_252": mock_closes(seeds, day - 252),
+        "market_cap": np.round(1e8 * 10 ** (u(5) * 4)),
+        "pe_ratio": np.round(np.where(u(6) < 0.08, np.nan, 4 + u(7) * 56), 1),
+        "roe": np.round(-10 + u(8) * 45, 1),
     }
 
+def quote_row(ticker, columns, i=0):
+    """quote_tool output for row `i` of bulk columns."""
+    return {"ticker": ticker.upper(), "price": float(columns["price"][i]), "currency": "USD"}
+
+def fundamentals_row(columns, i=0):
+    """fundamentals_tool output for row `i` of bulk columns (a missing P/E is None)."""
+    pe = float(columns["pe_ratio"][i])
+    return {"market_cap": int(columns["market_cap"][i]), "pe_ratio": None if pe != pe else pe,
+            "roe": float(columns["roe"][i])}
+
+def _quote_data(ticker: str):
+    return quote_row(ticker, mock_bulk_fetch([ticker]))
+
+def _history_data(ticker: str, period="1mo"):
+    """The window regenerated from the mock series, without the store."""
+    start, end = window(period)
+    prices = _mock_prices(check_ticker(ticker), start, end)
+    return history_rows(np.busday_offset(start, np.arange(len(prices)), roll="forward"), prices)
+
+def _fundamentals_data(ticker: str):
+    return fundamentals_row(mock_bulk_fetch([ticker]))
+
+def quote_tool(ticker: str):
+    time.sleep(0.2)
+    return _quote_data(ticker)
+
 def history_tool(ticker: str, period="1mo"):
+    if HISTORY_STORE:
+        # only missing head/tail segments are fetched upstream
+        try:
+            return history_rows(*get_store().get(ticker, period))
+        except ValueError as e:  # bad ticker or period
+            return {"error": str(e)}
     time.sleep(0.3)
-    return [
-        {"day": i, "price": 100 + i * 0.4 + (random.random() - 0.5) * 3}
-        for i in range(20)
-    ]
+    try:
+        return _history_data(ticker, period)
+    except ValueError as e:
+        return {"error": str(e)}
 
 def fundamentals_tool(ticker: str):
     time.sleep(0.15)
-    return {
-        "market_cap": round(5e9 + random.random() * 3e9),
-        "pe_ratio": round(10 + random.random() * 20, 1),
-        "roe": round(random.random() * 20, 1)
-    }
+    return _fundamentals_data(ticker)
+
+async def quote_tool_async(ticker: str):
+    await asyncio.sleep(0.2)
+    return _quote_data(ticker)
 
-tools = {
+async def history_tool_async(ticker: str, period="1mo"):
+    if HISTORY_STORE:
+        try:
+            return history_rows(*await get_store().get_async(ticker, period))
+        except ValueError as e:
+            return {"error": str(e)}
+    await asyncio.sleep(0.3)
+    try:
+        return _history_data(ticker, period)
+    except ValueError as e:
+        return {"error": str(e)}
+
+async def fundamentals_tool_async(ticker: str):
+    await asyncio.sleep(0.15)
+    return _fundamentals_data(ticker)
+
+raw_tools = {
     "quote_tool": quote_tool,
     "history_tool": history_tool,
     "fundamentals_tool": fundamentals_tool,
 }
+
+tools = wrap_tools(raw_tools) if TOOL_CACHE else dict(raw_tools)
+
+# Native async implementations, used by the async orchestrator. Tools without
+# one fall back to their sync version run in the event loop's executor.
+raw_async_tools = {
+    "quote_tool": quote_tool_async,
+    "history_tool": history_tool_async,
+    "fundamentals_tool": fundamentals_tool_async,
+}
+
+# same cache (keys and entries) as the sync tools
+async_tools = wrap_tools(raw_async_tools) if TOOL_CACHE else dict(raw_async_tools)
+
+def register_tool(name, fn):
+    """
+    Register a tool; `async def` functions go to async_tools, others to tools.
+    Replaces both the sync and async versions of `name`: the other one is
+    dropped (the async path wraps a sync tool), as are its cached results.
+    Cached when TOOL_CACHE is on.
+    """
+    is_async = asyncio.iscoroutinefunction(fn)
+    (raw_tools if is_async else raw_async_tools).pop(name, None)
+    (tools if is_async else async_tools).pop(name, None)
+    (raw_async_tools if is_async else raw_tools)[name] = fn
+    if TOOL_CACHE:
+        fn = cached_tool(name)(fn)
+    (async_tools if is_async else tools)[name] = fn
+    tool_cache.default_cache.invalidate(name)
+
+def get_async_tool(name):
+    fn = async_tools.get(name)
+    if fn is not None:
+        return fn
+    sync_fn = tools[name]
+
+    @functools.wraps(sync_fn)
+    async def wrapper(*args, **kwargs):
+        return await to_thread(sync_fn, *args, **kwargs)
+    return wrapper